@@ -0,0 +1,100 @@
+"""
+DDP Scaling Benchmark (CPU, gloo)
+==================================
+
+Weak scaling of TinyLM pre-training steps across 1/2/4/8 local processes:
+every rank keeps the same per-rank batch, so ideal scaling is N x the
+single-process tokens/sec.
+
+For each world size it times the same steps twice:
+  - synced:   normal DDP steps (gradients all-reduced in backward)
+  - no_sync:  DDP's no_sync() context — identical compute, no all-reduce
+and reports the difference as the communication share of a step.
+
+What to expect: TinyLM has ~8K parameters and a step is well under a
+millisecond, so per-step all-reduce latency — not bandwidth — dominates
+and scaling is poor.  That is the real-world lesson too: data parallelism
+pays off when compute per step dwarfs gradient sync (big models, big
+per-rank batches, or gradient accumulation between syncs).  Processes
+beyond the machine's core count only time-slice.
+
+Run:
+    python bench_ddp_scaling.py
+    python bench_ddp_scaling.py --world-sizes 1 2 4 --batch-size 256 --steps 200
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+import three_phase_training_toy as toy
+from ddp_training_toy import DDP, free_port, setup
+
+
+def _timed_steps(model, optimizer, batches, sync):
+    dist.barrier()
+    start = time.perf_counter()
+    for ids in batches:
+        with contextlib.nullcontext() if sync else model.no_sync():
+            loss = toy.next_token_loss(model(ids), ids)
+            optimizer.zero_grad()
+            loss.backward()
+        optimizer.step()
+    dist.barrier()
+    return time.perf_counter() - start
+
+
+def _worker(rank, world_size, port, args, results):
+    setup(rank, world_size, port, args.threads)
+    try:
+        torch.manual_seed(toy.SEED)
+        model = DDP(toy.TinyLM())
+        optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+        generator = torch.Generator().manual_seed(rank)
+        batches = [torch.randint(0, toy.VOCAB_SIZE, (args.batch_size, toy.SEQ_LEN), generator=generator)
+                   for _ in range(args.steps)]
+        _timed_steps(model, optimizer, batches[:5], sync=True)          # warm-up
+        synced = _timed_steps(model, optimizer, batches, sync=True)
+        unsynced = _timed_steps(model, optimizer, batches, sync=False)
+        if rank == 0:
+            results.put((world_size, synced, unsynced))
+    finally:
+        dist.destroy_process_group()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Weak-scaling benchmark for DDP (gloo) on CPU.")
+    parser.add_argument("--world-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=64, help="sequences per rank per step")
+    parser.add_argument("--threads", type=int, help="torch threads per process (default: cores / N)")
+    args = parser.parse_args(argv)
+
+    tokens_per_rank_step = args.batch_size * toy.SEQ_LEN
+    params = sum(p.numel() for p in toy.TinyLM().parameters())
+    print("=" * 64)
+    print(f"  DDP weak scaling — TinyLM ({params:,} params), gloo, {os.cpu_count()} CPU core(s)")
+    print(f"  {args.steps} steps x {args.batch_size} seqs x {toy.SEQ_LEN} tokens per rank")
+    print("=" * 64)
+    print(f"  {'ranks':>5}  {'step ms':>8}  {'tokens/sec':>12}  {'speedup':>8}  {'efficiency':>10}  {'comm':>6}")
+
+    results = mp.get_context("spawn").SimpleQueue()
+    baseline = None
+    for world_size in args.world_sizes:
+        mp.spawn(_worker, args=(world_size, free_port(), args, results), nprocs=world_size, join=True)
+        _, synced, unsynced = results.get()
+        tokens_per_sec = world_size * tokens_per_rank_step * args.steps / synced
+        baseline = baseline or tokens_per_sec / world_size
+        speedup = tokens_per_sec / baseline
+        comm = max(0.0, (synced - unsynced) / synced)
+        print(f"  {world_size:>5}  {synced / args.steps * 1000:>8.2f}  {tokens_per_sec:>12,.0f}  "
+              f"{speedup:>7.2f}x  {speedup / world_size:>10.0%}  {comm:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
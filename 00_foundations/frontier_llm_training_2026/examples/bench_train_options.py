@@ -0,0 +1,123 @@
+"""
+Training Options Benchmark (CPU)
+=================================
+
+Step time and peak memory of a pre-training step for every combination of
+the TrainOptions knobs:
+
+    grad accumulation x precision (fp32 / bf16 autocast) x torch.compile x Adam impl
+
+Every combination runs in a FRESH process, so peak RSS (the process's
+high-water mark) is not inherited from a previous run.  The global batch
+per optimizer step is the same everywhere — accumulation splits it into
+smaller micro-batches.
+
+Columns:
+    step ms      median optimizer-step time after warm-up (compile excluded)
+    warm-up s    first steps, including torch.compile's one-off compilation
+    peak MB      process peak RSS
+    train MB     growth of the peak during training (activations, gradients,
+                 optimizer state, compiler workspace) over the model + data
+
+What to look for: accumulation cuts activation memory (train MB) at little
+cost in step time; bf16 pays off where the CPU has native bf16 matmuls
+(AVX512-BF16 / AMX) and otherwise costs conversions; foreach / fused Adam
+remove per-parameter overhead, which matters more the more parameter
+tensors a model has.  torch.compile is not a guaranteed win: on a single
+core the generated CPU kernels can lose to ATen's matmuls, and it always
+pays seconds of compilation up front — measure before turning it on.
+
+Run:
+    python bench_train_options.py
+    python bench_train_options.py --no-compile --hidden 4096 --batch-size 128
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+
+import three_phase_training_toy as toy
+from train_options import OPTIMIZER_IMPLS, TrainOptions
+
+
+def _rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_combination(options, args):
+    """One benchmark run (in its own process): (step_ms, warmup_s, peak_mb, train_mb)."""
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    torch.manual_seed(toy.SEED)
+    model = toy.TinyLM(toy.VOCAB_SIZE, args.embed, args.hidden)
+    optimizer = options.make_optimizer(model.parameters(), lr=1e-3)
+    forward = options.prepare(model)
+    micro = options.micro_batch_size(args.batch_size)
+    steps = args.warmup + args.steps
+    data = torch.randint(0, toy.VOCAB_SIZE, (steps, options.grad_accum_steps, micro, args.seq_len))
+    baseline = _rss_mb()
+
+    def step(micro_batches):
+        optimizer.zero_grad()
+        for ids in micro_batches:
+            with options.autocast():
+                loss = toy.next_token_loss(forward(ids), ids) / options.grad_accum_steps
+            loss.backward()
+        optimizer.step()
+
+    start = time.perf_counter()
+    for i in range(args.warmup):
+        step(data[i])
+    warmup_s = time.perf_counter() - start
+    times = []
+    for i in range(args.warmup, steps):
+        start = time.perf_counter()
+        step(data[i])
+        times.append(time.perf_counter() - start)
+    peak = _rss_mb()
+    return statistics.median(times) * 1000, warmup_s, peak, peak - baseline
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Step time / peak memory per TrainOptions combination.")
+    parser.add_argument("--accum", type=int, nargs="+", default=[1, 4], help="accumulation steps to try")
+    parser.add_argument("--optimizers", nargs="+", choices=OPTIMIZER_IMPLS,
+                        default=["for-loop", "foreach", "fused"])
+    parser.add_argument("--no-compile", action="store_true", help="skip the torch.compile runs")
+    parser.add_argument("--batch-size", type=int, default=64, help="sequences per optimizer step")
+    parser.add_argument("--seq-len", type=int, default=128)
+    parser.add_argument("--embed", type=int, default=256, help="TinyLM embedding dim")
+    parser.add_argument("--hidden", type=int, default=1024, help="TinyLM hidden dim")
+    parser.add_argument("--steps", type=int, default=20, help="timed steps")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed steps (include compilation)")
+    parser.add_argument("--threads", type=int, help="torch threads")
+    args = parser.parse_args(argv)
+
+    params = sum(p.numel() for p in toy.TinyLM(toy.VOCAB_SIZE, args.embed, args.hidden).parameters())
+    print("=" * 72)
+    print(f"  TrainOptions — TinyLM ({params:,} params), batch {args.batch_size} x {args.seq_len} tokens")
+    print(f"  {args.steps} timed steps after {args.warmup} warm-up, one fresh process per row")
+    print("=" * 72)
+    print(f"  {'accum':>5}  {'precision':<9}  {'compile':<7}  {'adam':<8}  "
+          f"{'step ms':>8}  {'warm-up s':>9}  {'peak MB':>8}  {'train MB':>8}")
+
+    compile_modes = (False,) if args.no_compile else (False, True)
+    grid = itertools.product(args.accum, (False, True), compile_modes, args.optimizers)
+    context = multiprocessing.get_context("spawn")
+    for accum, bf16, compiled, impl in grid:
+        options = TrainOptions(grad_accum_steps=accum, bf16=bf16, compile=compiled, optimizer_impl=impl)
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            step_ms, warmup_s, peak_mb, train_mb = pool.submit(run_combination, options, args).result()
+        print(f"  {accum:>5}  {'bf16' if bf16 else 'fp32':<9}  {'yes' if compiled else 'no':<7}  {impl:<8}  "
+              f"{step_ms:>8.2f}  {warmup_s:>9.2f}  {peak_mb:>8.0f}  {train_mb:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Data-Parallel Three-Phase Training (CPU, gloo)
+===============================================
+
+The same pre-train -> SFT -> DPO pipeline as three_phase_training_toy.py,
+run data-parallel across N local processes with torch.distributed.  It
+walks through the code paths a real multi-node job uses, just on one CPU
+box:
+
+  - process group:  init_process_group("gloo") — gloo is the CPU backend;
+                    on GPUs this is "nccl", everything else is unchanged.
+  - DDP:            DistributedDataParallel(TinyLM) broadcasts rank 0's
+                    weights at construction, then all-reduces (averages)
+                    gradients during backward().  Every rank therefore
+                    applies the identical update and stays in sync.
+  - data sharding:  each rank trains on a disjoint slice of every epoch
+                    (BatchLoader) or of the token shards (ShardDataset).
+  - checkpointing:  only rank 0 writes; a barrier makes every rank wait
+                    for the file before the next phase loads it.
+  - logging:        only rank 0 prints; throughput is summed over ranks.
+  - accumulation:   with --grad-accum N, ranks all-reduce once per optimizer
+                    step instead of once per micro-batch (no_sync).
+
+Run:
+    python ddp_training_toy.py --nproc 4
+    python ddp_training_toy.py --nproc 4 --shards ./toy_shards
+    torchrun --nproc-per-node 4 ddp_training_toy.py      # launched by torchrun instead
+
+Scaling benchmark (1/2/4/8 processes): bench_ddp_scaling.py
+"""
+
+import argparse
+import os
+import socket
+import sys
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel as DDP
+
+import three_phase_training_toy as toy
+from train_options import OPTIMIZER_IMPLS, TrainOptions
+
+
+# ──────────────────────────────────────────────
+# PROCESS GROUP
+# ──────────────────────────────────────────────
+# torchrun sets RANK / WORLD_SIZE / MASTER_ADDR / MASTER_PORT for every
+# process.  When we spawn the processes ourselves, we set them the same way.
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def setup(rank, world_size, port=None, threads=None):
+    """Join the gloo process group.  Call once per process."""
+    if port is not None:
+        os.environ["MASTER_ADDR"] = "127.0.0.1"
+        os.environ["MASTER_PORT"] = str(port)
+    # N processes x M intra-op threads must not oversubscribe the cores
+    torch.set_num_threads(threads or max(1, (os.cpu_count() or 1) // world_size))
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+
+
+def launch(fn, world_size, *args):
+    """Run fn(rank, world_size, port, *args) in world_size local processes."""
+    mp.spawn(fn, args=(world_size, free_port(), *args), nprocs=world_size, join=True)
+
+
+# ──────────────────────────────────────────────
+# CHECKPOINTS (rank 0 writes, everyone reads)
+# ──────────────────────────────────────────────
+# DDP keeps every replica identical, so one copy is enough.  Saving the
+# unwrapped module keeps the file loadable without DDP (no "module." prefix).
+
+def save_checkpoint(model, phase_name, output_dir):
+    if dist.get_rank() == 0:
+        toy.save_checkpoint(model.module, phase_name, output_dir)
+    dist.barrier()   # nobody loads a checkpoint that is still being written
+
+
+def load_checkpoint(model, phase_name, output_dir):
+    toy.load_checkpoint(model.module, phase_name, output_dir)
+    return model
+
+
+# ──────────────────────────────────────────────
+# PIPELINE (one process = one rank)
+# ──────────────────────────────────────────────
+
+def run_pipeline(rank, world_size, port, args):
+    setup(rank, world_size, port, args.threads)
+    if rank != 0:
+        sys.stdout = open(os.devnull, "w")   # log once, from rank 0
+    try:
+        print("\n" + "=" * 55)
+        print(f"  THREE-PHASE TRAINING TOY — DATA PARALLEL ({world_size} ranks, gloo)")
+        print(f"  global batch = {args.batch_size} per rank x {world_size} ranks")
+        print("=" * 55 + "\n")
+
+        torch.manual_seed(toy.SEED)
+        model = DDP(toy.TinyLM())            # weights broadcast from rank 0
+        options = TrainOptions(grad_accum_steps=args.grad_accum, bf16=args.bf16,
+                               compile=args.compile, optimizer_impl=args.optimizer)
+        eval_prompts = ["order is late", "greet the customer", "product broke"]
+
+        # ── Phase 1: Pre-training ────────────────
+        if args.shards:
+            # Rank 0 preprocesses (if needed) before the others map the shards
+            if rank == 0:
+                toy.load_pretrain_shards(args.shards, cache_dir=args.cache_dir)
+            dist.barrier()
+            pretrain_data = toy.load_pretrain_shards(args.shards, cache_dir=args.cache_dir,
+                                                     rank=rank, world_size=world_size)
+        else:
+            pretrain_data = toy.build_pretrain_dataset()
+        toy.train_pretrain(model, pretrain_data, steps=args.steps, batch_size=args.batch_size,
+                           options=options)
+        save_checkpoint(model, "pretrained", args.output_dir)
+        if rank == 0:
+            toy.evaluate_model(model.module, "After Pre-training", eval_prompts)
+
+        # ── Phase 2: SFT ─────────────────────────
+        model = load_checkpoint(model, "pretrained", args.output_dir)
+        toy.train_sft(model, toy.build_sft_dataset(), steps=args.steps, batch_size=args.batch_size,
+                      options=options)
+        save_checkpoint(model, "sft", args.output_dir)
+        if rank == 0:
+            toy.evaluate_model(model.module, "After SFT", eval_prompts)
+
+        # ── Phase 3: Alignment (DPO) ─────────────
+        model = load_checkpoint(model, "sft", args.output_dir)
+        pref_data = toy.build_preference_dataset()
+        # Only a handful of pairs: split across ranks they can't fill a batch
+        pairs_per_rank = -(-len(pref_data[0]) // world_size)
+        dpo_batch_size = min(args.batch_size, pairs_per_rank)
+        if dpo_batch_size < args.batch_size:
+            print(f"  DPO batch size: {dpo_batch_size} per rank "
+                  f"({len(pref_data[0])} preference pairs over {world_size} ranks)\n")
+        toy.train_align_dpo(model, pref_data, steps=args.steps,
+                            batch_size=dpo_batch_size, options=options)
+        save_checkpoint(model, "aligned", args.output_dir)
+        if rank == 0:
+            toy.evaluate_model(model.module, "After Alignment (DPO)", eval_prompts)
+
+        print(f"  PIPELINE COMPLETE — checkpoints (rank 0) in {args.output_dir}/")
+    finally:
+        dist.destroy_process_group()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Data-parallel three-phase training toy (gloo).")
+    parser.add_argument("--nproc", type=int, default=2, help="processes (ignored under torchrun)")
+    parser.add_argument("--steps", type=int, default=40, help="optimizer steps per phase")
+    parser.add_argument("--batch-size", type=int, default=toy.BATCH_SIZE,
+                        help="per-rank batch size per optimizer step")
+    parser.add_argument("--threads", type=int, help="torch threads per process (default: cores / nproc)")
+    parser.add_argument("--shards", metavar="DIR", help="pre-train from memory-mapped token shards")
+    parser.add_argument("--cache-dir", default="./toy_cache")
+    parser.add_argument("--output-dir", default="./toy_checkpoints_ddp")
+    parser.add_argument("--grad-accum", type=int, default=1, help="micro-batches per optimizer step")
+    parser.add_argument("--bf16", action="store_true", help="bf16 autocast for forward passes")
+    parser.add_argument("--compile", action="store_true", help="torch.compile the model")
+    parser.add_argument("--optimizer", choices=OPTIMIZER_IMPLS, default="default")
+    args = parser.parse_args(argv)
+
+    if "RANK" in os.environ:   # launched by torchrun: this process is one rank
+        run_pipeline(int(os.environ["RANK"]), int(os.environ["WORLD_SIZE"]), None, args)
+    else:
+        launch(run_pipeline, args.nproc, args)
+
+
+if __name__ == "__main__":
+    main()
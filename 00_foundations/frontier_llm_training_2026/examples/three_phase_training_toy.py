@@ -13,17 +13,39 @@ Uses a tiny dummy model (embedding + linear) so the script is
 self-contained — no HuggingFace downloads, no GPU required.
 
 The point: understand the FLOW of data and objectives across phases.
+
+Each phase trains on seeded, epoch-shuffled mini-batches from
+toy_data.BatchLoader (prefetched on a background thread) and reports
+tokens/sec — the same loop shape as a real trainer.  Pre-training and SFT
+data is PACKED into full blocks with separators, and the loss skips
+padding (and, for SFT, the prompt) via IGNORE_INDEX labels.  Texts are
+tokenized in bulk by toy_tokenizer (byte-level or a small trained BPE) and
+the ids are cached on disk, so re-runs skip tokenization.  With --shards,
+pre-training instead streams windows from memory-mapped token shards
+(token_shards), written once by a preprocessing step.  Gradient
+accumulation, bf16 autocast, torch.compile and the Adam implementation are
+set through train_options.TrainOptions (--grad-accum, --bf16, --compile,
+--optimizer).
 """
 
+import argparse
+import hashlib
 import json
 import os
-import random
 from pathlib import Path
 
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+from toy_data import (
+    IGNORE_INDEX, BatchLoader, Throughput, count_trained_tokens, pack_documents, pad_sequences,
+)
+from toy_tokenizer import ByteTokenizer, encode_corpus, load_or_train_bpe
+from token_shards import ShardDataset, read_index, write_shards
+from train_options import OPTIMIZER_IMPLS, TrainOptions
+
 
 # ──────────────────────────────────────────────
 # TINY MODEL
@@ -37,20 +59,26 @@ import torch.nn.functional as F
 # trivial so you can focus on the training phases,
 # not the architecture.
 
-VOCAB_SIZE = 64        # tiny vocabulary
+BYTE_IDS = 64          # byte-level ids: ord(c) % 64
+PAD_ID = BYTE_IDS      # padding — never trained on; reserved above the byte ids
+SEP_ID = BYTE_IDS + 1  # document separator; reserved, so no character collides with it
+VOCAB_SIZE = BYTE_IDS + 2   # tiny vocabulary: bytes + pad + sep (BPE adds merged ids on top)
 EMBED_DIM = 32         # embedding dimension
 HIDDEN_DIM = 64        # hidden layer size
-SEQ_LEN = 8           # sequence length for training
+SEQ_LEN = 8           # sequence (packed block) length for training
+BATCH_SIZE = 4         # sequences per optimizer step
+SEED = 0               # model init + data order are reproducible
 
 
 class TinyLM(nn.Module):
     """Minimal language model: embed -> linear -> project to vocab."""
 
-    def __init__(self):
+    def __init__(self, vocab_size=VOCAB_SIZE, embed_dim=EMBED_DIM, hidden_dim=HIDDEN_DIM):
         super().__init__()
-        self.embed = nn.Embedding(VOCAB_SIZE, EMBED_DIM)
-        self.hidden = nn.Linear(EMBED_DIM, HIDDEN_DIM)
-        self.head = nn.Linear(HIDDEN_DIM, VOCAB_SIZE)
+        self.vocab_size = vocab_size
+        self.embed = nn.Embedding(vocab_size, embed_dim)
+        self.hidden = nn.Linear(embed_dim, hidden_dim)
+        self.head = nn.Linear(hidden_dim, vocab_size)
 
     def forward(self, token_ids):
         """
@@ -62,38 +90,72 @@ class TinyLM(nn.Module):
         logits = self.head(x)             # [batch, seq, vocab]
         return logits
 
-    def score_sequence(self, token_ids):
+    def score_sequence(self, token_ids, labels=None):
         """
         Returns the average log-probability of the sequence.
         Used in the DPO alignment phase to score chosen vs rejected.
+
+        labels: optional, same shape as token_ids; positions set to
+        IGNORE_INDEX (padding, prompt) are left out of the average.
         """
-        logits = self.forward(token_ids)                       # [batch, seq, vocab]
-        # Shift: predict token t+1 from position t
-        log_probs = F.log_softmax(logits[:, :-1, :], dim=-1)  # [batch, seq-1, vocab]
-        targets = token_ids[:, 1:]                             # [batch, seq-1]
-        # Gather the log-prob of each actual next token
-        token_log_probs = log_probs.gather(2, targets.unsqueeze(-1)).squeeze(-1)
-        return token_log_probs.mean(dim=-1)                    # [batch] average log-prob
+        return sequence_log_probs(self.forward(token_ids), token_ids, labels)
+
+
+def sequence_log_probs(logits, token_ids, labels=None):
+    """
+    Average next-token log-prob per sequence, from logits [batch, seq, vocab].
+
+    Separate from the model so a wrapped model (DDP) can be called through
+    its own forward() — which is what triggers the gradient all-reduce.
+    """
+    # Shift: predict token t+1 from position t
+    log_probs = F.log_softmax(logits[:, :-1, :], dim=-1)  # [batch, seq-1, vocab]
+    targets = (token_ids if labels is None else labels)[:, 1:]   # [batch, seq-1]
+    mask = (targets != IGNORE_INDEX).to(log_probs.dtype)
+    # Gather the log-prob of each actual next token (ignored ones -> index 0, masked out)
+    token_log_probs = log_probs.gather(2, targets.clamp(min=0).unsqueeze(-1)).squeeze(-1)
+    return (token_log_probs * mask).sum(-1) / mask.sum(-1).clamp(min=1)  # [batch] average log-prob
 
 
 # ──────────────────────────────────────────────
 # HELPER: text <-> tokens (toy tokenizer)
 # ──────────────────────────────────────────────
 # Real tokenizers (BPE, SentencePiece) map text to subword IDs.
-# Ours just maps each character to a number mod VOCAB_SIZE.
-
-def text_to_ids(text, length=SEQ_LEN):
-    """Convert a string to a list of token IDs (fixed length)."""
-    ids = [ord(c) % VOCAB_SIZE for c in text]
+# Ours just maps each character to a number mod BYTE_IDS; toy_tokenizer
+# does the same for a whole corpus at once, and adds a trainable BPE.
+
+def text_to_ids(text, length=SEQ_LEN, tokenizer=None):
+    """Convert a string to a list of token IDs (fixed length; length=None keeps it all)."""
+    if tokenizer is None:
+        ids = [ord(c) % BYTE_IDS for c in text]
+    else:
+        ids = tokenizer.encode(text).tolist()
+    if length is None:
+        return ids
     # Pad or truncate to fixed length
     ids = ids[:length]
-    ids += [0] * (length - len(ids))
+    ids += [PAD_ID] * (length - len(ids))
     return ids
 
 
+def next_token_loss(logits, labels):
+    """Cross-entropy of position t predicting labels[t+1], skipping IGNORE_INDEX targets."""
+    pred = logits[:, :-1, :].reshape(-1, logits.size(-1))
+    target = labels[:, 1:].reshape(-1)
+    total = F.cross_entropy(pred, target, ignore_index=IGNORE_INDEX, reduction="sum")
+    # Mean over trained targets; a (micro-)batch of prompt-only blocks has
+    # none, and would otherwise give 0/0 = NaN
+    return total / (target != IGNORE_INDEX).sum().clamp(min=1)
+
+
+def encode_texts(texts, tokenizer=None, cache_dir=None):
+    """Bulk-encode texts -> one int64 array per text (cached on disk if cache_dir)."""
+    return encode_corpus(texts, tokenizer or ByteTokenizer(BYTE_IDS), cache_dir)
+
+
 def ids_to_text(ids):
     """Convert token IDs back to a rough string (for display only)."""
-    return "".join(chr((i % 26) + ord('a')) for i in ids if i != 0)
+    return "".join(chr((i % 26) + ord('a')) for i in ids if i not in (PAD_ID, SEP_ID))
 
 
 # ──────────────────────────────────────────────
@@ -106,12 +168,12 @@ def ids_to_text(ids):
 #          learning grammar and facts, but not
 #          how to answer questions.
 
-def build_pretrain_dataset():
+def pretrain_corpus():
     """
     Toy 'web crawl' — raw text the model learns patterns from.
     In real training: trillions of tokens from web, code, books.
     """
-    raw_texts = [
+    return [
         "the cat sat on the mat and looked around",
         "customer support helps people solve problems",
         "machine learning models learn from data",
@@ -121,47 +183,92 @@ def build_pretrain_dataset():
         "the quick brown fox jumps over the lazy dog",
         "training a model requires data and compute",
     ]
-    # Convert to token IDs
-    return [torch.tensor([text_to_ids(t)]) for t in raw_texts]
 
 
-def train_pretrain(model, dataset, steps=50, lr=0.01):
+def build_pretrain_dataset(tokenizer=None, cache_dir=None):
+    """Tokenize the pre-training corpus and pack it into training blocks."""
+    # Convert to token IDs and pack: text <sep> text <sep> ... cut into
+    # full SEQ_LEN blocks, so nothing is truncated and only the last
+    # block has padding.  Returns (ids, labels), each [num_blocks, SEQ_LEN].
+    docs = encode_texts(pretrain_corpus(), tokenizer, cache_dir)
+    return pack_documents(docs, SEQ_LEN, sep_id=SEP_ID, pad_id=PAD_ID)
+
+
+def load_pretrain_shards(shard_dir, tokenizer=None, cache_dir=None, *,
+                         rank=0, world_size=1, shard_tokens=1 << 20):
+    """
+    Pre-training data as memory-mapped shards (this rank's part of them).
+
+    The preprocessing step (tokenize + write shards of the toy corpus) runs
+    only if the directory holds no shards yet; every later run just maps the
+    files.  Existing shards — e.g. a real corpus written by token_shards.py —
+    are never overwritten: if they were written with a different tokenizer
+    this raises instead.  In real training preprocessing is a separate
+    offline job over the whole corpus.
+    """
+    tokenizer = tokenizer or ByteTokenizer(BYTE_IDS)
+    config = json.loads(json.dumps(tokenizer.config()))   # normalized as stored in the index
+    index = read_index(shard_dir)
+    if index is None:
+        if rank != 0:
+            raise RuntimeError(f"no shards in {shard_dir}; preprocess on rank 0 first")
+        write_shards(encode_texts(pretrain_corpus(), tokenizer, cache_dir), shard_dir,
+                     vocab_size=tokenizer.vocab_size, sep_id=tokenizer.sep_id,
+                     shard_tokens=shard_tokens, metadata={"tokenizer": config})
+    else:
+        stored = index["metadata"].get("tokenizer")
+        if (stored is not None and stored != config) or index["vocab_size"] != tokenizer.vocab_size:
+            raise ValueError(
+                f"shards in {shard_dir} were written with tokenizer {stored or index['vocab_size']!r}, "
+                f"not {config!r}; re-run token_shards.py into a new directory")
+    return ShardDataset(shard_dir, SEQ_LEN, rank=rank, world_size=world_size)
+
+
+def train_pretrain(model, dataset, steps=50, lr=0.01, batch_size=BATCH_SIZE, seed=SEED,
+                   options=None):
     """
     Pre-training loop: next-token prediction.
 
-    For each text sequence:
+    For each batch of packed blocks:
       - Input:  tokens [0, 1, 2, ..., N-1]
       - Target: tokens [1, 2, 3, ..., N]
-      - Loss:   cross-entropy(predicted[t], actual[t+1])
+      - Loss:   cross-entropy(predicted[t], actual[t+1]), padding skipped
 
     This is how GPT, Llama, Claude, etc. are pre-trained.
     The only difference: scale (trillions of tokens, months, 10K+ GPUs).
+
+    options: TrainOptions (grad accumulation, bf16, compile, Adam impl).
+    batch_size is per optimizer step, split across accumulation steps.
     """
-    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    opts = options or TrainOptions()
+    optimizer = opts.make_optimizer(model.parameters(), lr)
+    loader = BatchLoader(dataset, opts.micro_batch_size(batch_size), seed=seed)
+    forward = opts.prepare(model)
+    meter = Throughput()
 
     print("=" * 55)
     print("  PHASE 1: PRE-TRAINING (self-supervised)")
     print("  Objective: next-token prediction")
     print("=" * 55)
 
-    for step in range(steps):
-        sample = random.choice(dataset)         # pick a random text
-        logits = model(sample)                  # [1, seq, vocab]
-
-        # Shift: predict token t+1 from position t
-        pred = logits[:, :-1, :].reshape(-1, VOCAB_SIZE)
-        target = sample[:, 1:].reshape(-1)
-
-        loss = F.cross_entropy(pred, target)
-
+    for step, epoch, micro_batches in opts.micro_batches(loader, steps):
         optimizer.zero_grad()
-        loss.backward()                         # compute gradients
+        step_loss = 0.0
+        for micro_step, (batch, labels) in enumerate(micro_batches):
+            with opts.sync_context(model, micro_step):
+                with opts.autocast():
+                    logits = forward(batch)     # [batch, seq, vocab]
+                    # Shift: predict token t+1 from position t (pads ignored)
+                    loss = next_token_loss(logits, labels) / opts.grad_accum_steps
+                loss.backward()                 # compute gradients (summed over micro-batches)
+            step_loss += loss.detach()
+            meter.add(batch.numel(), count_trained_tokens(labels))
         optimizer.step()                        # update ALL weights
 
         if step % 10 == 0:
-            print(f"  step {step:3d}  loss={loss.item():.4f}")
+            print(f"  step {step:3d}  epoch {epoch:2d}  loss={float(step_loss):.4f}")
 
-    print("  Pre-training complete.\n")
+    print(f"  Pre-training complete ({opts.describe()}): {meter.summary()}\n")
     return model
 
 
@@ -174,10 +281,14 @@ def train_pretrain(model, dataset, steps=50, lr=0.01):
 # Analogy: The student now gets a tutor who shows
 #          "when asked X, answer Y."
 
-def build_sft_dataset():
+def build_sft_dataset(response_only=True, tokenizer=None, cache_dir=None):
     """
     Toy instruction-response pairs.
     In real training: 100K–10M pairs, human + synthetic.
+
+    response_only: mask the instruction out of the loss, so the model is
+    trained to produce responses rather than to predict user prompts
+    (the default in most SFT trainers).
     """
     pairs = [
         ("greet the customer", "hello how can i help you today"),
@@ -186,17 +297,20 @@ def build_sft_dataset():
         ("confirm refund", "your refund has been processed successfully"),
         ("say goodbye", "thank you for contacting us have a great day"),
     ]
-    dataset = []
-    for instruction, response in pairs:
-        # Combine instruction + response into one sequence
-        # (real SFT formats this as a chat template)
-        combined = instruction + " -> " + response
-        ids = torch.tensor([text_to_ids(combined, length=SEQ_LEN)])
-        dataset.append(ids)
-    return dataset
-
-
-def train_sft(model, dataset, steps=40, lr=0.005):
+    # Combine instruction + response into one sequence
+    # (real SFT formats this as a chat template)
+    prompts = encode_texts([instruction + " -> " for instruction, _ in pairs], tokenizer, cache_dir)
+    responses = encode_texts([response for _, response in pairs], tokenizer, cache_dir)
+    docs, masks = [], []
+    for prompt_ids, response_ids in zip(prompts, responses):
+        docs.append(np.concatenate([prompt_ids, response_ids]))
+        masks.append([0 if response_only else 1] * len(prompt_ids) + [1] * len(response_ids))
+    # Packed like pre-training: (ids, labels), each [num_blocks, SEQ_LEN]
+    return pack_documents(docs, SEQ_LEN, sep_id=SEP_ID, pad_id=PAD_ID, masks=masks)
+
+
+def train_sft(model, dataset, steps=40, lr=0.005, batch_size=BATCH_SIZE, seed=SEED,
+              options=None):
     """
     SFT loop: same loss as pre-training (next-token prediction),
     but on INSTRUCTION data instead of raw text.
@@ -207,30 +321,35 @@ def train_sft(model, dataset, steps=40, lr=0.005):
       - Much smaller dataset, much fewer steps
       - Typically uses the pre-trained checkpoint as starting point
     """
-    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    opts = options or TrainOptions()
+    optimizer = opts.make_optimizer(model.parameters(), lr)
+    loader = BatchLoader(dataset, opts.micro_batch_size(batch_size), seed=seed)
+    forward = opts.prepare(model)
+    meter = Throughput()
 
     print("=" * 55)
     print("  PHASE 2: SFT (supervised fine-tuning)")
     print("  Objective: learn instruction-following format")
     print("=" * 55)
 
-    for step in range(steps):
-        sample = random.choice(dataset)
-        logits = model(sample)
-
-        pred = logits[:, :-1, :].reshape(-1, VOCAB_SIZE)
-        target = sample[:, 1:].reshape(-1)
-
-        loss = F.cross_entropy(pred, target)
-
+    for step, epoch, micro_batches in opts.micro_batches(loader, steps):
         optimizer.zero_grad()
-        loss.backward()
+        step_loss = 0.0
+        for micro_step, (batch, labels) in enumerate(micro_batches):
+            with opts.sync_context(model, micro_step):
+                with opts.autocast():
+                    logits = forward(batch)
+                    # response tokens only, by default
+                    loss = next_token_loss(logits, labels) / opts.grad_accum_steps
+                loss.backward()
+            step_loss += loss.detach()
+            meter.add(batch.numel(), count_trained_tokens(labels))
         optimizer.step()
 
         if step % 10 == 0:
-            print(f"  step {step:3d}  loss={loss.item():.4f}")
+            print(f"  step {step:3d}  epoch {epoch:2d}  loss={float(step_loss):.4f}")
 
-    print("  SFT complete.\n")
+    print(f"  SFT complete ({opts.describe()}): {meter.summary()}\n")
     return model
 
 
@@ -243,7 +362,7 @@ def train_sft(model, dataset, steps=40, lr=0.005):
 # Analogy: The tutor now shows pairs of answers:
 #          "This one is better than that one. Learn why."
 
-def build_preference_dataset():
+def build_preference_dataset(tokenizer=None, cache_dir=None):
     """
     Toy preference triplets: (prompt, chosen, rejected).
     In real training: 500K–5M pairs from human annotators or AI judges.
@@ -270,15 +389,89 @@ def build_preference_dataset():
             "are you sure it is wrong",                    # rejected
         ),
     ]
-    dataset = []
-    for prompt, chosen, rejected in triplets:
-        p_ids = torch.tensor([text_to_ids(prompt + " -> " + chosen, SEQ_LEN)])
-        r_ids = torch.tensor([text_to_ids(prompt + " -> " + rejected, SEQ_LEN)])
-        dataset.append((p_ids, r_ids))
-    return dataset
+    prompts, chosens, rejecteds = (
+        encode_texts(column, tokenizer, cache_dir)
+        for column in ([p + " -> " for p, _, _ in triplets],
+                       [c for _, c, _ in triplets],
+                       [r for _, _, r in triplets])
+    )
+    chosen_seqs, rejected_seqs, chosen_masks, rejected_masks = [], [], [], []
+    for prompt_ids, chosen_ids, rejected_ids in zip(prompts, chosens, rejecteds):
+        for seqs, masks, response_ids in ((chosen_seqs, chosen_masks, chosen_ids),
+                                          (rejected_seqs, rejected_masks, rejected_ids)):
+            seqs.append(np.concatenate([prompt_ids, response_ids]))
+            # Score the RESPONSE only: the shared prompt cancels out anyway
+            masks.append([0] * len(prompt_ids) + [1] * len(response_ids))
+    # Not packed — each pair must stay its own row.  Full length (no
+    # truncation to SEQ_LEN, which would cut off the responses entirely),
+    # padded to the longest; row i of every tensor is the same prompt.
+    # Chosen and rejected share one length so a step can score both in a
+    # single forward pass.
+    ids, labels = pad_sequences(chosen_seqs + rejected_seqs, pad_id=PAD_ID,
+                                masks=chosen_masks + rejected_masks)
+    chosen_ids, rejected_ids = ids.chunk(2)
+    chosen_labels, rejected_labels = labels.chunk(2)
+    return chosen_ids, chosen_labels, rejected_ids, rejected_labels
+
+
+def _reference_key(ref_model, dataset, bf16):
+    """Hash of the reference weights, the preference data and the precision."""
+    digest = hashlib.sha256(b"bf16" if bf16 else b"fp32")
+    for name, tensor in sorted(ref_model.state_dict().items()) + list(enumerate(dataset)):
+        digest.update(f"{name}:{tuple(tensor.shape)}:{tensor.dtype}\0".encode())
+        digest.update(tensor.detach().contiguous().view(torch.uint8).numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+@torch.no_grad()
+def add_reference_log_probs(ref_model, dataset, batch_size=256, cache_dir=None, bf16=False):
+    """
+    Score every preference pair under the frozen reference model — once.
+
+    The reference never changes during DPO, so re-running it every step
+    (a second full forward per step, and a second model in memory) is pure
+    waste.  Instead the whole dataset is scored up front in large batches
+    and the scores ride along with the data:
 
+        (chosen_ids, chosen_labels, rejected_ids, rejected_labels)
+          -> (..., ref_chosen, ref_rejected)        # [num_pairs] float32 each
 
-def train_align_dpo(model, dataset, steps=30, lr=0.001, beta=0.1):
+    bf16 scores under the same autocast as a bf16 policy, so the two start
+    out equal (log-ratio 0).  With cache_dir, the scores are stored as
+    ref-logps-<key>.pt, keyed by the reference weights + data + precision,
+    and later runs just load them.
+    """
+    chosen_ids, chosen_labels, rejected_ids, rejected_labels = dataset[:4]
+    path = None
+    if cache_dir is not None:
+        path = Path(cache_dir) / f"ref-logps-{_reference_key(ref_model, dataset[:4], bf16)}.pt"
+        if path.exists():
+            ref_chosen, ref_rejected = torch.load(path, weights_only=True)
+            return (*dataset[:4], ref_chosen, ref_rejected)
+
+    was_training = ref_model.training
+    ref_model.eval()
+    # Same single-forward layout as the training step: chosen rows, then rejected
+    ids = torch.cat([chosen_ids, rejected_ids])
+    labels = torch.cat([chosen_labels, rejected_labels])
+    with torch.autocast("cpu", dtype=torch.bfloat16, enabled=bf16):
+        scores = torch.cat([
+            ref_model.score_sequence(ids[i:i + batch_size], labels[i:i + batch_size]).float()
+            for i in range(0, len(ids), batch_size)
+        ])
+    ref_model.train(was_training)
+    ref_chosen, ref_rejected = scores.chunk(2)
+
+    if path is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")    # atomic: ranks may race
+        torch.save((ref_chosen, ref_rejected), tmp)
+        os.replace(tmp, path)
+    return (*dataset[:4], ref_chosen, ref_rejected)
+
+
+def train_align_dpo(model, dataset, steps=30, lr=0.001, beta=0.1,
+                    batch_size=BATCH_SIZE, seed=SEED, options=None, cache_dir=None):
     """
     DPO alignment loop (simplified).
 
@@ -290,62 +483,79 @@ def train_align_dpo(model, dataset, steps=30, lr=0.001, beta=0.1):
          reference does, relative to "rejected"
 
     Simplified here:
-      - We use a frozen copy of the model as the reference
+      - The reference is the model as it enters this phase (the SFT
+        checkpoint).  Its scores are computed once, before the first step
+        (add_reference_log_probs) — no frozen copy in the training loop
       - The DPO loss increases chosen probability and decreases rejected
 
+    dataset: build_preference_dataset()'s 4 tensors, or the 6 returned by
+    add_reference_log_probs when the reference scores are precomputed.
+
     Why no reward model:
       DPO bakes the preference signal directly into the loss function.
       This is why it's simpler and cheaper than PPO-based RLHF.
     """
-    # Freeze a copy as the reference model (anchor)
-    ref_model = TinyLM()
-    ref_model.load_state_dict(model.state_dict())
-    ref_model.eval()
-    for p in ref_model.parameters():
-        p.requires_grad = False
+    opts = options or TrainOptions()
+    # Reference scores (the anchor): the model before any DPO update
+    if len(dataset) == 4:
+        base = getattr(model, "module", model)    # unwrap DDP
+        dataset = add_reference_log_probs(base, dataset, cache_dir=cache_dir, bf16=opts.bf16)
 
-    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    optimizer = opts.make_optimizer(model.parameters(), lr)
+    loader = BatchLoader(dataset, opts.micro_batch_size(batch_size), seed=seed)
+    forward = opts.prepare(model)
+    meter = Throughput()
 
     print("=" * 55)
     print("  PHASE 3: ALIGNMENT (DPO-style preference optimization)")
     print("  Objective: prefer chosen over rejected responses")
     print("=" * 55)
 
-    for step in range(steps):
-        chosen_ids, rejected_ids = random.choice(dataset)
-
-        # Score sequences under the policy (model being trained)
-        policy_chosen_score = model.score_sequence(chosen_ids)
-        policy_rejected_score = model.score_sequence(rejected_ids)
-
-        # Score sequences under the reference (frozen copy)
-        with torch.no_grad():
-            ref_chosen_score = ref_model.score_sequence(chosen_ids)
-            ref_rejected_score = ref_model.score_sequence(rejected_ids)
-
-        # DPO loss (simplified):
-        #   log_ratio_chosen  = policy(chosen)  - ref(chosen)
-        #   log_ratio_rejected = policy(rejected) - ref(rejected)
-        #   loss = -log(sigmoid(beta * (log_ratio_chosen - log_ratio_rejected)))
-        #
-        # In words: "Make the policy prefer chosen over rejected
-        #            MORE than the reference model does."
-
-        chosen_diff = policy_chosen_score - ref_chosen_score
-        rejected_diff = policy_rejected_score - ref_rejected_score
-        logits_diff = beta * (chosen_diff - rejected_diff)
-        loss = -F.logsigmoid(logits_diff).mean()
-
+    for step, epoch, micro_batches in opts.micro_batches(loader, steps):
         optimizer.zero_grad()
-        loss.backward()
+        step_loss, chosen_adv, rejected_adv = 0.0, 0.0, 0.0
+        for micro_step, batch in enumerate(micro_batches):
+            chosen_ids, chosen_labels, rejected_ids, rejected_labels, ref_chosen_score, ref_rejected_score = batch
+
+            # Chosen and rejected go through the model as ONE batch: one
+            # forward per step (half the kernel launches, and what DDP expects)
+            both_ids = torch.cat([chosen_ids, rejected_ids])
+            both_labels = torch.cat([chosen_labels, rejected_labels])
+
+            with opts.sync_context(model, micro_step):
+                with opts.autocast():
+                    # Score sequences under the policy (model being trained)
+                    policy_scores = sequence_log_probs(forward(both_ids), both_ids, both_labels)
+                    policy_chosen_score, policy_rejected_score = policy_scores.float().chunk(2)
+                # Reference scores were precomputed — read from the batch
+
+                # DPO loss (simplified):
+                #   log_ratio_chosen  = policy(chosen)  - ref(chosen)
+                #   log_ratio_rejected = policy(rejected) - ref(rejected)
+                #   loss = -log(sigmoid(beta * (log_ratio_chosen - log_ratio_rejected)))
+                #
+                # In words: "Make the policy prefer chosen over rejected
+                #            MORE than the reference model does."
+
+                chosen_diff = policy_chosen_score - ref_chosen_score
+                rejected_diff = policy_rejected_score - ref_rejected_score
+                logits_diff = beta * (chosen_diff - rejected_diff)
+                loss = -F.logsigmoid(logits_diff).mean() / opts.grad_accum_steps
+
+                loss.backward()
+            step_loss += loss.detach()
+            chosen_adv += chosen_diff.detach().mean() / opts.grad_accum_steps
+            rejected_adv += rejected_diff.detach().mean() / opts.grad_accum_steps
+            meter.add(chosen_ids.numel() + rejected_ids.numel(),
+                      count_trained_tokens(chosen_labels) + count_trained_tokens(rejected_labels))
         optimizer.step()
 
         if step % 10 == 0:
-            print(f"  step {step:3d}  loss={loss.item():.4f}"
-                  f"  chosen_adv={chosen_diff.item():.3f}"
-                  f"  rejected_adv={rejected_diff.item():.3f}")
+            print(f"  step {step:3d}  epoch {epoch:2d}  loss={float(step_loss):.4f}"
+                  f"  chosen_adv={float(chosen_adv):.3f}"
+                  f"  rejected_adv={float(rejected_adv):.3f}")
 
-    print("  Alignment complete.\n")
+    print(f"  Alignment complete ({opts.describe()}): {meter.summary()}\n")
     return model
 
 
@@ -353,7 +563,7 @@ def train_align_dpo(model, dataset, steps=30, lr=0.001, beta=0.1):
 # EVALUATION: Show behavior across phases
 # ──────────────────────────────────────────────
 
-def evaluate_model(model, label, prompts):
+def evaluate_model(model, label, prompts, tokenizer=None):
     """
     Show the model's 'response' to each prompt.
     Uses argmax over logits (greedy decoding) — not real generation,
@@ -363,7 +573,7 @@ def evaluate_model(model, label, prompts):
     model.eval()
     with torch.no_grad():
         for prompt_text in prompts:
-            ids = torch.tensor([text_to_ids(prompt_text, SEQ_LEN)])
+            ids = torch.tensor([text_to_ids(prompt_text, SEQ_LEN, tokenizer)])
             logits = model(ids)
             # Take argmax of last few positions as "response"
             predicted_ids = logits[0, -4:, :].argmax(dim=-1).tolist()
@@ -402,7 +612,26 @@ def load_checkpoint(model, phase_name, output_dir="./toy_checkpoints"):
 # MAIN: Run all three phases
 # ──────────────────────────────────────────────
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Three-phase training toy: pre-train -> SFT -> DPO.")
+    parser.add_argument("--tokenizer", choices=("byte", "bpe"), default="byte",
+                        help="byte-level ids, or a BPE trained on the pre-training corpus")
+    parser.add_argument("--bpe-vocab", type=int, default=128, help="BPE vocabulary size")
+    parser.add_argument("--cache-dir", default="./toy_cache",
+                        help="where tokenized corpora (and the trained BPE) are cached")
+    parser.add_argument("--no-cache", action="store_true", help="always re-tokenize")
+    parser.add_argument("--shards", metavar="DIR",
+                        help="pre-train from memory-mapped token shards in DIR (written on first use)")
+    parser.add_argument("--grad-accum", type=int, default=1, help=f"micro-batches per optimizer step (must divide the batch size, {BATCH_SIZE})")
+    parser.add_argument("--bf16", action="store_true", help="bf16 autocast for forward passes")
+    parser.add_argument("--compile", action="store_true", help="torch.compile the model")
+    parser.add_argument("--optimizer", choices=OPTIMIZER_IMPLS, default="default",
+                        help="Adam implementation")
+    args = parser.parse_args(argv)
+    cache_dir = None if args.no_cache else args.cache_dir
+    options = TrainOptions(grad_accum_steps=args.grad_accum, bf16=args.bf16,
+                           compile=args.compile, optimizer_impl=args.optimizer)
+
     print("\n" + "=" * 55)
     print("  THREE-PHASE TRAINING TOY EXAMPLE")
     print("  Pre-train -> SFT -> Align (DPO)")
@@ -415,28 +644,43 @@ def main():
         "product broke",
     ]
 
+    torch.manual_seed(SEED)  # model init; data order is seeded by each loader
+
+    # ── Tokenizer ────────────────────────────
+    # Trained (BPE) on the pre-training corpus, then shared by every phase
+    tokenizer = ByteTokenizer(BYTE_IDS)
+    if args.tokenizer == "bpe":
+        tokenizer = load_or_train_bpe(pretrain_corpus(), args.bpe_vocab, cache_dir, base=tokenizer)
+    print(f"  Tokenizer: {args.tokenizer} ({tokenizer.vocab_size} ids), "
+          f"cache: {cache_dir or 'off'}\n")
+
     # ── Phase 1: Pre-training ────────────────
-    model = TinyLM()
-    pretrain_data = build_pretrain_dataset()
-    model = train_pretrain(model, pretrain_data, steps=50)
+    model = TinyLM(tokenizer.vocab_size)
+    if args.shards:
+        pretrain_data = load_pretrain_shards(args.shards, tokenizer, cache_dir)
+        print(f"  Pre-training data: {pretrain_data.num_tokens:,} tokens memory-mapped "
+              f"from {len(pretrain_data.memmaps)} shard(s) in {args.shards}\n")
+    else:
+        pretrain_data = build_pretrain_dataset(tokenizer, cache_dir)
+    model = train_pretrain(model, pretrain_data, steps=50, options=options)
     save_checkpoint(model, "pretrained")
-    evaluate_model(model, "After Pre-training", eval_prompts)
+    evaluate_model(model, "After Pre-training", eval_prompts, tokenizer)
 
     # ── Phase 2: SFT ─────────────────────────
     # Start from the pre-trained checkpoint (not from scratch!)
     model = load_checkpoint(model, "pretrained")
-    sft_data = build_sft_dataset()
-    model = train_sft(model, sft_data, steps=40)
+    sft_data = build_sft_dataset(tokenizer=tokenizer, cache_dir=cache_dir)
+    model = train_sft(model, sft_data, steps=40, options=options)
     save_checkpoint(model, "sft")
-    evaluate_model(model, "After SFT", eval_prompts)
+    evaluate_model(model, "After SFT", eval_prompts, tokenizer)
 
     # ── Phase 3: Alignment (DPO) ─────────────
     # Start from the SFT checkpoint (not from scratch!)
     model = load_checkpoint(model, "sft")
-    pref_data = build_preference_dataset()
-    model = train_align_dpo(model, pref_data, steps=30)
+    pref_data = build_preference_dataset(tokenizer, cache_dir)
+    model = train_align_dpo(model, pref_data, steps=30, options=options, cache_dir=cache_dir)
     save_checkpoint(model, "aligned")
-    evaluate_model(model, "After Alignment (DPO)", eval_prompts)
+    evaluate_model(model, "After Alignment (DPO)", eval_prompts, tokenizer)
 
     # ── Summary ──────────────────────────────
     print("=" * 55)
@@ -466,13 +710,18 @@ if __name__ == "__main__":
 #
 # Run:
 #   python three_phase_training_toy.py
+#   python three_phase_training_toy.py --tokenizer bpe --bpe-vocab 128
+#   python three_phase_training_toy.py --shards ./toy_shards
+#   python three_phase_training_toy.py --grad-accum 2 --bf16 --optimizer fused
 #
 # What to observe:
-#   - Loss decreases in each phase
+#   - Loss decreases in each phase (and two runs print identical losses)
+#   - tokens/sec at the end of each phase
 #   - Output tokens shift across phases (different objectives)
 #   - Checkpoints are saved after each phase
 #   - Phase 2 starts from phase 1 checkpoint (not random)
 #   - Phase 3 starts from phase 2 checkpoint (not random)
+#   - Phase 3 scores its reference once up front (toy_cache/ref-logps-*.pt)
 #
 # This is a toy — in real training:
 #   - Model is a transformer with billions of parameters
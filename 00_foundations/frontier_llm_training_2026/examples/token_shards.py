@@ -0,0 +1,247 @@
+"""
+Memory-Mapped Token Shards for the Training Toy
+================================================
+
+Companion module for three_phase_training_toy.py.
+
+Real pre-training corpora (trillions of tokens) never fit in RAM, and
+re-tokenizing them per run is out of the question.  Megatron, nanoGPT and
+friends all use the same recipe, reproduced here:
+
+  1. PREPROCESS ONCE: tokenize, concatenate documents with a separator and
+     write the ids as flat binary shards (uint16 when the vocabulary fits,
+     else uint32) plus a small index.json describing them.
+  2. TRAIN: open the shards with np.memmap — "loading" is an mmap() call,
+     no matter how large the corpus — and read random fixed-length windows.
+     Only the pages a batch touches are read from disk (the OS page cache
+     does the rest).
+  3. DATA PARALLEL: each rank reads its own disjoint, equally sized part —
+     whole shards when they split evenly across ranks (by window count),
+     otherwise every world_size-th window.  Equal parts matter: a rank with
+     more windows would run more steps than the others.
+
+Layout:
+    shards/
+      index.json          {"dtype": "uint16", "vocab_size": 66, "shards": [{"file": ..., "tokens": N}, ...]}
+      shard-00000.bin     raw ids, doc <sep> doc <sep> ...
+      shard-00001.bin
+
+Usage:
+    tok = ByteTokenizer()                 # sep_id is reserved outside the byte ids
+    with ShardWriter("shards", vocab_size=tok.vocab_size, sep_id=tok.sep_id) as writer:
+        for ids in encoded_docs:
+            writer.add(ids)
+    data = ShardDataset("shards", block_len=8, rank=0, world_size=1)
+    loader = BatchLoader(data, batch_size=4)        # gathers windows from the memmaps
+
+Preprocess a text file (one document per line):
+    python token_shards.py corpus.txt --out shards --shard-tokens 1000000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+
+INDEX_FILE = "index.json"
+
+
+def token_dtype(vocab_size):
+    """Smallest unsigned dtype holding every id: halves disk + page cache vs int32."""
+    return np.uint16 if vocab_size <= 2**16 else np.uint32
+
+
+# ──────────────────────────────────────────────
+# WRITING (preprocessing step)
+# ──────────────────────────────────────────────
+# Streams: documents are appended to an in-memory buffer that is flushed
+# to disk every `shard_tokens` ids, so memory stays bounded by one shard
+# however large the corpus.  The index is written last (atomically) —
+# a directory without index.json is an unfinished write.
+
+class ShardWriter:
+    """Append tokenized documents; writes shard-NNNNN.bin files + index.json."""
+
+    def __init__(self, out_dir, *, vocab_size, sep_id, shard_tokens=1 << 20, metadata=None):
+        if not 0 <= sep_id < vocab_size:
+            raise ValueError(f"sep_id {sep_id} not in [0, {vocab_size})")
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.vocab_size = vocab_size
+        self.sep_id = sep_id
+        self.shard_tokens = shard_tokens
+        self.metadata = metadata or {}     # e.g. the tokenizer config, stored in the index
+        self.dtype = token_dtype(vocab_size)
+        self.shards = []
+        self.num_docs = 0
+        self._buffer = []
+        self._buffered = 0
+
+    def add(self, ids):
+        """Append one document (ids), followed by the separator."""
+        ids = np.asarray(ids)
+        if len(ids) and (ids.min() < 0 or ids.max() >= self.vocab_size):
+            raise ValueError(f"token ids must be in [0, {self.vocab_size})")
+        self._buffer += [ids.astype(self.dtype), np.array([self.sep_id], dtype=self.dtype)]
+        self._buffered += len(ids) + 1
+        self.num_docs += 1
+        if self._buffered >= self.shard_tokens:
+            stream = np.concatenate(self._buffer)
+            while len(stream) >= self.shard_tokens:
+                self._write_shard(stream[:self.shard_tokens])
+                stream = stream[self.shard_tokens:]
+            self._buffer, self._buffered = [stream], len(stream)
+
+    def _write_shard(self, ids):
+        name = f"shard-{len(self.shards):05d}.bin"
+        ids.tofile(self.out_dir / name)
+        self.shards.append({"file": name, "tokens": int(len(ids))})
+
+    def close(self):
+        if self._buffered:
+            self._write_shard(np.concatenate(self._buffer))
+            self._buffer, self._buffered = [], 0
+        index = {
+            "dtype": np.dtype(self.dtype).name,
+            "vocab_size": self.vocab_size,
+            "sep_id": self.sep_id,
+            "num_docs": self.num_docs,
+            "shards": self.shards,
+            "metadata": self.metadata,
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.out_dir, suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp, self.out_dir / INDEX_FILE)
+        return index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+def write_shards(docs, out_dir, *, vocab_size, sep_id, shard_tokens=1 << 20, metadata=None):
+    """Write an iterable of tokenized documents as shards; returns the index."""
+    writer = ShardWriter(out_dir, vocab_size=vocab_size, sep_id=sep_id,
+                         shard_tokens=shard_tokens, metadata=metadata)
+    for ids in docs:
+        writer.add(ids)
+    return writer.close()
+
+
+def read_index(shard_dir):
+    """The shard index, or None if the shards were never (completely) written."""
+    path = Path(shard_dir) / INDEX_FILE
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+# ──────────────────────────────────────────────
+# READING (training)
+# ──────────────────────────────────────────────
+# Example i is a window of block_len ids.  Windows are cut at a fixed
+# stride inside each shard (never across shards), so an example's location
+# is pure arithmetic: (shard, start) from i — no per-example index on disk.
+# Every rank gets the same number of windows: whole shards only when
+# shards[rank::world_size] hold equally many on every rank, else window
+# striding, which drops the last (total % world_size) windows.
+
+class ShardDataset:
+    """
+    Fixed-length windows over memory-mapped shards, for one data-parallel rank.
+
+    Plugs into toy_data.BatchLoader: len() is the number of windows this
+    rank owns, gather(indices) returns (ids, labels) tensors for them.
+    """
+
+    def __init__(self, shard_dir, block_len, *, rank=0, world_size=1):
+        if not 0 <= rank < world_size:
+            raise ValueError(f"rank {rank} not in [0, {world_size})")
+        self.dir = Path(shard_dir)
+        self.index = read_index(self.dir)
+        if self.index is None:
+            raise FileNotFoundError(f"no {INDEX_FILE} in {self.dir} — run the preprocessing step first")
+        self.block_len = block_len
+        self.rank, self.world_size = rank, world_size
+        dtype = np.dtype(self.index["dtype"])
+        shards = self.index["shards"]
+        windows = [s["tokens"] // block_len for s in shards]
+        # Shards that split evenly: each rank owns whole shards (and only opens those)
+        per_rank = {sum(windows[r::world_size]) for r in range(world_size)}
+        own_whole_shards = len(shards) >= world_size and len(per_rank) == 1
+        if own_whole_shards:
+            shards, windows = shards[rank::world_size], windows[rank::world_size]
+        self.memmaps = [
+            np.memmap(self.dir / s["file"], dtype=dtype, mode="r", shape=(s["tokens"],))
+            for s in shards
+        ]
+        self.first_window = np.cumsum([0] + windows)     # window -> shard lookup
+        total = int(self.first_window[-1])
+        # Otherwise split at window granularity, every world_size-th
+        self.stride = 1 if own_whole_shards else world_size
+        self.offset = 0 if own_whole_shards else rank
+        self.num_windows = total // self.stride
+
+    def __len__(self):
+        return self.num_windows
+
+    @property
+    def num_tokens(self):
+        return self.num_windows * self.block_len
+
+    def gather(self, indices):
+        """(ids, labels), each [len(indices), block_len], read from the memmaps."""
+        windows = np.asarray(indices, dtype=np.int64) * self.stride + self.offset
+        shard_of = np.searchsorted(self.first_window, windows, side="right") - 1
+        starts = (windows - self.first_window[shard_of]) * self.block_len
+        out = np.empty((len(windows), self.block_len), dtype=np.int64)
+        span = np.arange(self.block_len)
+        for shard in np.unique(shard_of):
+            rows = shard_of == shard
+            out[rows] = self.memmaps[shard][starts[rows, None] + span]   # one fancy-index read per shard
+        ids = torch.from_numpy(out)
+        return ids, ids.clone()    # full windows: no padding, every position trained on
+
+
+# ──────────────────────────────────────────────
+# CLI: preprocess a text corpus
+# ──────────────────────────────────────────────
+
+def main(argv=None):
+    from toy_tokenizer import ByteTokenizer
+
+    parser = argparse.ArgumentParser(description="Tokenize a text file (one doc per line) into memmap shards.")
+    parser.add_argument("corpus", help="text file, one document per line")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--byte-ids", type=int, default=64,
+                        help="byte-level ids (byte %% N); pad / separator ids are reserved above them")
+    parser.add_argument("--shard-tokens", type=int, default=1 << 20)
+    parser.add_argument("--batch-lines", type=int, default=10_000, help="lines tokenized per bulk call")
+    args = parser.parse_args(argv)
+
+    tokenizer = ByteTokenizer(args.byte_ids)
+    with open(args.corpus, encoding="utf-8") as f, ShardWriter(
+        args.out, vocab_size=tokenizer.vocab_size, sep_id=tokenizer.sep_id, shard_tokens=args.shard_tokens,
+        metadata={"tokenizer": tokenizer.config()},     # lets readers check they encode alike
+    ) as writer:
+        lines = []
+        for line in f:
+            lines.append(line.rstrip("\n"))
+            if len(lines) == args.batch_lines:
+                for ids in tokenizer.encode_batch(lines):
+                    writer.add(ids)
+                lines = []
+        for ids in tokenizer.encode_batch(lines):
+            writer.add(ids)
+    tokens = sum(s["tokens"] for s in writer.shards)
+    print(f"  {writer.num_docs:,} docs, {tokens:,} tokens -> {len(writer.shards)} shards in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Batched Data Loading for the Training Toy
+==========================================
+
+Companion module for three_phase_training_toy.py.
+
+The original loops drew ONE example per step with random.choice():
+  - batch size 1       -> noisy gradients, tiny matmuls, Python overhead per token
+  - sampling with replacement -> no epochs; some examples seen 5x, some never
+  - global random state -> runs are not reproducible
+
+Real trainers (PyTorch DataLoader, Megatron, LlamaFactory) all do the same
+three things instead, and so does BatchLoader:
+  1. Shuffle ONCE PER EPOCH with a seeded generator (seed + epoch), so every
+     example is seen exactly once per epoch and the order is reproducible.
+  2. Gather a whole batch with one tensor index (no per-example Python).
+  3. Prepare the next batches on a background thread while the current
+     step runs (prefetch), so data prep overlaps with compute.
+
+Usage:
+    loader = BatchLoader(token_tensor, batch_size=4, seed=0)
+    for step, batch in enumerate(loader.take(steps)):
+        ...                      # batch: [4, seq_len], crosses epochs as needed
+
+It also builds the tensors the loader serves — documents PACKED into
+full-length blocks with separators, plus labels that mask out what should
+not be trained on (padding, and for SFT optionally the prompt):
+    ids, labels = pack_documents(docs, block_len=8, sep_id=tok.sep_id, pad_id=tok.pad_id)
+    loss = F.cross_entropy(logits[:, :-1].flatten(0, 1), labels[:, 1:].flatten(),
+                           ignore_index=IGNORE_INDEX)
+"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+import torch
+import torch.distributed as dist
+
+
+# ──────────────────────────────────────────────
+# SEQUENCE PACKING + LOSS MASKING
+# ──────────────────────────────────────────────
+# Padding every text to a fixed length wastes compute twice: short texts
+# are mostly pad tokens (which the loss then trains on), long texts are
+# truncated (the tail is never seen).  Packing instead concatenates all
+# documents into one stream —
+#
+#     doc1 <sep> doc2 <sep> doc3 <sep> ...
+#
+# — and cuts it into full blocks, so only the very last block has padding.
+# Labels follow the Hugging Face convention: same shape as the ids, and
+# IGNORE_INDEX (-100) wherever no loss should be taken.  F.cross_entropy
+# skips those positions for free via ignore_index.
+#
+# Real trainers also reset attention at <sep> so documents don't attend
+# to each other; TinyLM has no attention, so there is nothing to leak.
+
+IGNORE_INDEX = -100
+
+
+def pack_documents(docs, block_len, *, sep_id, pad_id, masks=None):
+    """
+    Pack token sequences (lists or int arrays) into [num_blocks, block_len] (ids, labels).
+
+    masks: optional per-document 0/1 sequences, 1 = train on this token
+           (e.g. SFT response-only: 0 for the prompt, 1 for the response).
+           Separators are always trained on, so the model learns to stop;
+           padding never is.
+    """
+    pieces, keeps = [], []
+    for i, doc in enumerate(docs):
+        doc = np.asarray(doc, dtype=np.int64)
+        keep = np.ones(len(doc), dtype=bool) if masks is None else np.asarray(masks[i], dtype=bool)
+        if len(keep) != len(doc):
+            raise ValueError(f"document {i}: mask length {len(keep)} != {len(doc)} tokens")
+        pieces += [doc, [sep_id]]
+        keeps += [keep, [True]]
+    stream = np.concatenate(pieces)
+    num_blocks = -(-len(stream) // block_len)
+    pad = num_blocks * block_len - len(stream)
+    ids = torch.from_numpy(np.pad(stream, (0, pad), constant_values=pad_id)).view(num_blocks, block_len)
+    keep = torch.from_numpy(np.pad(np.concatenate(keeps), (0, pad))).view(num_blocks, block_len)
+    return ids, ids.masked_fill(~keep, IGNORE_INDEX)
+
+
+def pad_sequences(seqs, *, pad_id, masks=None):
+    """
+    Right-pad token sequences to the longest one -> [N, max_len] (ids, labels).
+
+    For data that must NOT be packed — DPO compares chosen vs rejected per
+    example, so each pair has to stay its own row.  Pads (and mask == 0
+    tokens) get IGNORE_INDEX labels.
+    """
+    max_len = max(len(s) for s in seqs)
+    ids = torch.full((len(seqs), max_len), pad_id, dtype=torch.long)
+    keep = torch.zeros((len(seqs), max_len), dtype=torch.bool)
+    for i, seq in enumerate(seqs):
+        ids[i, :len(seq)] = torch.as_tensor(np.asarray(seq, dtype=np.int64))
+        keep[i, :len(seq)] = True if masks is None else torch.as_tensor(np.asarray(masks[i], dtype=bool))
+    return ids, ids.masked_fill(~keep, IGNORE_INDEX)
+
+
+def count_trained_tokens(labels):
+    """Next-token targets that actually contribute to the loss."""
+    return int((labels[:, 1:] != IGNORE_INDEX).sum())
+
+
+# ──────────────────────────────────────────────
+# BATCH LOADER
+# ──────────────────────────────────────────────
+# Holds the dataset as one (or a tuple of) stacked tensors, e.g.
+#   pre-training / SFT: (ids, labels)                    [N, seq_len] each
+#   DPO:                (chosen, chosen_labels, rejected, rejected_labels)
+# A batch is the same structure indexed by a slice of the epoch's
+# permutation — one gather per tensor.
+#
+# Datasets too large for memory (token_shards.ShardDataset) are passed as
+# an object with len() and gather(indices) instead; the gather — i.e. the
+# disk read — then runs on the prefetch thread.
+
+def dist_rank_world():
+    """(rank, world_size) of the torch.distributed job, or (0, 1) outside one."""
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_rank(), dist.get_world_size()
+    return 0, 1
+
+
+class BatchLoader:
+    """
+    Seeded, epoch-shuffled mini-batches over stacked tensors, with prefetch.
+
+    Under torch.distributed each rank gets every world_size-th example of
+    the epoch's permutation (like DistributedSampler): the same seed on
+    every rank gives the same permutation, so the ranks' slices are
+    disjoint and together cover the epoch.  If the epoch doesn't divide
+    evenly, its head is repeated so every rank gets the same number of
+    examples (DistributedSampler does the same).  batch_size is per rank.
+    Datasets that are already split per rank (ShardDataset) are not split
+    again.
+    """
+
+    def __init__(self, tensors, batch_size=4, *, shuffle=True, seed=0,
+                 drop_last=False, prefetch=2, rank=None, world_size=None):
+        # Tensors have a .gather() method too, so test for them, not for it
+        self.dataset = None if isinstance(tensors, (torch.Tensor, tuple)) else tensors
+        self.is_tuple = isinstance(tensors, tuple)
+        self.tensors = tensors if self.is_tuple else (tensors,)
+        self.num_examples = len(tensors) if self.dataset is not None else len(self.tensors[0])
+        if self.dataset is None and any(len(t) != self.num_examples for t in self.tensors):
+            raise ValueError("all tensors must have the same number of examples")
+        if rank is None:
+            presplit = getattr(self.dataset, "world_size", 1) > 1
+            rank, world_size = (0, 1) if presplit else dist_rank_world()
+        self.rank, self.world_size = rank, world_size or 1
+        self.full_size = self.num_examples
+        # This rank's share of the epoch: positions rank, rank + world, ...
+        self.num_examples = -(-self.full_size // self.world_size)
+        if self.num_examples == 0:
+            raise ValueError("dataset is empty")
+        if not 1 <= batch_size <= self.num_examples:
+            raise ValueError(
+                f"batch_size {batch_size} must be in [1, {self.num_examples}] "
+                f"(this rank's examples per epoch)"
+            )
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.drop_last = drop_last
+        self.prefetch = prefetch
+
+    def __len__(self):
+        """Batches per epoch."""
+        if self.drop_last:
+            return self.num_examples // self.batch_size
+        return -(-self.num_examples // self.batch_size)
+
+    def epoch_order(self, epoch):
+        """Example order for *epoch* — a pure function of (seed, epoch)."""
+        if not self.shuffle:
+            order = torch.arange(self.full_size)
+        else:
+            generator = torch.Generator().manual_seed(self.seed + epoch)
+            order = torch.randperm(self.full_size, generator=generator)
+        padded = self.num_examples * self.world_size
+        if padded > self.full_size:   # wrap around so every rank gets the same count
+            order = order.repeat(-(-padded // self.full_size))[:padded]
+        return order[self.rank::self.world_size]
+
+    def epoch(self, epoch=0):
+        """Yield the batches of one epoch (no prefetch)."""
+        order = self.epoch_order(epoch)
+        for i in range(len(self)):
+            index = order[i * self.batch_size:(i + 1) * self.batch_size]
+            if self.dataset is not None:
+                yield self.dataset.gather(index.numpy())
+                continue
+            batch = tuple(t[index] for t in self.tensors)
+            yield batch if self.is_tuple else batch[0]
+
+    def batches(self):
+        """Yield (epoch, batch) forever, epoch after epoch."""
+        epoch = 0
+        while True:
+            for batch in self.epoch(epoch):
+                yield epoch, batch
+            epoch += 1
+
+    def take(self, steps):
+        """Yield exactly *steps* (epoch, batch) pairs, prefetched in the background."""
+        def produce():
+            for _, item in zip(range(steps), self.batches()):
+                yield item
+        if self.prefetch <= 0:
+            return produce()
+        return prefetch(produce(), depth=self.prefetch)
+
+
+# ──────────────────────────────────────────────
+# BACKGROUND PREFETCH
+# ──────────────────────────────────────────────
+# A producer thread fills a bounded queue; the training loop pulls from it.
+# The bound (depth) caps memory: the producer blocks once it is `depth`
+# batches ahead.  Tensor indexing releases the GIL, so the gather really
+# does overlap with the forward/backward pass.
+
+_DONE = object()
+
+
+def prefetch(iterable, depth=2):
+    """Iterate *iterable* on a background thread, staying up to *depth* items ahead."""
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        """Block until queued; False if the consumer has gone away."""
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as exc:  # re-raised in the consumer
+            put(exc)
+
+    thread = threading.Thread(target=worker, name="batch-prefetch", daemon=True)
+    thread.start()
+
+    def consume():
+        try:
+            while True:
+                item = items.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()  # consumer stopped early (break / exception): release the worker
+            thread.join()
+
+    return consume()
+
+
+# ──────────────────────────────────────────────
+# THROUGHPUT
+# ──────────────────────────────────────────────
+# Tokens/sec is THE number training teams track (alongside MFU).
+# Measured over the whole loop: data + forward + backward + optimizer.
+
+class Throughput:
+    """Counts tokens processed (and how many of them were trained on) since construction."""
+
+    def __init__(self):
+        self.tokens = 0
+        self.trained = 0
+        self.start = time.perf_counter()
+
+    def add(self, tokens, trained=None):
+        self.tokens += int(tokens)
+        self.trained += int(tokens if trained is None else trained)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    @property
+    def tokens_per_sec(self):
+        return self.tokens / max(self.elapsed, 1e-9)
+
+    @property
+    def trained_fraction(self):
+        return self.trained / max(self.tokens, 1)
+
+    def summary(self):
+        """One-line report.  Under torch.distributed: summed over ranks (a collective — call on every rank)."""
+        tokens, trained = self.tokens, self.trained
+        rank, world_size = dist_rank_world()
+        if world_size > 1:
+            totals = torch.tensor([tokens, trained], dtype=torch.float64)
+            dist.all_reduce(totals)
+            tokens, trained = (int(x) for x in totals.tolist())
+        scope = f", {world_size} ranks" if world_size > 1 else ""
+        return (f"{tokens:,} tokens in {self.elapsed:.2f}s "
+                f"({tokens / max(self.elapsed, 1e-9):,.0f} tokens/sec{scope}, "
+                f"{trained / max(tokens, 1):.0%} trained on)")
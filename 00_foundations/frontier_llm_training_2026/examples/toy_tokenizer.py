@@ -0,0 +1,242 @@
+"""
+Bulk Tokenization for the Training Toy
+=======================================
+
+Companion module for three_phase_training_toy.py.
+
+Real pipelines tokenize a corpus ONCE, in bulk, and cache the token ids:
+training runs are restarted and re-tuned many times, the corpus is not.
+This module does the same at toy scale:
+
+  ByteTokenizer   the toy's "character mod byte_ids" mapping, done as one
+                  NumPy table lookup over the corpus' raw bytes
+                  (np.frombuffer) instead of a Python loop per character.
+                  The pad and separator ids are reserved above the byte
+                  ids, so no character can be mistaken for either.
+  BPETokenizer    a small trainable byte-pair-encoding tokenizer on top of
+                  it.  Encoding caches each word's merged ids, so a word is
+                  merged once no matter how often it occurs.
+  encode_corpus   bulk-encode a list of texts, cached on disk under a key
+                  hashed from the tokenizer config + the corpus.  Re-runs
+                  load the ids and skip tokenization entirely.
+
+Usage:
+    tok = load_or_train_bpe(texts, vocab_size=128, cache_dir="./toy_cache")
+    docs = encode_corpus(texts, tok, cache_dir="./toy_cache")   # list of int64 arrays
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+
+# ──────────────────────────────────────────────
+# BYTE-LEVEL TOKENIZER (vectorized)
+# ──────────────────────────────────────────────
+# Every byte value 0..255 gets an id from a 256-entry lookup table, so
+# encoding a whole corpus is: join -> frombuffer -> table[bytes] -> split.
+# For ASCII text this is exactly the toy's `ord(c) % BYTE_IDS`.  The two
+# ids after the table are reserved: pad (byte_ids) and separator
+# (byte_ids + 1) — no text ever encodes to them.
+
+class ByteTokenizer:
+    """Byte -> id via a lookup table (id = byte % byte_ids), plus pad / sep ids."""
+
+    def __init__(self, byte_ids=64):
+        self.byte_ids = byte_ids
+        self.table = np.arange(256, dtype=np.int64) % byte_ids
+        self.pad_id = byte_ids
+        self.sep_id = byte_ids + 1
+        self.vocab_size = byte_ids + 2
+
+    def config(self):
+        return {"type": "byte", "byte_ids": self.byte_ids, "pad_id": self.pad_id, "sep_id": self.sep_id}
+
+    def encode(self, text):
+        return self.table[np.frombuffer(text.encode("utf-8"), dtype=np.uint8)]
+
+    def encode_batch(self, texts):
+        """Encode many texts with ONE lookup; returns a list of int64 arrays."""
+        if not texts:
+            return []
+        data = [t.encode("utf-8") for t in texts]
+        flat = self.table[np.frombuffer(b"".join(data), dtype=np.uint8)]
+        return np.split(flat, np.cumsum([len(d) for d in data])[:-1])
+
+
+# ──────────────────────────────────────────────
+# BYTE-PAIR ENCODING (trainable)
+# ──────────────────────────────────────────────
+# Training: start from the byte-level ids, repeatedly merge the most frequent
+# adjacent pair into a new id until vocab_size is reached.  Merges never
+# cross word boundaries (words keep their leading space, GPT-2 style).
+#
+# Encoding: split into words, then apply merges in the order they were
+# learned.  The result depends only on the word, so it is cached per word —
+# on real text a handful of frequent words cover most of the corpus.
+
+_WORDS = re.compile(r" ?[^ ]+| +")
+
+
+def _merge(ids, pair, new_id):
+    out, i = [], 0
+    while i < len(ids):
+        if i + 1 < len(ids) and ids[i] == pair[0] and ids[i + 1] == pair[1]:
+            out.append(new_id)
+            i += 2
+        else:
+            out.append(ids[i])
+            i += 1
+    return tuple(out)
+
+
+class BPETokenizer:
+    """Byte-pair encoding over a ByteTokenizer; new ids start at base.vocab_size."""
+
+    def __init__(self, merges, base=None):
+        self.base = base or ByteTokenizer()
+        self.merges = [tuple(pair) for pair in merges]
+        self.ranks = {pair: rank for rank, pair in enumerate(self.merges)}
+        self.vocab_size = self.base.vocab_size + len(self.merges)
+        self.pad_id, self.sep_id = self.base.pad_id, self.base.sep_id
+        self.cache = {}     # word -> tuple of ids (the merge cache)
+
+    def config(self):
+        return {"type": "bpe", "base": self.base.config(), "merges": self.merges}
+
+    @classmethod
+    def train(cls, texts, vocab_size, base=None):
+        base = base or ByteTokenizer()
+        word_counts = Counter(w for text in texts for w in _WORDS.findall(text))
+        words = {tuple(base.encode(w).tolist()): n for w, n in word_counts.items()}
+        merges = []
+        for new_id in range(base.vocab_size, vocab_size):
+            pairs = Counter()
+            for ids, n in words.items():
+                for pair in zip(ids, ids[1:]):
+                    pairs[pair] += n
+            if not pairs:
+                break
+            best, count = max(pairs.items(), key=lambda kv: kv[1])  # ties: first seen
+            if count < 2:
+                break  # merging a pair seen once saves nothing
+            merges.append(best)
+            words = {_merge(ids, best, new_id): n for ids, n in words.items()}
+        return cls(merges, base)
+
+    def _encode_word(self, word):
+        ids = self.cache.get(word)
+        if ids is None:
+            ids = tuple(self.base.encode(word).tolist())
+            while len(ids) > 1:
+                # Apply the earliest-learned merge present in the word
+                pair = min(zip(ids, ids[1:]), key=lambda p: self.ranks.get(p, len(self.ranks)))
+                if pair not in self.ranks:
+                    break
+                ids = _merge(ids, pair, self.base.vocab_size + self.ranks[pair])
+            self.cache[word] = ids
+        return ids
+
+    def encode(self, text):
+        return self.encode_batch([text])[0]
+
+    def encode_batch(self, texts):
+        """Encode many texts into one flat id buffer, then split per text."""
+        if not texts:
+            return []
+        flat, lengths = [], []
+        for text in texts:
+            start = len(flat)
+            for word in _WORDS.findall(text):
+                flat.extend(self._encode_word(word))
+            lengths.append(len(flat) - start)
+        return np.split(np.array(flat, dtype=np.int64), np.cumsum(lengths)[:-1])
+
+    def save(self, path):
+        _atomic_write(path, json.dumps(self.config()).encode())
+
+    @classmethod
+    def load(cls, path):
+        config = json.loads(Path(path).read_text())
+        return cls(config["merges"], ByteTokenizer(config["base"]["byte_ids"]))
+
+
+# ──────────────────────────────────────────────
+# ON-DISK CACHE
+# ──────────────────────────────────────────────
+# Key = sha256(tokenizer config + corpus).  Change the tokenizer (vocab
+# size, merges) or a single character of the corpus and the key changes,
+# so a stale cache can never be served.  Files are written to a temp name
+# and renamed, so a crash mid-write never leaves a truncated cache behind.
+
+def _atomic_write(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=path.suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _corpus_hash(texts):
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def cache_key(tokenizer, texts):
+    """Hash of the tokenizer config and the corpus."""
+    config = json.dumps(tokenizer.config(), sort_keys=True)
+    return hashlib.sha256(f"{config}\0{_corpus_hash(texts)}".encode()).hexdigest()[:16]
+
+
+def encode_corpus(texts, tokenizer, cache_dir=None):
+    """
+    Bulk-encode *texts*; returns a list of int64 arrays, one per text.
+
+    With cache_dir, the ids are stored as one flat array + offsets
+    (tokens-<key>.npz) and later calls with the same tokenizer and corpus
+    just load that file.
+    """
+    if cache_dir is None:
+        return tokenizer.encode_batch(texts)
+    path = Path(cache_dir) / f"tokens-{cache_key(tokenizer, texts)}.npz"
+    if path.exists():
+        with np.load(path) as cached:
+            return np.split(cached["ids"], cached["offsets"][1:-1])
+    docs = tokenizer.encode_batch(texts)
+    offsets = np.cumsum([0] + [len(d) for d in docs])
+    flat = np.concatenate(docs) if docs else np.empty(0, dtype=np.int64)
+    buffer = io.BytesIO()
+    np.savez(buffer, ids=flat, offsets=offsets)
+    _atomic_write(path, buffer.getvalue())
+    return docs
+
+
+def load_or_train_bpe(texts, vocab_size, cache_dir=None, base=None):
+    """Train a BPETokenizer on *texts*, or load the one trained earlier on the same corpus."""
+    base = base or ByteTokenizer()
+    if cache_dir is None:
+        return BPETokenizer.train(texts, vocab_size, base)
+    key = hashlib.sha256(
+        json.dumps([base.config(), vocab_size, _corpus_hash(texts)]).encode()
+    ).hexdigest()[:16]
+    path = Path(cache_dir) / f"bpe-{key}.json"
+    if path.exists():
+        return BPETokenizer.load(path)
+    tokenizer = BPETokenizer.train(texts, vocab_size, base)
+    tokenizer.save(path)
+    return tokenizer
@@ -0,0 +1,106 @@
+"""
+Performance Options for the Training Toy
+=========================================
+
+Companion module for three_phase_training_toy.py.
+
+The knobs every real training config exposes, wired into all three phases
+so their effect can be checked cheaply on CPU (bench_train_options.py):
+
+  grad_accum_steps   split each optimizer step into N micro-batches and
+                     add up their gradients.  Same update as one big batch,
+                     ~1/N the activation memory.  Under DDP the all-reduce
+                     runs only on the last micro-batch (no_sync on the rest).
+  bf16               run forward under torch.autocast(bfloat16): matmuls in
+                     bf16, master weights and loss reductions in fp32.  No
+                     loss scaling needed (bf16 has fp32's exponent range).
+  compile            torch.compile(model): fuses the small ops into
+                     generated kernels.  Pays a one-off compile (seconds)
+                     on the first step.
+  optimizer_impl     how Adam updates its parameter list:
+                       "for-loop"  one small op per parameter per math step
+                       "foreach"   multi-tensor ops over all parameters
+                       "fused"     one fused kernel per step
+                       "default"   let PyTorch pick (foreach where supported)
+
+Usage:
+    opts = TrainOptions(grad_accum_steps=4, bf16=True, optimizer_impl="fused")
+    train_pretrain(model, data, steps=50, options=opts)
+"""
+
+import contextlib
+from dataclasses import dataclass
+
+import torch
+
+OPTIMIZER_IMPLS = ("default", "for-loop", "foreach", "fused")
+
+
+@dataclass
+class TrainOptions:
+    grad_accum_steps: int = 1
+    bf16: bool = False
+    compile: bool = False
+    optimizer_impl: str = "default"
+
+    def __post_init__(self):
+        if self.grad_accum_steps < 1:
+            raise ValueError("grad_accum_steps must be >= 1")
+        if self.optimizer_impl not in OPTIMIZER_IMPLS:
+            raise ValueError(f"optimizer_impl must be one of {OPTIMIZER_IMPLS}")
+
+    def describe(self):
+        parts = [f"accum={self.grad_accum_steps}", "bf16" if self.bf16 else "fp32",
+                 f"adam={self.optimizer_impl}"]
+        if self.compile:
+            parts.append("compiled")
+        return " ".join(parts)
+
+    # ── Model / optimizer ─────────────────────
+
+    def prepare(self, model):
+        """The callable to run forward passes through (compiled if asked).
+
+        Shares parameters with *model*; keep saving *model* itself, whose
+        state_dict keys are unchanged.
+        """
+        return torch.compile(model) if self.compile else model
+
+    def make_optimizer(self, params, lr):
+        kwargs = {
+            "default": {},
+            "for-loop": {"foreach": False},
+            "foreach": {"foreach": True},
+            "fused": {"fused": True},
+        }[self.optimizer_impl]
+        return torch.optim.Adam(params, lr=lr, **kwargs)
+
+    # ── Step structure ────────────────────────
+
+    def autocast(self):
+        return torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.bf16)
+
+    def micro_batch_size(self, batch_size):
+        """Per-micro-batch size, so the optimizer still sees *batch_size* examples per step.
+
+        Raises ValueError unless grad_accum_steps divides batch_size — a
+        rounded-down micro-batch would silently shrink the effective batch.
+        """
+        if batch_size % self.grad_accum_steps:
+            raise ValueError(f"batch_size {batch_size} is not divisible by "
+                             f"grad_accum_steps {self.grad_accum_steps}")
+        return batch_size // self.grad_accum_steps
+
+    def micro_batches(self, loader, steps):
+        """Yield (step, epoch, [micro-batches]) — grad_accum_steps batches per optimizer step."""
+        batches = iter(loader.take(steps * self.grad_accum_steps))
+        for step in range(steps):
+            group = [next(batches) for _ in range(self.grad_accum_steps)]
+            yield step, group[0][0], [batch for _, batch in group]
+
+    def sync_context(self, model, micro_step):
+        """DDP: skip the gradient all-reduce on every micro-batch but the last."""
+        if micro_step < self.grad_accum_steps - 1 and hasattr(model, "no_sync"):
+            return model.no_sync()
+        return contextlib.nullcontext()
+
@@ -11,21 +11,122 @@ Quick usage:
     print(tree.visualize())
 """
 
-from .agent_node import AgentNode, AgentCallable, ToolCallable
+import importlib
+from typing import TYPE_CHECKING, Any
+
+from .agent_node import AgentNode, AgentCallable, AsToolMode, ToolCallable, SyncToolCallable
+from .model_view import ModelView, as_handoff
 from .agent_tree import AgentTree
+from .compact_tree import CompactAgentTree, CompactNode
 from .handoff_models import HandoffResult, HandoffTraces, ToolResult, SupervisorResult
-from .orchestrator import OrchestratorHooks, SupervisorOrchestrator, PlannerCallable
+from .artifact_store import ArtifactStore, ArtifactRef, ArtifactMissing
+from .tool_executors import ExecutorPolicy, ToolExecutors, DEFAULT_EXECUTORS
+from .sandbox import SandboxPool, SandboxError, SandboxTimeout, SandboxCrashed
+from .resources import ConnectionPool, ResourceRegistry, uses
+from .budget import Budget, CostEstimator
+from .retention import HandoffRetention, HandoffSink, JsonlHandoffSink, SQLiteHandoffSink
+from .step_log import StepLog, StepRecord, JsonlStepLog, SQLiteStepLog
+from .orchestrator import OrchestratorHooks, SupervisorOrchestrator, PlannerCallable, RouterCallable
+from .trace_store import SQLiteTraceStore
+from .admission import AdmissionController, AdmissionMetrics, PriorityClass
+from .fair_scheduler import FairQueue, FairScheduler, TenantConfig, current_tenant
+
+# Modules that double as CLIs (python -m agent_tree.eval ...) are imported on
+# first attribute access: importing them here would load them before runpy
+# executes them as __main__, and Python warns about the double import.
+_LAZY = {
+    "EvalCase": "eval", "EvalReport": "eval", "run_eval": "eval", "diff_reports": "eval",
+    "Recorder": "recording", "Replayer": "recording", "ReplayMiss": "recording",
+    "Scenario": "simulation", "SimReport": "simulation", "SimTool": "simulation",
+    "VirtualClockLoop": "simulation", "run_virtual": "simulation", "simulate": "simulation",
+    "JobQueue": "worker_pool", "LocalJobQueue": "worker_pool",
+    "OrchestratorWorkerPool": "worker_pool", "OrchestratorFactory": "worker_pool",
+}
+
+if TYPE_CHECKING:
+    from .eval import EvalCase, EvalReport, run_eval, diff_reports
+    from .recording import Recorder, Replayer, ReplayMiss
+    from .simulation import Scenario, SimReport, SimTool, VirtualClockLoop, run_virtual, simulate
+    from .worker_pool import JobQueue, LocalJobQueue, OrchestratorWorkerPool, OrchestratorFactory
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value  # cache: later lookups skip __getattr__
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY))
 
 __all__ = [
     "AgentNode",
     "AgentCallable",
+    "AsToolMode",
+    "ModelView",
+    "as_handoff",
     "ToolCallable",
+    "SyncToolCallable",
     "AgentTree",
+    "CompactAgentTree",
+    "CompactNode",
     "HandoffResult",
     "HandoffTraces",
     "ToolResult",
     "SupervisorResult",
+    "ArtifactStore",
+    "ArtifactRef",
+    "ArtifactMissing",
+    "ExecutorPolicy",
+    "ToolExecutors",
+    "DEFAULT_EXECUTORS",
+    "SandboxPool",
+    "SandboxError",
+    "SandboxTimeout",
+    "SandboxCrashed",
+    "ConnectionPool",
+    "ResourceRegistry",
+    "uses",
+    "Budget",
+    "CostEstimator",
+    "HandoffRetention",
+    "HandoffSink",
+    "JsonlHandoffSink",
+    "SQLiteHandoffSink",
+    "StepLog",
+    "StepRecord",
+    "JsonlStepLog",
+    "SQLiteStepLog",
     "OrchestratorHooks",
     "SupervisorOrchestrator",
     "PlannerCallable",
+    "RouterCallable",
+    "SQLiteTraceStore",
+    "EvalCase",
+    "EvalReport",
+    "run_eval",
+    "diff_reports",
+    "Recorder",
+    "Replayer",
+    "ReplayMiss",
+    "AdmissionController",
+    "AdmissionMetrics",
+    "PriorityClass",
+    "FairQueue",
+    "FairScheduler",
+    "TenantConfig",
+    "current_tenant",
+    "Scenario",
+    "SimReport",
+    "SimTool",
+    "VirtualClockLoop",
+    "run_virtual",
+    "simulate",
+    "JobQueue",
+    "LocalJobQueue",
+    "OrchestratorWorkerPool",
+    "OrchestratorFactory",
 ]
@@ -0,0 +1,291 @@
+"""
+Priority admission control and load shedding in front of SupervisorOrchestrator.
+
+WHY:  Without admission control every caller of run() is accepted, so under
+      overload the queue grows without bound and *everyone* is served late.
+      It is better to answer some requests fast with "rejected" than all of
+      them slowly.
+
+Mechanics:
+  - At most `max_concurrency` runs execute at once; the rest wait in one
+    FIFO per priority class.  Freed slots go to the highest class first
+    (strict priority), so interactive traffic overtakes batch backfills.
+  - The total queue is bounded (`max_queue`).  When full, an arriving
+    request evicts the newest waiter of a *lower* class, or is rejected.
+  - Queue-time shedding follows CoDel: each class has a target queueing
+    delay.  If waiters have stayed above target for a whole `interval`,
+    the class enters a dropping state and sheds waiters at dequeue, at a
+    rate that rises with sqrt(drop count) until delay falls below target.
+    Batch classes get a generous target so they absorb the slowdown.
+  - Shed or rejected callers get an immediate SupervisorResult with
+    status="rejected" — no orchestration work is done for them.
+
+Metrics (metrics() / AdmissionMetrics.to_prometheus()): queue depth,
+in-flight runs, admitted / shed counts, shed rate and mean queue delay
+per class.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from .handoff_models import SupervisorResult
+from .orchestrator import SupervisorOrchestrator
+
+
+@dataclass
+class PriorityClass:
+    """One admission class.  Listed highest priority first."""
+
+    name: str
+    target_delay_ms: float = 10.0   # CoDel target: acceptable standing queue delay
+    interval_ms: float = 100.0      # CoDel interval: how long delay may stay above target
+
+
+DEFAULT_CLASSES = (
+    PriorityClass("interactive", target_delay_ms=10.0, interval_ms=100.0),
+    PriorityClass("batch", target_delay_ms=1000.0, interval_ms=10_000.0),
+)
+
+
+@dataclass
+class ClassMetrics:
+    queue_depth: int = 0
+    admitted: int = 0
+    shed_codel: int = 0
+    shed_queue_full: int = 0
+    mean_queue_delay_ms: float = 0.0
+
+    @property
+    def shed(self) -> int:
+        return self.shed_codel + self.shed_queue_full
+
+    @property
+    def shed_rate(self) -> float:
+        total = self.admitted + self.shed
+        return self.shed / total if total else 0.0
+
+
+@dataclass
+class AdmissionMetrics:
+    """Point-in-time snapshot of the controller."""
+
+    in_flight: int
+    max_concurrency: int
+    classes: dict[str, ClassMetrics] = field(default_factory=dict)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(c.queue_depth for c in self.classes.values())
+
+    def to_prometheus(self, prefix: str = "agent_admission") -> str:
+        """Render in Prometheus text exposition format."""
+        lines = [
+            f"{prefix}_in_flight {self.in_flight}",
+            f"{prefix}_max_concurrency {self.max_concurrency}",
+        ]
+        for name, c in self.classes.items():
+            label = f'{{priority="{name}"}}'
+            lines += [
+                f"{prefix}_queue_depth{label} {c.queue_depth}",
+                f"{prefix}_admitted_total{label} {c.admitted}",
+                f'{prefix}_shed_total{{priority="{name}",reason="codel"}} {c.shed_codel}',
+                f'{prefix}_shed_total{{priority="{name}",reason="queue_full"}} {c.shed_queue_full}',
+                f"{prefix}_shed_rate{label} {c.shed_rate:.6f}",
+                f"{prefix}_queue_delay_ms_mean{label} {c.mean_queue_delay_ms:.3f}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+@dataclass
+class _Waiter:
+    future: asyncio.Future[bool]   # True = slot granted, False = shed
+    enqueued_at: float
+    shed_reason: str = ""          # why it was shed, when future is False
+
+
+class _ClassState:
+    """Queue + CoDel state + counters for one priority class."""
+
+    def __init__(self, spec: PriorityClass) -> None:
+        self.spec = spec
+        self.target = spec.target_delay_ms / 1000
+        self.interval = spec.interval_ms / 1000
+        self.queue: deque[_Waiter] = deque()
+        # CoDel state
+        self.first_above: float = 0.0
+        self.dropping = False
+        self.drop_next: float = 0.0
+        self.drop_count = 0
+        # Counters
+        self.metrics = ClassMetrics()
+        self._delay_sum = 0.0
+        self._delay_n = 0
+
+    def record_delay(self, sojourn: float) -> None:
+        self._delay_sum += sojourn
+        self._delay_n += 1
+        self.metrics.mean_queue_delay_ms = 1000 * self._delay_sum / self._delay_n
+
+    def should_shed(self, sojourn: float, now: float) -> bool:
+        """CoDel dequeue decision for a waiter that queued for *sojourn* seconds."""
+        if sojourn < self.target:
+            self.first_above = 0.0
+            self.dropping = False
+            return False
+        if self.first_above == 0.0:
+            self.first_above = now + self.interval
+            return False
+        if now < self.first_above:
+            return False
+        if not self.dropping:
+            # Standing queue for a full interval — start shedding.  Resume a
+            # higher drop rate if we only just left the dropping state.
+            self.dropping = True
+            recent = now - self.drop_next < 16 * self.interval
+            self.drop_count = max(1, self.drop_count - 2) if recent else 1
+            self.drop_next = now + self.interval / math.sqrt(self.drop_count)
+            return True
+        if now >= self.drop_next:
+            self.drop_count += 1
+            self.drop_next += self.interval / math.sqrt(self.drop_count)
+            return True
+        return False
+
+
+class AdmissionController:
+    """Bounded, prioritised, CoDel-shedding front door for an orchestrator.
+
+    Usage:
+        gate = AdmissionController(orchestrator, max_concurrency=64)
+        result = await gate.run(prompt, priority="interactive")
+        if result.status == "rejected": ...   # retry later / return 503
+    """
+
+    def __init__(
+        self,
+        orchestrator: SupervisorOrchestrator,
+        *,
+        max_concurrency: int = 64,
+        max_queue: int = 1024,
+        classes: tuple[PriorityClass, ...] = DEFAULT_CLASSES,
+    ) -> None:
+        if not classes:
+            raise ValueError("At least one priority class is required")
+        self.orchestrator = orchestrator
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._classes: dict[str, _ClassState] = {c.name: _ClassState(c) for c in classes}
+        self._order = list(self._classes.values())  # highest priority first
+        self._in_flight = 0
+        self._queued = 0
+
+    # ── Public API ─────────────────────────────────────────────────────
+
+    async def run(
+        self, user_input: str, *, priority: str | None = None, **run_kwargs: Any
+    ) -> SupervisorResult:
+        """Admit (possibly after queueing) and run, or return a rejected result."""
+        state = self._state(priority)
+
+        if self._in_flight < self.max_concurrency and self._queued == 0:
+            self._in_flight += 1
+            state.metrics.admitted += 1
+            state.record_delay(0.0)
+        else:
+            if self._queued >= self.max_queue and not self._evict_below(state):
+                state.metrics.shed_queue_full += 1
+                return self._rejected(state, "queue full")
+            loop = asyncio.get_running_loop()
+            waiter = _Waiter(loop.create_future(), loop.time())
+            state.queue.append(waiter)
+            self._queued += 1
+            try:
+                granted = await waiter.future
+            except asyncio.CancelledError:
+                self._abandon(state, waiter)
+                raise
+            if not granted:
+                return self._rejected(state, waiter.shed_reason)
+
+        try:
+            return await self.orchestrator.run(user_input, **run_kwargs)
+        finally:
+            self._in_flight -= 1
+            self._dispatch()
+
+    def metrics(self) -> AdmissionMetrics:
+        snapshot = AdmissionMetrics(in_flight=self._in_flight, max_concurrency=self.max_concurrency)
+        for name, state in self._classes.items():
+            state.metrics.queue_depth = len(state.queue)
+            snapshot.classes[name] = ClassMetrics(**vars(state.metrics))
+        return snapshot
+
+    # ── Internals ──────────────────────────────────────────────────────
+
+    def _state(self, priority: str | None) -> _ClassState:
+        if priority is None:
+            return self._order[0]
+        try:
+            return self._classes[priority]
+        except KeyError:
+            raise ValueError(
+                f"Unknown priority {priority!r}; expected one of {list(self._classes)}"
+            ) from None
+
+    def _dispatch(self) -> None:
+        """Hand freed slots to waiters, highest class first, shedding per CoDel."""
+        now = asyncio.get_running_loop().time()  # loop clock: virtual under simulation
+        for state in self._order:
+            while state.queue and self._in_flight < self.max_concurrency:
+                waiter = state.queue.popleft()
+                self._queued -= 1
+                if waiter.future.done():  # caller cancelled while queued
+                    continue
+                sojourn = now - waiter.enqueued_at
+                if state.should_shed(sojourn, now):
+                    state.metrics.shed_codel += 1
+                    waiter.shed_reason = "queueing delay above target"
+                    waiter.future.set_result(False)
+                    continue
+                state.record_delay(sojourn)
+                state.metrics.admitted += 1
+                self._in_flight += 1
+                waiter.future.set_result(True)
+            if self._in_flight >= self.max_concurrency:
+                return
+
+    def _evict_below(self, state: _ClassState) -> bool:
+        """Make room for *state* by shedding the newest lower-priority waiter."""
+        rank = self._order.index(state)
+        for lower in reversed(self._order[rank + 1:]):
+            while lower.queue:
+                waiter = lower.queue.pop()
+                self._queued -= 1
+                if waiter.future.done():
+                    continue
+                lower.metrics.shed_queue_full += 1
+                waiter.shed_reason = f"evicted by higher-priority class {state.spec.name!r}"
+                waiter.future.set_result(False)
+                return True
+        return False
+
+    def _abandon(self, state: _ClassState, waiter: _Waiter) -> None:
+        if waiter.future.done() and not waiter.future.cancelled() and waiter.future.result():
+            # Slot was granted just as the caller was cancelled — give it back
+            self._in_flight -= 1
+            self._dispatch()
+        elif waiter in state.queue:
+            state.queue.remove(waiter)
+            self._queued -= 1
+
+    @staticmethod
+    def _rejected(state: _ClassState, reason: str) -> SupervisorResult:
+        return SupervisorResult(
+            answer=f"Rejected by admission control ({state.spec.name}): {reason}.",
+            status="rejected",
+        )
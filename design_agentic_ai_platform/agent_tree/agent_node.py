@@ -17,9 +17,11 @@ Adapted to add:
 from __future__ import annotations
 
 import time
-from typing import Any, Callable, Awaitable
+from typing import Any, Callable, Awaitable, Literal
 
 from .handoff_models import HandoffResult, ToolResult
+from .model_view import ModelView, unwrap
+from .tool_executors import ExecutorPolicy, TimedTool, ToolExecutors, resolve_tool
 
 
 # Type alias for a minimal async agent callable.
@@ -30,6 +32,70 @@ AgentCallable = Callable[[str], Awaitable[HandoffResult]]
 # Signature:  async (**kwargs) -> Any
 ToolCallable = Callable[..., Awaitable[Any]]
 
+# Type alias for a sync tool function, offloaded per its ExecutorPolicy.
+# Signature:  (**kwargs) -> Any
+SyncToolCallable = Callable[..., Any]
+
+# What an agent-as-tool returns:
+#   "dict"   result.model_dump() — a deep copy, for external boundaries
+#   "model"  the HandoffResult itself (no copy, no re-validation)
+#   "view"   a read-only ModelView over it (dict-style access, no copy)
+# Through run_tool() "model" and "view" look the same: ToolResult.output
+# stores the HandoffResult (a ToolResult stays serializable, so views are
+# unwrapped).  "view" only changes what direct callers of the tool get.
+AsToolMode = Literal["dict", "model", "view"]
+
+
+async def _execute_tool(
+    fn: ToolCallable | None,
+    tool_name: str,
+    owner_name: str,
+    kwargs: dict[str, Any],
+) -> ToolResult:
+    """Run *fn* with *kwargs* and wrap the outcome in a ToolResult.
+
+    Shared by AgentNode.run_tool() and the compact tree's node views so both
+    node representations report tool errors and latency identically.
+    """
+    if fn is None:
+        return ToolResult(
+            tool_name=tool_name,
+            input_args=kwargs,
+            status="error",
+            error=f"Tool '{tool_name}' not registered on node '{owner_name}'",
+        )
+
+    start = time.perf_counter()
+    try:
+        if isinstance(fn, TimedTool):
+            output, queue_ms, exec_ms = await fn.invoke(kwargs)
+        else:
+            output = await fn(**kwargs)
+            queue_ms, exec_ms = 0, int((time.perf_counter() - start) * 1000)
+        # A ModelView from an agent-as-tool — possibly under a TimedTool
+        # wrapper — is stored as its model: same object, no copy, and it
+        # stays serializable in the ToolResult.
+        output = unwrap(output)
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        return ToolResult(
+            tool_name=tool_name,
+            input_args=kwargs,
+            output=output,
+            status="ok",
+            latency_ms=elapsed_ms,
+            queue_ms=queue_ms,
+            exec_ms=exec_ms,
+        )
+    except Exception as exc:
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        return ToolResult(
+            tool_name=tool_name,
+            input_args=kwargs,
+            status="error",
+            error=str(exc),
+            latency_ms=elapsed_ms,
+        )
+
 
 class AgentNode:
     """One node in the agent hierarchy.
@@ -74,18 +140,32 @@ class AgentNode:
         self.children.append(node)
         return node
 
-    def add_tool(self, tool: str | ToolCallable, name: str | None = None) -> None:
-        """Register a tool — either a name (str) or an async callable.
+    def add_tool(
+        self,
+        tool: str | ToolCallable | SyncToolCallable,
+        name: str | None = None,
+        *,
+        executor: ExecutorPolicy | None = None,
+        executors: ToolExecutors | None = None,
+    ) -> None:
+        """Register a tool — either a name (str) or a callable.
 
         If *tool* is a callable, its __name__ (or the explicit *name*) is
         added to the display list AND the function is stored in _tool_fns.
         If *tool* is a plain string, only the display list is updated.
+
+        Sync callables run under *executor* ("inline" | "thread" | "process" |
+        "sandbox", default "thread") on the *executors* pools (default: the
+        shared DEFAULT_EXECUTORS).  "process" and "sandbox" require a
+        picklable, module-level function and raise TypeError at
+        registration otherwise.
         """
         if callable(tool):
             tool_name = name or getattr(tool, "__name__", "unknown_tool")
+            fn = resolve_tool(tool, tool_name, executor, executors)
             if tool_name not in self.tools:
                 self.tools.append(tool_name)
-            self._tool_fns[tool_name] = tool
+            self._tool_fns[tool_name] = fn
         else:
             if tool not in self.tools:
                 self.tools.append(tool)
@@ -99,18 +179,33 @@ class AgentNode:
     # WHY: The Supervisor can "call" a child agent the same way it calls
     # any tool — unifying the invocation model.
 
-    def as_tool(self, tool_name: str | None = None) -> ToolCallable:
+    def as_tool(self, tool_name: str | None = None, *, mode: AsToolMode = "dict") -> ToolCallable:
         """Wrap this agent's run() as an async tool callable.
 
-        Returns an async function with signature (user_input: str) -> dict
+        Returns an async function with signature (user_input: str) -> result
         that the Supervisor (or any parent) can invoke as if it were a tool.
-        The dict contains the HandoffResult fields for easy consumption.
+
+        *mode* picks the result type (see AsToolMode).  Inside the tree
+        prefer "model" or "view": "dict" copies the whole HandoffResult on
+        every call, and parents that need typed access re-validate it.
+        model_view.as_handoff() turns any of the three into a HandoffResult,
+        validating only dicts.
+
+        run_tool() stores the HandoffResult itself for both "model" and
+        "view"; wrap ToolResult.output in a ModelView for read-only access.
+        Raises ValueError for an unknown *mode*.
         """
+        if mode not in ("dict", "model", "view"):
+            raise ValueError(f"Unknown as_tool mode {mode!r}; expected 'dict', 'model' or 'view'")
         resolved_name = tool_name or f"run_{self.node_id}"
         node = self  # capture for closure
 
-        async def _agent_as_tool(user_input: str) -> dict[str, Any]:
+        async def _agent_as_tool(user_input: str) -> Any:
             result = await node.run(user_input)
+            if mode == "model":
+                return result
+            if mode == "view":
+                return ModelView(result)
             return result.model_dump()
 
         _agent_as_tool.__name__ = resolved_name
@@ -126,35 +221,9 @@ class AgentNode:
         with typed returns — callers get validated, structured data instead
         of raw strings.
         """
-        fn = self._tool_fns.get(tool_name)
-        if fn is None:
-            return ToolResult(
-                tool_name=tool_name,
-                input_args=kwargs,
-                status="error",
-                error=f"Tool '{tool_name}' not registered on node '{self.name}'",
-            )
-
-        start = time.perf_counter()
-        try:
-            output = await fn(**kwargs)
-            elapsed_ms = int((time.perf_counter() - start) * 1000)
-            return ToolResult(
-                tool_name=tool_name,
-                input_args=kwargs,
-                output=output,
-                status="ok",
-                latency_ms=elapsed_ms,
-            )
-        except Exception as exc:
-            elapsed_ms = int((time.perf_counter() - start) * 1000)
-            return ToolResult(
-                tool_name=tool_name,
-                input_args=kwargs,
-                status="error",
-                error=str(exc),
-                latency_ms=elapsed_ms,
-            )
+        return await _execute_tool(
+            self._tool_fns.get(tool_name), tool_name, self.name, kwargs
+        )
 
     # ── Queries ────────────────────────────────────────────────────────
 
@@ -0,0 +1,282 @@
+"""
+Content-addressed artifact store — keeps large blobs out of handoffs.
+
+WHY:  Children put ERP records, retrieved documents and raw tool outputs
+      straight into HandoffResult.payload / ToolResult.output.  Every one of
+      those bytes is then copied through re-validation, hooks, the step log,
+      as_tool dumps and the final SupervisorResult — usually to be read by
+      at most one consumer.  Storing the blob once and passing a small
+      reference around makes the handoff cost independent of the blob size.
+
+Layout on disk (one store can be shared by every worker on a machine):
+
+    root/sha256/3f/3fa1...e9      immutable blob, named by its SHA-256
+    root/tmp/                     in-progress writes (atomic rename into place)
+
+Same content → same key, so repeated documents are stored once.
+
+References.  An offloaded value is replaced in place by a small marker dict
+
+    {"$artifact": "cas://sha256/<hex>", "size": 48213, "media_type": "application/json"}
+
+and its URI is appended to HandoffResult.artifacts.  Markers are plain JSON,
+so they survive validation, the step log and every codec unchanged.
+
+Reads are lazy.  open() returns a memoryview over an mmap of the blob (the
+OS page cache is shared across processes), and load() returns raw blobs as
+that view, without copying.  JSON blobs are read into one bytes object and
+decoded: the JSON parser cannot take a memoryview.
+
+Offloading is decided without encoding first: a quick upper bound on each
+value's JSON size clears the common small handoff on the event loop, and
+only values that may cross the threshold are encoded (off the loop).
+
+Usage:
+    store = ArtifactStore("/var/lib/agents/cas", threshold_bytes=64 * 1024)
+    orchestrator = SupervisorOrchestrator(tree=tree, artifact_store=store)
+    ...
+    payload = store.materialize_payload(handoff)     # only where it's needed
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import pydantic_core
+
+from .codec import to_json
+from .handoff_models import HandoffResult, ToolResult
+
+
+JSON_MEDIA_TYPE = "application/json"
+BYTES_MEDIA_TYPE = "application/octet-stream"
+_URI_PREFIX = "cas://sha256/"
+_MARKER_KEY = "$artifact"
+
+
+class ArtifactMissing(LookupError):
+    """A reference points at a blob that is not in this store."""
+
+
+@dataclass(frozen=True)
+class ArtifactRef:
+    """Reference to one immutable blob in an ArtifactStore."""
+
+    digest: str
+    size: int
+    media_type: str = JSON_MEDIA_TYPE
+
+    @property
+    def uri(self) -> str:
+        return _URI_PREFIX + self.digest
+
+    def to_marker(self) -> dict[str, Any]:
+        return {_MARKER_KEY: self.uri, "size": self.size, "media_type": self.media_type}
+
+    @classmethod
+    def from_marker(cls, value: Any) -> ArtifactRef | None:
+        """The reference held by a marker dict, or None if *value* is not one."""
+        if type(value) is not dict or _MARKER_KEY not in value:
+            return None
+        uri = value[_MARKER_KEY]
+        if not isinstance(uri, str) or not uri.startswith(_URI_PREFIX):
+            return None
+        return cls(uri[len(_URI_PREFIX):], value.get("size", 0), value.get("media_type", JSON_MEDIA_TYPE))
+
+
+def _fits(value: Any, limit: int) -> bool:
+    """True if *value* certainly encodes to at most *limit* bytes.
+
+    Walks an upper bound of the JSON size (every string char fully
+    escaped) and stops as soon as the bound passes *limit*.  Values it
+    cannot bound cheaply (models, arbitrary objects) count as not fitting,
+    so the caller encodes them to find out.
+    """
+    budget = limit
+    stack = [value]
+    while stack:
+        v = stack.pop()
+        t = type(v)
+        if v is None or t is bool:
+            budget -= 5
+        elif t is int or t is float:
+            budget -= 24
+        elif t is str:
+            budget -= 6 * len(v) + 2
+        elif t in (bytes, bytearray, memoryview):
+            budget -= len(v)
+        elif t is dict:
+            budget -= 2 + 2 * len(v)           # braces, colons and commas
+            stack.extend(v.keys())
+            stack.extend(v.values())
+        elif t is list or t is tuple:
+            budget -= 2 + len(v)               # brackets and commas
+            stack.extend(v)
+        else:
+            return False
+        if budget < 0:
+            return False
+    return True
+
+
+def is_artifact_ref(value: Any) -> bool:
+    return ArtifactRef.from_marker(value) is not None
+
+
+class ArtifactStore:
+    """Local content-addressed blob store with automatic handoff offloading."""
+
+    def __init__(
+        self,
+        root: str | os.PathLike[str],
+        *,
+        threshold_bytes: int = 64 * 1024,
+        verify_reads: bool = False,
+    ) -> None:
+        self.root = Path(root)
+        # Values whose encoded size exceeds this are offloaded by offload*()
+        self.threshold_bytes = threshold_bytes
+        # Re-hash blobs on open() — catches on-disk corruption at a CPU cost
+        self.verify_reads = verify_reads
+        (self.root / "sha256").mkdir(parents=True, exist_ok=True)
+        (self.root / "tmp").mkdir(parents=True, exist_ok=True)
+
+    # ── Blobs ──────────────────────────────────────────────────────────
+
+    def put(self, data: bytes | bytearray | memoryview, media_type: str = BYTES_MEDIA_TYPE) -> ArtifactRef:
+        """Store *data* (idempotent) and return its reference."""
+        digest = hashlib.sha256(data).hexdigest()
+        ref = ArtifactRef(digest, len(data), media_type)
+        path = self.path(ref)
+        if path.exists():
+            return ref  # content-addressed: already stored
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root / "tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                # The step log may persist the reference right after this —
+                # the blob must be durable first.
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        return ref
+
+    def put_value(self, value: Any) -> ArtifactRef:
+        """Store raw bytes as-is, anything else as JSON."""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return self.put(value, BYTES_MEDIA_TYPE)
+        return self.put(to_json(value), JSON_MEDIA_TYPE)
+
+    def path(self, ref: ArtifactRef) -> Path:
+        return self.root / "sha256" / ref.digest[:2] / ref.digest
+
+    def exists(self, ref: ArtifactRef) -> bool:
+        return self.path(ref).exists()
+
+    def open(self, ref: ArtifactRef) -> memoryview:
+        """Memory-mapped, read-only view of the blob (no copy)."""
+        try:
+            f = open(self.path(ref), "rb")
+        except FileNotFoundError:
+            raise ArtifactMissing(f"{ref.uri} is not in {self.root}") from None
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")  # mmap cannot map empty files
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        if self.verify_reads and hashlib.sha256(view).hexdigest() != ref.digest:
+            raise ValueError(f"{ref.uri} failed its integrity check")
+        return view
+
+    def load(self, ref: ArtifactRef) -> Any:
+        """Decoded JSON value, or a memoryview for raw blobs."""
+        if ref.media_type != JSON_MEDIA_TYPE:
+            return self.open(ref)
+        try:
+            data = self.path(ref).read_bytes()  # one read; no mmap to copy out of
+        except FileNotFoundError:
+            raise ArtifactMissing(f"{ref.uri} is not in {self.root}") from None
+        if self.verify_reads and hashlib.sha256(data).hexdigest() != ref.digest:
+            raise ValueError(f"{ref.uri} failed its integrity check")
+        return pydantic_core.from_json(data)
+
+    # ── Offloading ─────────────────────────────────────────────────────
+
+    def offload(self, value: Any) -> Any:
+        """*value* itself if small, else a marker for the stored blob."""
+        return self._offload(value)[0]
+
+    def may_offload(self, result: HandoffResult) -> bool:
+        """False if offload_handoff() certainly has nothing to do — no encoding.
+
+        Cheap enough for the event loop; callers offload in a thread only
+        when this is True.
+        """
+        values = [*result.payload.values(), *(tr.output for tr in result.traces.tool_results)]
+        return any(not _fits(value, self.threshold_bytes) for value in values)
+
+    def offload_handoff(self, result: HandoffResult) -> HandoffResult:
+        """Offload oversized payload values and tool outputs of one handoff.
+
+        Returns *result* unchanged when nothing crossed the threshold, else
+        a copy whose artifacts list includes the new references.
+        """
+        refs: list[ArtifactRef] = []
+
+        payload = dict(result.payload)
+        for key, value in payload.items():
+            payload[key], ref = self._offload(value)
+            if ref is not None:
+                refs.append(ref)
+
+        tool_results: list[ToolResult] = []
+        for tr in result.traces.tool_results:
+            output, ref = self._offload(tr.output)
+            if ref is not None:
+                refs.append(ref)
+                tr = tr.model_copy(update={"output": output})
+            tool_results.append(tr)
+
+        if not refs:
+            return result
+        artifacts = list(result.artifacts)
+        artifacts += [uri for uri in dict.fromkeys(r.uri for r in refs) if uri not in artifacts]
+        return result.model_copy(update={
+            "payload": payload,
+            "artifacts": artifacts,
+            "traces": result.traces.model_copy(update={"tool_results": tool_results}),
+        })
+
+    # ── Lazy materialisation ───────────────────────────────────────────
+
+    def materialize(self, value: Any) -> Any:
+        """Load *value* if it is a marker; return it unchanged otherwise."""
+        ref = ArtifactRef.from_marker(value)
+        return value if ref is None else self.load(ref)
+
+    def materialize_payload(self, result: HandoffResult) -> dict[str, Any]:
+        """The handoff's payload with every offloaded value loaded back."""
+        return {key: self.materialize(value) for key, value in result.payload.items()}
+
+    # ── Internals ──────────────────────────────────────────────────────
+
+    def _offload(self, value: Any) -> tuple[Any, ArtifactRef | None]:
+        if _fits(value, self.threshold_bytes) or is_artifact_ref(value):
+            return value, None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            data, media_type = value, BYTES_MEDIA_TYPE
+        else:
+            data, media_type = to_json(value), JSON_MEDIA_TYPE
+        if len(data) <= self.threshold_bytes:
+            return value, None
+        ref = self.put(data, media_type)
+        return ref.to_marker(), ref
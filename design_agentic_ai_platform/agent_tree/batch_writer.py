@@ -0,0 +1,167 @@
+"""
+BatchWriter — background group-commit writer for local persistence.
+
+WHY:  Persisting every orchestration step / trace event synchronously
+      would put one fsync (or SQLite commit) on the request latency path
+      per step.  Instead callers submit() records into an in-memory buffer
+      and a single background thread commits them in batches:
+
+        - as soon as `batch_size` records are pending, or
+        - every `flush_interval_s`, whichever comes first.
+
+      One commit covers many steps from many concurrent runs (classic group
+      commit).  The cost is a bounded durability window: a crash can lose
+      at most the last `flush_interval_s` worth of records.
+
+Failed writes: a batch whose write raises is retried (`max_retries` times,
+with exponential backoff) before it is given up on.  A dropped batch is
+never counted as committed — every flush() / close() whose records it
+contained raises, so callers that need durability (resume) find out.
+
+Subclasses implement _write_batch() (one transaction / one fsync) and
+optionally _close_resources().
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class BatchWriter(ABC, Generic[T]):
+    """Buffers records and commits them in batches from a daemon thread."""
+
+    def __init__(
+        self,
+        *,
+        batch_size: int = 256,
+        flush_interval_s: float = 0.05,
+        max_retries: int = 3,
+        retry_backoff_s: float = 0.05,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_retries = max_retries
+        self.retry_backoff_s = retry_backoff_s
+        self._pending: list[T] = []
+        self._submitted = 0   # records ever submitted
+        self._processed = 0   # records ever committed or dropped (in submit order)
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self._flush_requested = False
+        # Dropped batches as (first, end) record numbers + the last write error
+        self._failures: list[tuple[int, int, BaseException]] = []
+
+    # ── Producer API ───────────────────────────────────────────────────
+
+    def submit(self, record: T) -> None:
+        """Queue *record* for the next batch.  Never blocks on I/O."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{type(self).__name__} is closed")
+            self._pending.append(record)
+            self._submitted += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{type(self).__name__}-writer", daemon=True
+                )
+                self._thread.start()
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self) -> None:
+        """Block until everything submitted so far is written.
+
+        Raises RuntimeError if any record that was still pending when
+        flush() was called could not be written.
+        """
+        with self._cond:
+            start, target = self._processed, self._submitted
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._processed < target and self._thread is not None:
+                self._cond.wait()
+            self._raise_if_failed(start, target)
+
+    def close(self) -> None:
+        """Flush outstanding records, stop the writer thread, release resources."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            start, target = self._processed, self._submitted
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self._close_resources()
+        self._raise_if_failed(start, target)
+
+    def __enter__(self) -> BatchWriter[T]:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # ── Subclass hooks ─────────────────────────────────────────────────
+
+    @abstractmethod
+    def _write_batch(self, records: list[T]) -> None:
+        """Durably write *records* in one transaction.  Runs on the writer thread."""
+
+    def _close_resources(self) -> None:
+        """Release files / connections after the writer thread has exited."""
+
+    # ── Writer thread ──────────────────────────────────────────────────
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if (
+                    not self._closed
+                    and not self._flush_requested
+                    and len(self._pending) < self.batch_size
+                ):
+                    # Leave the window open so concurrent producers join this commit
+                    self._cond.wait(self.flush_interval_s)
+                batch, self._pending = self._pending, []
+                self._flush_requested = False
+                stop = self._closed and not batch
+
+            if stop:
+                return
+            error = self._write_with_retries(batch)
+            with self._cond:
+                if error is not None:   # surfaced by the flush()/close() covering it
+                    self._failures.append((self._processed, self._processed + len(batch), error))
+                self._processed += len(batch)
+                self._cond.notify_all()
+
+    def _write_with_retries(self, batch: list[T]) -> BaseException | None:
+        """Write *batch*, retrying transient failures.  Returns the last error, if any."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write_batch(batch)
+                return None
+            except Exception as exc:
+                error = exc
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_backoff_s * 2**attempt)
+        return error
+
+    def _raise_if_failed(self, start: int, end: int) -> None:
+        """Raise if a dropped batch overlaps records [start, end) (under _cond or after join)."""
+        lost = [(first, last, exc) for first, last, exc in self._failures
+                if first < end and last > start]
+        if lost:
+            count = sum(min(last, end) - max(first, start) for first, last, _ in lost)
+            error = lost[-1][2]
+            raise RuntimeError(
+                f"{type(self).__name__}: {count} record(s) could not be written: {error}"
+            ) from error
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Nested agents-as-tools benchmark: as_tool(mode="dict" | "model" | "view").
+
+Builds a chain of agents, each calling the next through as_tool() +
+run_tool(), reading the child's typed HandoffResult (model_view.as_handoff)
+and embedding the child's output in its own payload — the usual
+"specialist wraps sub-specialist" shape.  The leaf returns a payload of
+records, so every dict conversion along the chain has real data to copy.
+
+Reports per top-level call: wall time, peak traced heap (tracemalloc) and
+the number of memory blocks the returned result keeps alive.
+
+Run:
+    python -m agent_tree.bench_as_tool                      (from design_agentic_ai_platform/)
+    python agent_tree/bench_as_tool.py --depth 16 --rows 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_tree.agent_node import AgentNode, AsToolMode
+from agent_tree.handoff_models import HandoffResult, HandoffTraces
+from agent_tree.model_view import as_handoff
+
+
+def build_chain(depth: int, rows: int, mode: AsToolMode) -> AgentNode:
+    records = [{"id": i, "vendor": "ACME", "amount": 100.0 + i, "status": "open"} for i in range(rows)]
+    nodes = [AgentNode(f"level-{d}") for d in range(depth)]
+
+    async def leaf(user_input: str) -> HandoffResult:
+        return HandoffResult(
+            from_agent=nodes[-1].name, to_agent="supervisor", status="ok",
+            summary="found records", payload={"records": records},
+            traces=HandoffTraces(token_usage=100),
+        )
+
+    def middle(node: AgentNode, tool_name: str):
+        async def agent(user_input: str) -> HandoffResult:
+            tr = await node.run_tool(tool_name, user_input=user_input)
+            child = as_handoff(tr.output)  # typed access; validates only dicts
+            return HandoffResult(
+                from_agent=node.name, to_agent="supervisor", status=child.status,
+                summary=f"{node.name}: {child.summary}", payload={"child": tr.output},
+                traces=HandoffTraces(token_usage=child.traces.token_usage + 10, tool_results=[tr]),
+            )
+        return agent
+
+    nodes[-1].set_agent(leaf)
+    for parent, child in zip(nodes, nodes[1:]):
+        parent.add_child(child)
+        tool_name = f"run_{child.name}"
+        parent.add_tool(child.as_tool(tool_name, mode=mode))
+        parent.set_agent(middle(parent, tool_name))
+    return nodes[0]
+
+
+def measure(root: AgentNode, repeat: int) -> tuple[float, int, int]:
+    """(best seconds per call, peak traced bytes, blocks allocated during one call)."""
+    async def timed_calls() -> float:
+        await root.run("warm up")
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await root.run("why was invoice #4821 rejected?")
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    async def traced_call() -> tuple[int, int]:
+        gc.collect()
+        blocks_before = sys.getallocatedblocks()
+        tracemalloc.start()
+        result = await root.run("why was invoice #4821 rejected?")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        blocks = sys.getallocatedblocks() - blocks_before  # still held by the result
+        del result
+        return peak, blocks
+
+    best = asyncio.run(timed_calls())
+    peak, blocks = asyncio.run(traced_call())
+    return best, peak, blocks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--depth", type=int, default=8, help="agents in the chain")
+    parser.add_argument("--rows", type=int, default=200, help="records in the leaf payload")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print("=" * 64)
+    print(f"AGENTS-AS-TOOLS BENCHMARK  (depth {args.depth}, {args.rows} leaf records)")
+    print("=" * 64)
+    print(f"  {'mode':<10}{'ms / call':>12}{'peak heap':>16}{'blocks held':>16}")
+    for mode in ("dict", "model", "view"):
+        seconds, peak, blocks = measure(build_chain(args.depth, args.rows, mode), args.repeat)
+        print(f"  {mode:<10}{seconds * 1000:>12.3f}{peak:>16,}{blocks:>16,}")
+    print()
+    print("  'blocks held' = objects the returned result keeps alive: dict mode")
+    print("  holds a private copy of every level's subtree; model / view share them.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark: persisting a record that wraps a SupervisorResult.
+
+Builds a representative SupervisorResult (several handoffs, each with tool
+results and a nested payload), wraps it in a step-log style envelope and
+reports encode throughput for:
+    two-hop     json.dumps({..., "data": {"result": result.model_dump(mode="json")}})
+    one-pass    codec.to_json({..., "data": {"result": result}})
+
+plus, for reference, the bare model: model_dump_json() — which is exactly
+what codec.to_json(result) does — and model_validate_json().
+
+Run:
+    python -m agent_tree.bench_codec                        (from design_agentic_ai_platform/)
+    python agent_tree/bench_codec.py --handoffs 20 --tools 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_tree import codec
+from agent_tree.handoff_models import HandoffResult, HandoffTraces, SupervisorResult, ToolResult
+
+
+def build_result(n_handoffs: int, n_tools: int) -> SupervisorResult:
+    handoffs = []
+    for h in range(n_handoffs):
+        tool_results = [
+            ToolResult(
+                tool_name=f"erp_lookup_{t}",
+                input_args={"invoice_id": 4821 + t, "fields": ["status", "amount", "vendor"]},
+                output={"status": "rejected", "amount": 1234.56, "vendor": "ACME", "lines": list(range(10))},
+                latency_ms=40 + t,
+                queue_ms=2,
+                exec_ms=38 + t,
+            )
+            for t in range(n_tools)
+        ]
+        handoffs.append(HandoffResult(
+            from_agent=f"specialist-{h}",
+            to_agent="supervisor",
+            status="needs_more_info" if h < n_handoffs - 1 else "ok",
+            summary=f"Specialist {h} checked the invoice against policy and found a mismatch.",
+            payload={"confidence": 0.87, "reasons": ["amount over limit", "missing PO"], "step": h},
+            artifacts=[f"s3://audit/run/{h}.json"],
+            traces=HandoffTraces(
+                step_id=f"step-{h}",
+                tool_calls=[tr.tool_name for tr in tool_results],
+                tool_results=tool_results,
+                token_usage=850 + h,
+                latency_ms=900,
+                reasoning_steps=["looked up invoice", "compared to policy"],
+            ),
+        ))
+    return SupervisorResult(
+        answer="Invoice #4821 was rejected because the amount exceeds the approval limit.",
+        plan={"steps": ["lookup", "policy"], "confidence": 0.9},
+        handoffs_received=handoffs,
+        total_steps=n_handoffs,
+        total_tokens=sum(h.traces.token_usage for h in handoffs),
+        run_id="8f14e45fceea167a5a36dedd4bea2543",
+    )
+
+
+def per_second(fn: Callable[[], Any], min_time: float = 0.5) -> float:
+    """Calls per second, best of three batches sized to run ~min_time each."""
+    n, start = 0, time.perf_counter()
+    while time.perf_counter() - start < min_time / 5:
+        fn()
+        n += 1
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        best = min(best, (time.perf_counter() - start) / n)
+    return 1 / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--handoffs", type=int, default=5)
+    parser.add_argument("--tools", type=int, default=4, help="tool results per handoff")
+    args = parser.parse_args()
+
+    result = build_result(args.handoffs, args.tools)
+    record = {"run_id": result.run_id, "seq": 7, "kind": "final"}
+    two_hop = lambda: json.dumps({**record, "data": {"result": result.model_dump(mode="json")}}).encode()
+    one_pass = lambda: codec.to_json({**record, "data": {"result": result}})
+    assert json.loads(two_hop()) == json.loads(one_pass())
+
+    print("=" * 64)
+    print(f"RECORD SERIALIZATION BENCHMARK  ({args.handoffs} handoffs × {args.tools} tools)")
+    print("=" * 64)
+    print(f"  {'step-log record':<34}{'bytes':>10}{'encode/s':>14}")
+    slow = per_second(two_hop)
+    fast = per_second(one_pass)
+    print(f"  {'json.dumps(model_dump())':<34}{len(two_hop()):>10,}{slow:>14,.0f}")
+    print(f"  {'codec.to_json(record)':<34}{len(one_pass()):>10,}{fast:>14,.0f}  ({fast / slow:.1f}x)")
+
+    blob = result.model_dump_json()
+    print()
+    print("  bare model (same call as codec.to_json / from_json):")
+    print(f"  {'model_dump_json()':<34}{len(blob):>10,}{per_second(result.model_dump_json):>14,.0f}")
+    print(f"  {'model_validate_json()':<34}{'':>10}"
+          f"{per_second(lambda: SupervisorResult.model_validate_json(blob)):>14,.0f}  (decode/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: AgentNode object graph vs CompactAgentTree.
+
+Builds the same tree twice — a root supervisor with one specialist per
+tenant and a few product agents under each tenant — and reports heap bytes
+(tracemalloc) plus find() / route() timings for both representations.
+
+Run:
+    python -m agent_tree.bench_compact_tree                 (from design_agentic_ai_platform/)
+    python agent_tree/bench_compact_tree.py --nodes 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_tree.agent_node import AgentNode
+from agent_tree.agent_tree import AgentTree
+from agent_tree.compact_tree import CompactAgentTree
+from agent_tree.orchestrator import SupervisorOrchestrator
+
+PRODUCTS_PER_TENANT = 4
+TOOLS = ["erp_lookup", "policy_search", "refund_api"]
+
+
+def build_object_tree(n_tenants: int) -> AgentTree:
+    root = AgentNode("supervisor", tools=["classify"])
+    for t in range(n_tenants):
+        tenant = root.add_child(AgentNode(f"tenant-{t}", tools=[TOOLS[t % 3]]))
+        for p in range(PRODUCTS_PER_TENANT):
+            tenant.add_child(AgentNode(f"tenant-{t}-product-{p}", tools=list(TOOLS[:2])))
+    return AgentTree(root)
+
+
+def build_compact_tree(n_tenants: int) -> CompactAgentTree:
+    tree = CompactAgentTree("supervisor", tools=["classify"])
+    for t in range(n_tenants):
+        tenant = tree.add_node(0, f"tenant-{t}", tools=[TOOLS[t % 3]])
+        for p in range(PRODUCTS_PER_TENANT):
+            tree.add_node(tenant, f"tenant-{t}-product-{p}", tools=TOOLS[:2])
+    return tree
+
+
+def measure(build: Callable[[], Any]) -> tuple[Any, int, float]:
+    """Return (result, retained heap bytes, build seconds)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed
+
+
+def timed(fn: Callable[[], Any], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--nodes", type=int, default=200_000, help="approximate total nodes")
+    args = parser.parse_args()
+
+    n_tenants = max(1, args.nodes // (PRODUCTS_PER_TENANT + 1))
+    target = f"tenant-{n_tenants - 1}-product-{PRODUCTS_PER_TENANT - 1}"
+    query = f"route this to tenant-{n_tenants // 2} please"
+
+    obj_tree, obj_bytes, obj_build = measure(lambda: build_object_tree(n_tenants))
+    compact, compact_bytes, compact_build = measure(lambda: build_compact_tree(n_tenants))
+    compact.find("supervisor")  # build the lazy CSR index outside the timings
+
+    n = len(compact)
+    print("=" * 64)
+    print(f"AGENT TREE MEMORY BENCHMARK  ({n:,} nodes, {n_tenants:,} tenants)")
+    print("=" * 64)
+    print(f"  {'':<22}{'object graph':>18}{'compact':>18}")
+    print(f"  {'heap bytes':<22}{obj_bytes:>18,}{compact_bytes:>18,}")
+    print(f"  {'bytes / node':<22}{obj_bytes / n:>18.1f}{compact_bytes / n:>18.1f}")
+    print(f"  {'build (s)':<22}{obj_build:>18.3f}{compact_build:>18.3f}")
+    print(f"  {'find(deepest) (s)':<22}"
+          f"{timed(lambda: obj_tree.find(target)):>18.4f}"
+          f"{timed(lambda: compact.find(target)):>18.6f}")
+    print(f"  {'route(root) (s)':<22}"
+          f"{timed(lambda: SupervisorOrchestrator._route(query, obj_tree.root.children)):>18.4f}"
+          f"{timed(lambda: compact.route(query)):>18.4f}")
+    print()
+    print(f"  Memory ratio: {obj_bytes / compact_bytes:.1f}x smaller "
+          f"(unique node names dominate what remains; the lazy CSR index "
+          f"adds ~8 bytes/node once built)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Sandboxed tool call latency: fresh process per call vs warm SandboxPool.
+
+Runs the same small tool (imports json, returns a dict) three ways:
+  - fresh spawn       start a new interpreter per call (ad-hoc isolation)
+  - pool, recycle/1   SandboxPool(max_calls=1): a new forkserver worker
+                      per call, replaced in the background
+  - pool, warm        SandboxPool: pre-imported workers reused across calls
+
+Run:
+    python -m agent_tree.bench_sandbox              (from design_agentic_ai_platform/)
+    python agent_tree/bench_sandbox.py --calls 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_tree.sandbox import SandboxPool
+
+
+def parse_record(text: str) -> dict:
+    import json
+    return json.loads(text)
+
+
+def fresh_process_call(method: str) -> float:
+    ctx = multiprocessing.get_context(method)
+    start = time.perf_counter()
+    with ctx.Pool(1) as pool:
+        pool.apply(parse_record, ('{"invoice": 4821}',))
+    return time.perf_counter() - start
+
+
+async def pooled_calls(calls: int, max_calls: int | None) -> list[float]:
+    async with SandboxPool(
+        size=2, preload=("json",), max_calls=max_calls, preload_forkserver=True
+    ) as pool:
+        times = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            await pool.call(parse_record, {"text": '{"invoice": 4821}'})
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = [
+        ("fresh spawn", [fresh_process_call("spawn") for _ in range(max(3, args.calls // 4))]),
+        ("pool, recycle/1", asyncio.run(pooled_calls(args.calls, max_calls=1))),
+        ("pool, warm", asyncio.run(pooled_calls(args.calls, max_calls=None))),
+    ]
+
+    print("=" * 64)
+    print("SANDBOXED TOOL CALL LATENCY")
+    print("=" * 64)
+    print(f"  {'mode':<18}{'calls':>8}{'p50 ms':>12}{'max ms':>12}")
+    for name, times in rows:
+        times.sort()
+        print(f"  {name:<18}{len(times):>8}{times[len(times) // 2] * 1000:>12.2f}{times[-1] * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
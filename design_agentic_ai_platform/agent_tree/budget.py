@@ -0,0 +1,100 @@
+"""
+Per-node token / cost estimates for budgeted routing.
+
+WHY:  SupervisorOrchestrator used to count tokens only after the fact, so a
+      long fall-through chain (needs_more_info → next child → ...) could
+      spend far more than the request was worth.  With an estimate of what
+      each child usually costs, the orchestrator can skip children that
+      cannot fit in the remaining budget and stop early once it is spent.
+
+Estimates are an exponentially weighted moving average of
+HandoffTraces.token_usage per node, learned online from every handoff and
+optionally warm-started from historical SupervisorResults via fit().  Both
+key on the tree's node name (what the orchestrator looks estimates up by),
+never on the self-reported HandoffResult.from_agent.
+Cost = tokens / 1000 × the node's price (nodes often run different models).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from .handoff_models import SupervisorResult
+
+
+@dataclass
+class CostEstimator:
+    """EWMA token estimate per node name, plus per-node pricing."""
+
+    alpha: float = 0.2
+    # Unseen nodes are assumed free so they get tried at least once
+    default_tokens: float = 0.0
+    price_per_1k_tokens: dict[str, float] = field(default_factory=dict)
+    default_price_per_1k_tokens: float = 0.0
+    _tokens: dict[str, float] = field(default_factory=dict, repr=False)
+
+    # ── Learning ───────────────────────────────────────────────────────
+
+    def observe(self, node_name: str, tokens: int) -> None:
+        """Fold one observed handoff's token usage into the node's estimate."""
+        previous = self._tokens.get(node_name)
+        if previous is None:
+            self._tokens[node_name] = float(tokens)
+        else:
+            self._tokens[node_name] = previous + self.alpha * (tokens - previous)
+
+    def fit(self, results: Iterable[SupervisorResult]) -> CostEstimator:
+        """Warm-start from historical runs, keyed by SupervisorResult.agents_run.
+
+        Retention may have dropped early handoffs (last_n), so the retained
+        ones are matched to the *last* node names.  Results without
+        agents_run are skipped — their node names are unknown.
+        """
+        for result in results:
+            handoffs = result.handoffs_received
+            if not handoffs or len(result.agents_run) < len(handoffs):
+                continue
+            names = result.agents_run[len(result.agents_run) - len(handoffs):]
+            for name, handoff in zip(names, handoffs):
+                self.observe(name, handoff.traces.token_usage)
+        return self
+
+    # ── Estimates ──────────────────────────────────────────────────────
+
+    def expected_tokens(self, node_name: str) -> float:
+        return self._tokens.get(node_name, self.default_tokens)
+
+    def cost_of(self, node_name: str, tokens: float) -> float:
+        price = self.price_per_1k_tokens.get(node_name, self.default_price_per_1k_tokens)
+        return tokens / 1000 * price
+
+    def expected_cost(self, node_name: str) -> float:
+        return self.cost_of(node_name, self.expected_tokens(node_name))
+
+
+@dataclass
+class Budget:
+    """Remaining token / cost allowance for one run (None = unlimited)."""
+
+    tokens: float | None = None
+    cost: float | None = None
+
+    def affords(self, estimator: CostEstimator, node_name: str) -> bool:
+        if self.tokens is not None and estimator.expected_tokens(node_name) > self.tokens:
+            return False
+        if self.cost is not None and estimator.expected_cost(node_name) > self.cost:
+            return False
+        return True
+
+    def charge(self, tokens: int, cost: float) -> None:
+        if self.tokens is not None:
+            self.tokens -= tokens
+        if self.cost is not None:
+            self.cost -= cost
+
+    @property
+    def exhausted(self) -> bool:
+        return (self.tokens is not None and self.tokens <= 0) or (
+            self.cost is not None and self.cost <= 0
+        )
@@ -0,0 +1,39 @@
+"""
+One-pass JSON for records that wrap the handoff models.
+
+WHY:  SupervisorResult / HandoffResult are persisted for audit (step logs,
+      handoff sinks, recordings) inside envelope dicts — run id, sequence
+      number, kind.  The expensive pattern is the two-hop
+      json.dumps({..., "result": model.model_dump(mode="json")})  — Pydantic
+      builds a throwaway dict tree in Python, then the stdlib encodes it
+      again.
+
+to_json() hands the whole envelope, models included, to pydantic-core's
+Rust serializer in a single pass, so callers never materialise
+model_dump() dicts.  That envelope case is the whole win: for a bare model
+it is exactly model_dump_json(), and from_json() is model_validate_json().
+Output is plain JSON, readable by any consumer.
+
+Benchmark: python -m agent_tree.bench_codec
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import pydantic_core
+from pydantic import BaseModel
+
+
+def to_json(value: Any, *, fallback: Any = None) -> bytes:
+    """Serialize a model — or a dict / list containing models — in one pass.
+
+    *fallback* is called for values JSON cannot represent (e.g. ``repr``);
+    without it they raise.
+    """
+    return pydantic_core.to_json(value, fallback=fallback)
+
+
+def from_json(data: bytes | str, cls: type[BaseModel]) -> Any:
+    """Inverse of to_json() for a single model."""
+    return cls.model_validate_json(data)
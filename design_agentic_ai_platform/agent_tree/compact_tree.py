@@ -0,0 +1,454 @@
+"""
+CompactAgentTree — struct-of-arrays agent tree for very large hierarchies.
+
+WHY a second representation:
+  - AgentNode is a full Python object: __dict__, children list, tools list,
+    metadata dict and a _tool_fns dict per node.  At ~1M nodes (one
+    specialist per tenant/product) that per-object overhead dominates memory.
+  - Here the tree is a handful of flat `array.array` columns (parent index,
+    CSR child offsets, interned name / node-id / tool-id columns) plus one
+    shared string table.  Nodes only materialise as tiny __slots__ views
+    when someone asks for them.
+
+Exposes the same surface the rest of the package relies on:
+  - find() / visualize() with identical output to AgentTree
+  - .root and view.children / .name / .tools / .run(), so
+    SupervisorOrchestrator and its routing work unchanged
+  - route() — array-native version of SupervisorOrchestrator._route
+
+Trade-off:  the compact tree is append-only (add_node) — no re-parenting
+or removal.  Build the structure once, then serve lookups from it.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any, Iterator
+
+from .agent_node import AgentCallable, AgentNode, ToolCallable, _execute_tool
+from .agent_tree import AgentTree
+from .handoff_models import HandoffResult, ToolResult
+from .tool_executors import ExecutorPolicy, ToolExecutors, resolve_tool
+
+
+_NO_PARENT = -1
+_NO_AGENT = -1
+
+
+class CompactNode:
+    """Read-only, slot-based view of one node in a CompactAgentTree.
+
+    Views are created on demand and hold only (tree, index), so they are
+    cheap to create and discard.  Two views of the same node compare equal
+    and hash the same, so they can key dicts in hooks.
+    """
+
+    __slots__ = ("_tree", "index")
+
+    def __init__(self, tree: CompactAgentTree, index: int) -> None:
+        self._tree = tree
+        self.index = index
+
+    # ── Attributes (mirrors AgentNode) ─────────────────────────────────
+
+    @property
+    def node_id(self) -> str:
+        return self._tree._strings[self._tree._node_ids[self.index]]
+
+    @property
+    def name(self) -> str:
+        return self._tree._strings[self._tree._name_ids[self.index]]
+
+    @property
+    def tools(self) -> list[str]:
+        return self._tree._tool_names(self.index)
+
+    @property
+    def metadata(self) -> dict[str, Any]:
+        return self._tree._metadata.get(self.index, {})
+
+    @property
+    def agent(self) -> AgentCallable | None:
+        agent_id = self._tree._agent_ids[self.index]
+        return None if agent_id == _NO_AGENT else self._tree._agents[agent_id]
+
+    @property
+    def children(self) -> list[CompactNode]:
+        return [CompactNode(self._tree, i) for i in self._tree._child_indices(self.index)]
+
+    @property
+    def parent(self) -> CompactNode | None:
+        parent = self._tree._parents[self.index]
+        return None if parent == _NO_PARENT else CompactNode(self._tree, parent)
+
+    @property
+    def is_leaf(self) -> bool:
+        offsets = self._tree._index()[0]
+        return offsets[self.index] == offsets[self.index + 1]
+
+    @property
+    def depth(self) -> int:
+        d = 0
+        parent = self._tree._parents[self.index]
+        while parent != _NO_PARENT:
+            d += 1
+            parent = self._tree._parents[parent]
+        return d
+
+    def path(self) -> str:
+        """Slash-separated path from root to this node."""
+        parts: list[str] = []
+        current = self.index
+        while current != _NO_PARENT:
+            parts.append(self._tree._strings[self._tree._name_ids[current]])
+            current = self._tree._parents[current]
+        return "/".join(reversed(parts))
+
+    # ── Execution (mirrors AgentNode) ──────────────────────────────────
+
+    async def run(self, user_input: str) -> HandoffResult:
+        agent = self.agent
+        if agent is None:
+            raise RuntimeError(
+                f"AgentNode '{self.name}' has no agent callable bound. "
+                f"Bind one via CompactAgentTree.add_node(agent=...)."
+            )
+        return await agent(user_input)
+
+    async def run_tool(self, tool_name: str, **kwargs: Any) -> ToolResult:
+        fn = self._tree._tool_fns.get((self.index, self._tree._string_ids.get(tool_name, -1)))
+        return await _execute_tool(fn, tool_name, self.name, kwargs)
+
+    # ── Identity / display ─────────────────────────────────────────────
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, CompactNode)
+            and other._tree is self._tree
+            and other.index == self.index
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self._tree), self.index))
+
+    def __repr__(self) -> str:
+        tools = self.tools
+        tools_str = f", tools={tools}" if tools else ""
+        n_children = len(self._tree._child_indices(self.index))
+        children_str = f", children={n_children}" if n_children else ""
+        return f"CompactNode(id={self.node_id!r}{tools_str}{children_str})"
+
+
+class CompactAgentTree:
+    """Struct-of-arrays agent tree.
+
+    Column layout (one entry per node, indexed by node index; root is 0):
+      _parents     array('i')  parent index, -1 for the root
+      _node_ids    array('I')  string-table id of node_id
+      _name_ids    array('I')  string-table id of name
+      _agent_ids   array('i')  index into the interned agent table, -1 = none
+      _tool_offsets array('I') CSR offsets into _tool_ids (len = nodes + 1)
+      _tool_ids    array('I')  string-table ids of tool names
+
+    Child lists are derived lazily into CSR form (offsets + child indices)
+    and rebuilt only after a mutation.  Sparse, rarely-set data (metadata,
+    tool callables) lives in dicts keyed by node index.
+    """
+
+    def __init__(
+        self,
+        root_id: str,
+        *,
+        name: str | None = None,
+        agent: AgentCallable | None = None,
+        tools: list[str] | None = None,
+        metadata: dict[str, Any] | None = None,
+    ) -> None:
+        # Interned string table shared by names, node IDs and tool names
+        self._strings: list[str] = []
+        self._string_ids: dict[str, int] = {}
+
+        # Interned agent callables — most nodes share a handful of functions
+        self._agents: list[AgentCallable] = []
+        self._agent_index: dict[int, int] = {}
+
+        self._parents = array("i")
+        self._node_ids = array("I")
+        self._name_ids = array("I")
+        self._agent_ids = array("i")
+        self._tool_offsets = array("I", [0])
+        self._tool_ids = array("I")
+
+        self._metadata: dict[int, dict[str, Any]] = {}
+        self._tool_fns: dict[tuple[int, int], ToolCallable] = {}
+
+        # Derived, rebuilt lazily (see _index)
+        self._csr: tuple[array, array] | None = None
+        self._first_by_name: dict[int, int] | None = None
+        self._lower: list[str] = []
+
+        self._append(_NO_PARENT, root_id, name, agent, tools, metadata)
+
+    # ── Construction ───────────────────────────────────────────────────
+
+    @classmethod
+    def from_tree(cls, tree: AgentTree) -> CompactAgentTree:
+        """Convert an existing AgentTree (AgentNode object graph)."""
+        root = tree.root
+        compact = cls(
+            root.node_id,
+            name=root.name,
+            agent=root.agent,
+            tools=root.tools,
+            metadata=root.metadata,
+        )
+        compact._copy_tool_fns(0, root)
+        stack: list[tuple[AgentNode, int]] = [(root, 0)]
+        while stack:
+            node, index = stack.pop()
+            for child in node.children:
+                child_index = compact.add_node(
+                    index,
+                    child.node_id,
+                    name=child.name,
+                    agent=child.agent,
+                    tools=child.tools,
+                    metadata=child.metadata,
+                )
+                compact._copy_tool_fns(child_index, child)
+                stack.append((child, child_index))
+        return compact
+
+    def add_node(
+        self,
+        parent: int,
+        node_id: str,
+        *,
+        name: str | None = None,
+        agent: AgentCallable | None = None,
+        tools: list[str] | None = None,
+        metadata: dict[str, Any] | None = None,
+    ) -> int:
+        """Append a node under *parent* (a node index).  Returns its index."""
+        if not 0 <= parent < len(self._parents):
+            raise IndexError(f"Parent index {parent} out of range")
+        return self._append(parent, node_id, name, agent, tools, metadata)
+
+    def add_tool(
+        self,
+        index: int,
+        tool: str | ToolCallable,
+        name: str | None = None,
+        *,
+        executor: ExecutorPolicy | None = None,
+        executors: ToolExecutors | None = None,
+    ) -> None:
+        """Register a tool on node *index* — same contract as AgentNode.add_tool().
+
+        Adding a new tool name re-packs the tool columns after *index*, so
+        prefer passing tools= to add_node() when bulk-building.
+        """
+        if callable(tool):
+            tool_name = name or getattr(tool, "__name__", "unknown_tool")
+            fn = resolve_tool(tool, tool_name, executor, executors)
+            self._tool_fns[(index, self._intern(tool_name))] = fn
+        else:
+            tool_name = tool
+        names = self._tool_names(index)
+        if tool_name not in names:
+            self._set_tools(index, names + [tool_name])
+
+    # ── Tree API (mirrors AgentTree) ───────────────────────────────────
+
+    @property
+    def root(self) -> CompactNode:
+        return CompactNode(self, 0)
+
+    def node(self, index: int) -> CompactNode:
+        if not 0 <= index < len(self._parents):
+            raise IndexError(f"Node index {index} out of range")
+        return CompactNode(self, index)
+
+    def __len__(self) -> int:
+        return len(self._parents)
+
+    def find(self, name: str) -> CompactNode | None:
+        """Lookup by node name with AgentTree.find() semantics (first in BFS order)."""
+        name_id = self._string_ids.get(name)
+        if name_id is None:
+            return None
+        self._index()
+        assert self._first_by_name is not None
+        index = self._first_by_name.get(name_id)
+        return None if index is None else CompactNode(self, index)
+
+    def visualize(self) -> str:
+        """ASCII tree — byte-for-byte identical to AgentTree.visualize()."""
+        strings = self._strings
+        lines: list[str] = []
+        # Iterative DFS so million-node / deep trees don't hit the recursion limit
+        stack: list[tuple[int, str, bool, bool]] = [(0, "", True, True)]
+        while stack:
+            index, prefix, is_last, is_root = stack.pop()
+            if is_root:
+                connector = ""
+            elif is_last:
+                connector = "└── "
+            else:
+                connector = "├── "
+            tools = self._tool_names(index)
+            tools_tag = f" [tools: {', '.join(tools)}]" if tools else ""
+            root_tag = " (root)" if is_root else ""
+            lines.append(f"{prefix}{connector}{strings[self._name_ids[index]]}{root_tag}{tools_tag}")
+
+            if is_root:
+                child_prefix = prefix
+            elif is_last:
+                child_prefix = prefix + "    "
+            else:
+                child_prefix = prefix + "│   "
+            children = self._child_indices(index)
+            last = len(children) - 1
+            for i in range(last, -1, -1):
+                stack.append((children[i], child_prefix, i == last, False))
+        return "\n".join(lines)
+
+    def iter_bfs(self) -> Iterator[CompactNode]:
+        """Yield node views in breadth-first order."""
+        for index in self._bfs_indices():
+            yield CompactNode(self, index)
+
+    # ── Routing ────────────────────────────────────────────────────────
+
+    def route(self, user_input: str, parent: int = 0) -> list[CompactNode]:
+        """Order *parent*'s children exactly like SupervisorOrchestrator._route.
+
+        Keyword hits are evaluated once per distinct interned string instead
+        of once per (child, keyword) pair, then summed per child from the
+        integer columns.
+        """
+        input_lower = user_input.lower()
+        if len(self._lower) != len(self._strings):
+            self._lower = [s.lower() for s in self._strings]
+        hit = [kw in input_lower for kw in self._lower]
+        name_ids, tool_offsets, tool_ids = self._name_ids, self._tool_offsets, self._tool_ids
+
+        def score(index: int) -> int:
+            total = hit[name_ids[index]]
+            for t in range(tool_offsets[index], tool_offsets[index + 1]):
+                total += hit[tool_ids[t]]
+            return total
+
+        ordered = sorted(self._child_indices(parent), key=score, reverse=True)
+        return [CompactNode(self, i) for i in ordered]
+
+    # ── Internals ──────────────────────────────────────────────────────
+
+    def _intern(self, value: str) -> int:
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(value)
+            self._string_ids[value] = string_id
+        return string_id
+
+    def _append(
+        self,
+        parent: int,
+        node_id: str,
+        name: str | None,
+        agent: AgentCallable | None,
+        tools: list[str] | None,
+        metadata: dict[str, Any] | None,
+    ) -> int:
+        index = len(self._parents)
+        self._parents.append(parent)
+        self._node_ids.append(self._intern(node_id))
+        self._name_ids.append(self._intern(name or node_id))
+        self._agent_ids.append(self._intern_agent(agent))
+        for tool in tools or []:
+            self._tool_ids.append(self._intern(tool))
+        self._tool_offsets.append(len(self._tool_ids))
+        if metadata:
+            self._metadata[index] = dict(metadata)
+        self._invalidate()
+        return index
+
+    def _intern_agent(self, agent: AgentCallable | None) -> int:
+        if agent is None:
+            return _NO_AGENT
+        agent_id = self._agent_index.get(id(agent))
+        if agent_id is None:
+            agent_id = len(self._agents)
+            self._agents.append(agent)
+            self._agent_index[id(agent)] = agent_id
+        return agent_id
+
+    def _copy_tool_fns(self, index: int, node: AgentNode) -> None:
+        for tool_name, fn in node._tool_fns.items():
+            self._tool_fns[(index, self._intern(tool_name))] = fn
+
+    def _tool_names(self, index: int) -> list[str]:
+        strings, tool_ids = self._strings, self._tool_ids
+        return [
+            strings[tool_ids[t]]
+            for t in range(self._tool_offsets[index], self._tool_offsets[index + 1])
+        ]
+
+    def _set_tools(self, index: int, names: list[str]) -> None:
+        start, end = self._tool_offsets[index], self._tool_offsets[index + 1]
+        new_ids = array("I", (self._intern(n) for n in names))
+        self._tool_ids[start:end] = new_ids
+        delta = len(new_ids) - (end - start)
+        if delta:
+            for i in range(index + 1, len(self._tool_offsets)):
+                self._tool_offsets[i] += delta
+        self._invalidate()
+
+    def _invalidate(self) -> None:
+        self._csr = None
+        self._first_by_name = None
+
+    def _index(self) -> tuple[array, array]:
+        """Build (or return cached) CSR child index + name lookup."""
+        if self._csr is None:
+            n = len(self._parents)
+            counts = array("I", bytes(4 * (n + 1)))
+            for parent in self._parents:
+                if parent != _NO_PARENT:
+                    counts[parent + 1] += 1
+            for i in range(1, n + 1):
+                counts[i] += counts[i - 1]
+            offsets = array("I", counts)
+            child_ids = array("I", bytes(4 * max(n - 1, 0)))
+            cursor = array("I", counts[:n])
+            # Node indices are visited in insertion order, so each child
+            # list keeps the same order children were added (AgentNode order)
+            for index, parent in enumerate(self._parents):
+                if parent != _NO_PARENT:
+                    child_ids[cursor[parent]] = index
+                    cursor[parent] += 1
+            self._csr = (offsets, child_ids)
+
+            first: dict[int, int] = {}
+            for index in self._bfs_indices():
+                first.setdefault(self._name_ids[index], index)
+            self._first_by_name = first
+        return self._csr
+
+    def _child_indices(self, index: int) -> array:
+        offsets, child_ids = self._index()
+        return child_ids[offsets[index]:offsets[index + 1]]
+
+    def _bfs_indices(self) -> Iterator[int]:
+        offsets, child_ids = self._index()
+        queue = array("I", [0])
+        head = 0
+        while head < len(queue):
+            index = queue[head]
+            head += 1
+            yield index
+            queue.extend(child_ids[offsets[index]:offsets[index + 1]])
+
+    def __repr__(self) -> str:
+        return f"CompactAgentTree(root={self.root.name!r}, nodes={len(self)})"
@@ -0,0 +1,280 @@
+"""
+Parallel evaluation harness — routing quality, completion, latency and cost.
+
+WHY:  A routing tweak or a performance change can quietly send invoices to
+      triage first, or double the steps per request.  Checking that by hand
+      on a few prompts misses it; this runs thousands of labelled cases
+      through a SupervisorOrchestrator with bounded concurrency and reports
+      the numbers that matter, then diffs two runs case by case.
+
+Cases (JSON lines; expected_* fields are optional):
+    {"case_id": "inv-1", "input": "Why was invoice #4821 rejected?",
+     "expected_agent": "invoice-specialist", "expected_answer": "missing PO"}
+
+Run / diff:
+    python -m agent_tree.eval run cases.jsonl --factory my_mod:build --concurrency 64 --out new.json
+    python -m agent_tree.eval diff base.json new.json      # exit 1 if any case regressed
+
+In code:
+    report = await run_eval(orchestrator, load_cases("cases.jsonl"), concurrency=64)
+    print(report.format())
+
+Definitions:
+    routed agent      the first child that ran (agents_run[0])
+    answer correct    expected_answer appears in the answer (case-insensitive)
+    completed         SupervisorResult.status == "completed"
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+from .orchestrator import SupervisorOrchestrator
+
+
+# ── Cases and results ──────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class EvalCase:
+    case_id: str
+    input: str
+    expected_agent: str | None = None    # tree node name of the first child run
+    expected_answer: str | None = None
+
+
+@dataclass
+class CaseResult:
+    case_id: str
+    status: str                      # SupervisorResult.status, or "error" if run() raised
+    routed_agent: str | None         # node name of the first child run
+    routing_correct: bool | None     # None → case has no expected_agent
+    answer_correct: bool | None      # None → case has no expected_answer
+    steps: int
+    tokens: int
+    cost: float
+    latency_ms: float
+    error: str | None = None
+
+
+def load_cases(path: str | os.PathLike[str]) -> list[EvalCase]:
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            raw.setdefault("case_id", str(i))
+            cases.append(EvalCase(**raw))
+    return cases
+
+
+def _quantile(sorted_values: list[float], q: float) -> float:
+    n = len(sorted_values)
+    return sorted_values[min(n - 1, int(n * q))] if n else 0.0
+
+
+def _rate(flags: Iterable[bool | None]) -> float | None:
+    scored = [f for f in flags if f is not None]
+    return sum(scored) / len(scored) if scored else None
+
+
+# ── Report ─────────────────────────────────────────────────────────────────
+
+@dataclass
+class EvalReport:
+    results: list[CaseResult]
+    wall_s: float = 0.0
+    metrics: dict[str, float | None] = field(init=False)
+
+    def __post_init__(self) -> None:
+        rs = self.results
+        n = len(rs) or 1
+        latencies = sorted(r.latency_ms for r in rs)
+        self.metrics = {
+            "cases": len(rs),
+            "routing_accuracy": _rate(r.routing_correct for r in rs),
+            "answer_accuracy": _rate(r.answer_correct for r in rs),
+            "completion_rate": sum(r.status == "completed" for r in rs) / n,
+            "error_rate": sum(r.status == "error" for r in rs) / n,
+            "mean_steps": sum(r.steps for r in rs) / n,
+            "p50_latency_ms": _quantile(latencies, 0.50),
+            "p99_latency_ms": _quantile(latencies, 0.99),
+            "tokens_per_case": sum(r.tokens for r in rs) / n,
+            "cost_per_case": sum(r.cost for r in rs) / n,
+        }
+
+    def format(self) -> str:
+        lines = [f"  {'metric':<20}{'value':>14}"]
+        for name, value in self.metrics.items():
+            lines.append(f"  {name:<20}{_fmt(value):>14}")
+        if self.wall_s:
+            lines.append(f"  {'wall time':<20}{self.wall_s:>13.2f}s  ({len(self.results) / self.wall_s:.1f} cases/s)")
+        return "\n".join(lines)
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        Path(path).write_text(json.dumps({
+            "wall_s": self.wall_s,
+            "metrics": self.metrics,
+            "results": [asdict(r) for r in self.results],
+        }, indent=1))
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str]) -> EvalReport:
+        raw = json.loads(Path(path).read_text())
+        return cls([CaseResult(**r) for r in raw["results"]], wall_s=raw.get("wall_s", 0.0))
+
+
+def _fmt(value: float | None) -> str:
+    if value is None:
+        return "n/a"
+    return f"{value:,.3f}" if isinstance(value, float) else f"{value:,}"
+
+
+# ── Runner ─────────────────────────────────────────────────────────────────
+
+async def _run_case(orchestrator: SupervisorOrchestrator, case: EvalCase) -> CaseResult:
+    start = time.perf_counter()
+    try:
+        result = await orchestrator.run(case.input)
+    except Exception as exc:
+        return CaseResult(
+            case_id=case.case_id, status="error", routed_agent=None,
+            routing_correct=False if case.expected_agent else None,
+            answer_correct=False if case.expected_answer else None,
+            steps=0, tokens=0, cost=0.0,
+            latency_ms=(time.perf_counter() - start) * 1000, error=str(exc),
+        )
+    latency_ms = (time.perf_counter() - start) * 1000
+    # The tree's node name, not the handoff's self-reported from_agent
+    routed = result.agents_run[0] if result.agents_run else None
+    return CaseResult(
+        case_id=case.case_id,
+        status=result.status,
+        routed_agent=routed,
+        routing_correct=(routed == case.expected_agent) if case.expected_agent else None,
+        answer_correct=(
+            case.expected_answer.lower() in result.answer.lower() if case.expected_answer else None
+        ),
+        steps=result.total_steps,
+        tokens=result.total_tokens,
+        cost=result.total_cost,
+        latency_ms=latency_ms,
+    )
+
+
+async def run_eval(
+    orchestrator: SupervisorOrchestrator,
+    cases: Iterable[EvalCase],
+    *,
+    concurrency: int = 32,
+) -> EvalReport:
+    """Run every case with at most *concurrency* in flight; results keep case order."""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(case: EvalCase) -> CaseResult:
+        async with slots:
+            return await _run_case(orchestrator, case)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(c) for c in cases))
+    return EvalReport(list(results), wall_s=time.perf_counter() - start)
+
+
+# ── Diff ───────────────────────────────────────────────────────────────────
+
+@dataclass
+class EvalDiff:
+    base: EvalReport
+    new: EvalReport
+    regressions: list[tuple[str, str]]    # (case_id, what got worse)
+    fixes: list[tuple[str, str]]
+
+    def format(self) -> str:
+        lines = [f"  {'metric':<20}{'base':>14}{'new':>14}{'delta':>14}"]
+        for name, before in self.base.metrics.items():
+            after = self.new.metrics.get(name)
+            delta = after - before if before is not None and after is not None else None
+            sign = "+" if delta is not None and delta > 0 else ""
+            lines.append(f"  {name:<20}{_fmt(before):>14}{_fmt(after):>14}{sign + _fmt(delta):>14}")
+        lines.append("")
+        lines.append(f"  {len(self.regressions)} case regression(s), {len(self.fixes)} fix(es)")
+        for case_id, what in self.regressions[:20]:
+            lines.append(f"    - {case_id}: {what}")
+        if len(self.regressions) > 20:
+            lines.append(f"    … {len(self.regressions) - 20} more")
+        return "\n".join(lines)
+
+
+def _case_changes(before: CaseResult, after: CaseResult) -> tuple[list[str], list[str]]:
+    worse, better = [], []
+    if before.routing_correct and after.routing_correct is False:
+        worse.append(f"routed to {after.routed_agent} (was {before.routed_agent})")
+    elif before.routing_correct is False and after.routing_correct:
+        better.append(f"routed to {after.routed_agent}")
+    if before.answer_correct and after.answer_correct is False:
+        worse.append("answer no longer matches")
+    elif before.answer_correct is False and after.answer_correct:
+        better.append("answer now matches")
+    if before.status == "completed" and after.status != "completed":
+        worse.append(f"status {after.status}" + (f" ({after.error})" if after.error else ""))
+    elif before.status != "completed" and after.status == "completed":
+        better.append("now completes")
+    return worse, better
+
+
+def diff_reports(base: EvalReport, new: EvalReport) -> EvalDiff:
+    """Metric deltas plus per-case regressions / fixes (cases matched by case_id)."""
+    base_by_id = {r.case_id: r for r in base.results}
+    regressions, fixes = [], []
+    for after in new.results:
+        before = base_by_id.get(after.case_id)
+        if before is None:
+            continue
+        worse, better = _case_changes(before, after)
+        regressions += [(after.case_id, w) for w in worse]
+        fixes += [(after.case_id, b) for b in better]
+    return EvalDiff(base, new, regressions, fixes)
+
+
+# ── CLI ────────────────────────────────────────────────────────────────────
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Evaluate an orchestrator on labelled cases, or diff two runs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="run cases and print / save a report")
+    run.add_argument("cases", help="JSON-lines case file")
+    run.add_argument("--factory", required=True,
+                     help="module:function returning a SupervisorOrchestrator")
+    run.add_argument("--concurrency", type=int, default=32)
+    run.add_argument("--out", help="save the report (JSON) for a later diff")
+    diff = sub.add_parser("diff", help="compare two saved reports")
+    diff.add_argument("base")
+    diff.add_argument("new")
+    args = parser.parse_args(argv)
+
+    if args.command == "diff":
+        result = diff_reports(EvalReport.load(args.base), EvalReport.load(args.new))
+        print(result.format())
+        sys.exit(1 if result.regressions else 0)
+
+    module_name, _, attr = args.factory.partition(":")
+    orchestrator = getattr(importlib.import_module(module_name), attr)()
+    cases = load_cases(args.cases)
+    report = asyncio.run(run_eval(orchestrator, cases, concurrency=args.concurrency))
+    print(report.format())
+    if args.out:
+        report.save(args.out)
+        print(f"  report:              {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Weighted fair scheduling across tenants — runs, child agents and tools.
+
+WHY:  AdmissionController orders work by priority class, not by who sent
+      it.  When tenants share one orchestrator deployment, a tenant that
+      submits a 10k-request backfill fills every slot and the queue, and
+      other tenants' interactive requests wait behind it.  Fair queuing
+      gives each tenant a share of capacity proportional to its weight,
+      whatever the others submit.
+
+Mechanics (start-time fair queuing, per FairQueue):
+  - Each request gets a virtual start tag  max(V, tenant's last finish)
+    and finish tag  start + cost / weight.  A freed slot goes to the
+    queued head with the smallest start tag; V advances to that tag.
+    A busy tenant's tags run ahead, so an occasional tenant is served
+    next — an idle tenant cannot bank credit, either.
+  - The tenant's last finish advances only when a request is admitted
+    (a tenant's queue is FIFO, so its head's tag is computed then);
+    requests cancelled while queued — or cancelled as they were
+    admitted — charge the tenant nothing.
+  - Optional per-tenant max_concurrency caps a tenant even when capacity
+    is free; capped heads are skipped, not dropped.
+  - cost defaults to 1 per request; pass an estimate (e.g. expected
+    tokens) to share work instead of request counts.
+
+Layers:
+    scheduler = FairScheduler(orchestrator, max_concurrency=64,
+                              child_concurrency=128, tool_concurrency=256,
+                              tenants={"acme": TenantConfig(weight=3),
+                                       "backfill": TenantConfig(weight=1, max_concurrency=8)})
+    result = await scheduler.run(prompt, tenant="acme")
+
+    Runs queue in scheduler.runs.  With child / tool concurrency set, the
+    tree's agents and tools are wrapped to queue in their own FairQueues
+    under the tenant of the run that calls them (carried in a ContextVar),
+    so one tenant's tool-heavy requests cannot monopolise a shared backend.
+    Tool waits show up as ToolResult.queue_ms.
+
+    Slots are re-entrant.  Work nested under a slot of the same layer runs
+    under the slot already held instead of queueing for a second one: a
+    child agent called through as_tool() by another child, or a tool
+    called from inside an agent-as-tool.  A parent waiting on its own child
+    for a slot of the same layer would otherwise deadlock the layer.  The
+    holding task's subtasks inherit its slot (they copy its context).
+
+Metrics: per tenant and layer — queued, in flight, admitted, mean / p99
+queue wait (metrics(), to_prometheus()).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable
+
+from .handoff_models import HandoffResult, SupervisorResult
+from .tool_executors import TimedTool
+
+if TYPE_CHECKING:
+    from .agent_tree import AgentTree
+    from .orchestrator import SupervisorOrchestrator
+
+DEFAULT_TENANT = "default"
+
+# Tenant of the run executing in this task (set by FairScheduler.run)
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+# FairQueues whose slot this task already holds (makes slot() re-entrant)
+_held_slots: ContextVar[frozenset[int]] = ContextVar("_held_slots", default=frozenset())
+
+
+@dataclass(frozen=True)
+class TenantConfig:
+    weight: float = 1.0
+    max_concurrency: int | None = None   # per-tenant cap within the shared capacity
+
+    def __post_init__(self) -> None:
+        if self.weight <= 0:
+            raise ValueError("weight must be > 0")
+
+
+# ── Metrics ────────────────────────────────────────────────────────────────
+
+@dataclass
+class TenantMetrics:
+    queued: int = 0
+    in_flight: int = 0
+    admitted: int = 0
+    mean_wait_ms: float = 0.0
+    p99_wait_ms: float = 0.0
+
+
+@dataclass
+class FairQueueMetrics:
+    """Point-in-time snapshot of one FairQueue."""
+
+    name: str
+    in_flight: int
+    capacity: int
+    tenants: dict[str, TenantMetrics] = field(default_factory=dict)
+
+    def to_prometheus(self, prefix: str = "agent_fair") -> str:
+        lines = [
+            f'{prefix}_in_flight{{layer="{self.name}"}} {self.in_flight}',
+            f'{prefix}_capacity{{layer="{self.name}"}} {self.capacity}',
+        ]
+        for tenant, t in self.tenants.items():
+            label = f'{{layer="{self.name}",tenant="{tenant}"}}'
+            lines += [
+                f"{prefix}_queue_depth{label} {t.queued}",
+                f"{prefix}_tenant_in_flight{label} {t.in_flight}",
+                f"{prefix}_admitted_total{label} {t.admitted}",
+                f"{prefix}_queue_wait_ms_mean{label} {t.mean_wait_ms:.3f}",
+                f"{prefix}_queue_wait_ms_p99{label} {t.p99_wait_ms:.3f}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+# ── Fair queue ─────────────────────────────────────────────────────────────
+
+@dataclass
+class _Waiter:
+    future: asyncio.Future[None]
+    arrival_v: float          # virtual time at enqueue: the floor of the start tag
+    cost: float
+    seq: int
+    enqueued_at: float
+    # Set on grant, so a cancelled grant can be rolled back
+    prev_finish: float = 0.0
+    finish: float = 0.0
+
+
+class _Tenant:
+    def __init__(self, config: TenantConfig, wait_window: int) -> None:
+        self.config = config
+        self.queue: deque[_Waiter] = deque()
+        self.last_finish = 0.0
+        self.in_flight = 0
+        self.admitted = 0
+        self._wait_sum = 0.0
+        self.recent_waits: deque[float] = deque(maxlen=wait_window)
+
+    @property
+    def capped(self) -> bool:
+        cap = self.config.max_concurrency
+        return cap is not None and self.in_flight >= cap
+
+    def record_wait(self, seconds: float) -> None:
+        self.admitted += 1
+        self._wait_sum += seconds
+        self.recent_waits.append(seconds)
+
+    def metrics(self) -> TenantMetrics:
+        waits = sorted(self.recent_waits)
+        n = len(waits)
+        return TenantMetrics(
+            queued=len(self.queue),
+            in_flight=self.in_flight,
+            admitted=self.admitted,
+            mean_wait_ms=1000 * self._wait_sum / self.admitted if self.admitted else 0.0,
+            p99_wait_ms=1000 * waits[min(n - 1, int(n * 0.99))] if n else 0.0,
+        )
+
+
+class FairQueue:
+    """*capacity* concurrent slots shared by tenants in proportion to their weights."""
+
+    def __init__(
+        self,
+        capacity: int,
+        *,
+        tenants: dict[str, TenantConfig] | None = None,
+        default: TenantConfig = TenantConfig(),
+        name: str = "runs",
+        wait_window: int = 4096,
+    ) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.capacity = capacity
+        self.name = name
+        self.default = default
+        self.wait_window = wait_window
+        self._tenants: dict[str, _Tenant] = {
+            t: _Tenant(c, wait_window) for t, c in (tenants or {}).items()
+        }
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+
+    def configure(self, tenant: str, config: TenantConfig) -> None:
+        """Add or change a tenant's weight / cap (applies to new requests)."""
+        self._tenant(tenant).config = config
+
+    @asynccontextmanager
+    async def slot(self, tenant: str | None = None, *, cost: float = 1.0) -> AsyncIterator[float]:
+        """Hold one slot for *tenant* (default: current_tenant).  Yields the queue wait in seconds.
+
+        Re-entrant: inside a slot of this queue (or a task spawned there),
+        slot() yields 0.0 at once and takes nothing.
+        """
+        held = _held_slots.get()
+        if id(self) in held:
+            yield 0.0
+            return
+        name = tenant if tenant is not None else current_tenant.get()
+        state = self._tenant(name)
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+
+        if self._in_flight < self.capacity and not state.capped and not state.queue:
+            self._grant(state, self._virtual_time, cost)
+            state.record_wait(0.0)
+            waited = 0.0
+        else:
+            waiter = _Waiter(loop.create_future(), self._virtual_time, cost, next(self._seq), now)
+            state.queue.append(waiter)
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                self._abandon(state, waiter)
+                raise
+            waited = loop.time() - now
+        token = _held_slots.set(held | {id(self)})
+        try:
+            yield waited
+        finally:
+            _held_slots.reset(token)
+            self._in_flight -= 1
+            state.in_flight -= 1
+            self._dispatch()
+
+    def metrics(self) -> FairQueueMetrics:
+        return FairQueueMetrics(
+            name=self.name,
+            in_flight=self._in_flight,
+            capacity=self.capacity,
+            tenants={name: t.metrics() for name, t in self._tenants.items()},
+        )
+
+    # ── Internals ──────────────────────────────────────────────────────
+
+    def _tenant(self, name: str) -> _Tenant:
+        state = self._tenants.get(name)
+        if state is None:
+            state = self._tenants[name] = _Tenant(self.default, self.wait_window)
+        return state
+
+    @staticmethod
+    def _start_tag(state: _Tenant, waiter: _Waiter) -> float:
+        return max(waiter.arrival_v, state.last_finish)
+
+    def _grant(self, state: _Tenant, arrival_v: float, cost: float) -> float:
+        """Admit one request of *state*; returns its previous last finish."""
+        start_tag = max(arrival_v, state.last_finish)
+        prev_finish = state.last_finish
+        state.last_finish = start_tag + cost / state.config.weight
+        self._in_flight += 1
+        state.in_flight += 1
+        self._virtual_time = max(self._virtual_time, start_tag)
+        return prev_finish
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the eligible head with the smallest start tag."""
+        now = asyncio.get_running_loop().time()
+        while self._in_flight < self.capacity:
+            best: _Tenant | None = None
+            best_key = (0.0, 0)
+            for state in self._tenants.values():
+                while state.queue and state.queue[0].future.done():
+                    state.queue.popleft()  # cancelled while queued
+                if not state.queue or state.capped:
+                    continue
+                key = (self._start_tag(state, state.queue[0]), state.queue[0].seq)
+                if best is None or key < best_key:
+                    best, best_key = state, key
+            if best is None:
+                return
+            waiter = best.queue.popleft()
+            waiter.prev_finish = self._grant(best, waiter.arrival_v, waiter.cost)
+            waiter.finish = best.last_finish
+            best.record_wait(now - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def _abandon(self, state: _Tenant, waiter: _Waiter) -> None:
+        if waiter.future.done() and not waiter.future.cancelled():
+            # Slot was granted just as the caller was cancelled — give it back,
+            # and un-charge the tenant unless a later grant already built on it
+            if state.last_finish == waiter.finish:
+                state.last_finish = waiter.prev_finish
+            self._in_flight -= 1
+            state.in_flight -= 1
+            self._dispatch()
+        elif waiter in state.queue:
+            state.queue.remove(waiter)
+
+
+# ── Scheduler: runs + (optionally) child agents and tools ──────────────────
+
+class ScheduledTool(TimedTool):
+    """Tool wrapper that takes a fair-share slot first; the wait is reported as queue_ms."""
+
+    def __init__(self, fn: Callable[..., Any], queue: FairQueue) -> None:
+        self.fn = fn
+        self.queue = queue
+        self.__name__ = getattr(fn, "__name__", "tool")
+        self.__doc__ = getattr(fn, "__doc__", None)
+
+    async def invoke(self, kwargs: dict[str, Any]) -> tuple[Any, int, int]:
+        async with self.queue.slot() as waited:
+            if isinstance(self.fn, TimedTool):
+                output, queue_ms, exec_ms = await self.fn.invoke(kwargs)
+            else:
+                start = time.perf_counter()
+                output = await self.fn(**kwargs)
+                queue_ms, exec_ms = 0, int((time.perf_counter() - start) * 1000)
+        return output, queue_ms + int(waited * 1000), exec_ms
+
+    def __repr__(self) -> str:
+        return f"ScheduledTool({self.__name__!r}, layer={self.queue.name!r})"
+
+
+class FairScheduler:
+    """Per-tenant weighted fair queuing in front of a SupervisorOrchestrator."""
+
+    def __init__(
+        self,
+        orchestrator: SupervisorOrchestrator,
+        *,
+        max_concurrency: int = 64,
+        child_concurrency: int | None = None,
+        tool_concurrency: int | None = None,
+        tenants: dict[str, TenantConfig] | None = None,
+        default: TenantConfig = TenantConfig(),
+    ) -> None:
+        self.orchestrator = orchestrator
+        self.runs = FairQueue(max_concurrency, tenants=tenants, default=default, name="runs")
+        self.children = (
+            FairQueue(child_concurrency, tenants=tenants, default=default, name="children")
+            if child_concurrency else None
+        )
+        self.tools = (
+            FairQueue(tool_concurrency, tenants=tenants, default=default, name="tools")
+            if tool_concurrency else None
+        )
+        if self.children is not None or self.tools is not None:
+            self.instrument_tree(orchestrator.tree)
+
+    async def run(
+        self, user_input: str, *, tenant: str = DEFAULT_TENANT, cost: float = 1.0, **run_kwargs: Any
+    ) -> SupervisorResult:
+        """Queue for a fair-share run slot as *tenant*, then run."""
+        token = current_tenant.set(tenant)
+        try:
+            async with self.runs.slot(tenant, cost=cost):
+                return await self.orchestrator.run(user_input, **run_kwargs)
+        finally:
+            current_tenant.reset(token)
+
+    def instrument_tree(self, tree: AgentTree) -> None:
+        """Wrap child agents / tools (in place) to queue in the child / tool layers.
+
+        Idempotent: already-scheduled agents and tools are left alone.
+        """
+        stack = [tree.root]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.children)
+            if self.children is not None and node is not tree.root and node.agent is not None:
+                if not getattr(node.agent, "_fair_scheduled", False):
+                    node.agent = self._scheduled_agent(node.agent, self.children)
+            if self.tools is not None:
+                for name, fn in list(node._tool_fns.items()):
+                    if not isinstance(fn, ScheduledTool):
+                        node._tool_fns[name] = ScheduledTool(fn, self.tools)
+
+    @staticmethod
+    def _scheduled_agent(
+        agent: Callable[[str], Awaitable[HandoffResult]], queue: FairQueue
+    ) -> Callable[[str], Awaitable[HandoffResult]]:
+        async def scheduled_agent(user_input: str) -> HandoffResult:
+            async with queue.slot():
+                return await agent(user_input)
+
+        scheduled_agent._fair_scheduled = True  # type: ignore[attr-defined]
+        return scheduled_agent
+
+    def metrics(self) -> list[FairQueueMetrics]:
+        return [q.metrics() for q in (self.runs, self.children, self.tools) if q is not None]
+
+    def to_prometheus(self, prefix: str = "agent_fair") -> str:
+        return "".join(m.to_prometheus(prefix) for m in self.metrics())
@@ -37,6 +37,10 @@ class ToolResult(BaseModel):
     status: Literal["ok", "error"] = "ok"
     error: str | None = None
     latency_ms: int = 0
+    # Split of latency_ms for pooled sync tools: time waiting for a pool
+    # worker vs. time running.  Async tools report queue_ms=0.
+    queue_ms: int = 0
+    exec_ms: int = 0
 
 
 # ── Observability bag attached to every handoff ────────────────────────────
@@ -108,6 +112,12 @@ class SupervisorResult(BaseModel):
     answer: str
     plan: dict[str, Any] | None = None
     handoffs_received: list[HandoffResult] = Field(default_factory=list)
-    status: Literal["completed", "partial", "failed"] = "completed"
+    # Node name of every child that ran, in order.  Unlike from_agent (self-
+    # reported by the agent) these are the tree's names, and unlike
+    # handoffs_received they are kept for every step whatever the retention.
+    agents_run: list[str] = Field(default_factory=list)
+    status: Literal["completed", "partial", "failed", "rejected"] = "completed"
     total_steps: int = 0
     total_tokens: int = 0
+    total_cost: float = 0.0
+    run_id: str | None = None
@@ -0,0 +1,247 @@
+"""
+Learned router — predicts which root child will answer, from past outcomes.
+
+WHY:  The default _route() orders children by keyword overlap.  Every
+      misroute costs a full child execution (an LLM call plus its tools)
+      before the right child even starts, so first-try accuracy is the
+      biggest latency lever the orchestrator has.  Production already
+      records which child answered which input (trace store / handoffs);
+      a small classifier trained on that beats keyword matching.
+
+Model: multinomial naive Bayes over hashed unigram + bigram features
+(crc32, so hashes are stable across processes).  Training is one pass of
+counting; prediction is one gather over the input's features — well under
+a millisecond for typical fan-outs.  Only inputs whose child returned "ok"
+are training examples: the label is "the child that answered".
+
+    router = LearnedRouter("router.npz")          # hot-reloads when the file changes
+    orchestrator = SupervisorOrchestrator(tree=tree, router=router)
+
+Children the model has never seen, and every child when no model file
+exists yet, keep the keyword order from _route() after the known ones.
+
+Retrain (writes atomically, so running routers pick it up safely):
+    python -m agent_tree.learned_router train --traces traces.db --out router.npz
+    python -m agent_tree.learned_router predict router.npz "why was invoice #4821 rejected?"
+
+NumPy is imported here only — `import agent_tree` does not need it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import zlib
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+
+from .agent_node import AgentNode
+from .handoff_models import SupervisorResult
+from .orchestrator import RouterCallable, SupervisorOrchestrator
+
+_TOKEN = re.compile(r"[a-z0-9#]+")
+
+
+def hashed_features(text: str, n_features: int) -> tuple[np.ndarray, np.ndarray]:
+    """(feature indices, counts) for the unigrams and bigrams of *text*."""
+    tokens = _TOKEN.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not grams:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    hashed = np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.int64, count=len(grams))
+    indices, counts = np.unique(hashed % n_features, return_counts=True)
+    return indices, counts.astype(np.float32)
+
+
+# ── Model ──────────────────────────────────────────────────────────────────
+
+class NaiveBayesRouterModel:
+    """Multinomial naive Bayes: log P(child) + Σ count · log P(feature | child)."""
+
+    def __init__(self, classes: list[str], log_prior: np.ndarray, log_prob: np.ndarray) -> None:
+        self.classes = classes
+        self.index = {c: i for i, c in enumerate(classes)}
+        self.log_prior = log_prior          # (n_classes,)
+        self.log_prob = log_prob            # (n_classes, n_features)
+
+    @property
+    def n_features(self) -> int:
+        return self.log_prob.shape[1]
+
+    @classmethod
+    def fit(
+        cls, examples: Iterable[tuple[str, str]], *, n_features: int = 2**14, alpha: float = 0.5
+    ) -> NaiveBayesRouterModel:
+        """Train from (input text, child that answered) pairs."""
+        rows: list[tuple[int, np.ndarray, np.ndarray]] = []
+        classes: dict[str, int] = {}
+        for text, child in examples:
+            label = classes.setdefault(child, len(classes))
+            rows.append((label, *hashed_features(text, n_features)))
+        if not rows:
+            raise ValueError("No training examples (need inputs whose child returned 'ok')")
+        counts = np.zeros((len(classes), n_features), dtype=np.float64)
+        class_counts = np.zeros(len(classes), dtype=np.float64)
+        for label, indices, values in rows:
+            counts[label, indices] += values
+            class_counts[label] += 1
+        counts += alpha  # Laplace / Lidstone smoothing
+        log_prob = np.log(counts) - np.log(counts.sum(axis=1, keepdims=True))
+        log_prior = np.log(class_counts / class_counts.sum())
+        return cls(list(classes), log_prior.astype(np.float32), log_prob.astype(np.float32))
+
+    def scores(self, text: str) -> np.ndarray:
+        """Unnormalised log-posterior per class."""
+        indices, counts = hashed_features(text, self.n_features)
+        return self.log_prior + self.log_prob[:, indices] @ counts
+
+    def predict(self, text: str) -> str:
+        return self.classes[int(np.argmax(self.scores(text)))]
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """Write atomically: readers see the old file or the new one, never a torn one."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, classes=np.array(self.classes), log_prior=self.log_prior, log_prob=self.log_prob)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str]) -> NaiveBayesRouterModel:
+        with np.load(path) as data:
+            return cls([str(c) for c in data["classes"]], data["log_prior"], data["log_prob"])
+
+
+# ── Training data ──────────────────────────────────────────────────────────
+
+def examples_from_results(pairs: Iterable[tuple[str, SupervisorResult]]) -> Iterable[tuple[str, str]]:
+    """(input, child) for each handoff that answered, from (user_input, result) pairs."""
+    for user_input, result in pairs:
+        for handoff in result.handoffs_received:
+            if handoff.status == "ok":
+                yield user_input, handoff.from_agent
+
+
+def examples_from_traces(trace_store_path: str, *, since: float | None = None) -> list[tuple[str, str]]:
+    """(routed input, child) for every successful node span in a SQLiteTraceStore file.
+
+    Trains on the input the router saw, not the enriched one the child got:
+    a child that answered after a "needs_more_info" step received text with
+    "[Previous step from …]" appended, which LearnedRouter never sees.
+    """
+    from .trace_store import SQLiteTraceStore
+
+    store = SQLiteTraceStore(trace_store_path)
+    try:
+        return [(text, node) for text, node, status in store.iter_inputs(since=since) if status == "ok"]
+    finally:
+        store.close()
+
+
+# ── Router ─────────────────────────────────────────────────────────────────
+
+class LearnedRouter:
+    """Orchestrator router backed by a model file, reloaded when it changes.
+
+    The file's mtime is checked at most every *reload_interval_s*; a new
+    model is swapped in whole, so concurrent routes see old or new, never
+    a mix.  Until a model exists, routing falls back to *fallback*.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        fallback: RouterCallable = SupervisorOrchestrator._route,
+        reload_interval_s: float = 5.0,
+    ) -> None:
+        self.path = Path(path)
+        self.fallback = fallback
+        self.reload_interval_s = reload_interval_s
+        self.model: NaiveBayesRouterModel | None = None
+        self._mtime: float | None = None
+        self._next_check = 0.0
+        self.reload()
+
+    def reload(self) -> bool:
+        """Load the model file if it changed since the last load.  True if swapped."""
+        self._next_check = time.monotonic() + self.reload_interval_s
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+        self.model = NaiveBayesRouterModel.load(self.path)
+        self._mtime = mtime
+        return True
+
+    def __call__(self, user_input: str, children: list[AgentNode]) -> list[AgentNode]:
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        baseline = self.fallback(user_input, children)
+        model = self.model
+        if model is None:
+            return baseline
+        scores = model.scores(user_input)
+        rank = {c: float(scores[i]) for c, i in model.index.items()}
+        # Known children by model score; unknown ones after, in fallback order
+        known = [c for c in baseline if c.name in rank]
+        unknown = [c for c in baseline if c.name not in rank]
+        known.sort(key=lambda c: rank[c.name], reverse=True)
+        return known + unknown
+
+
+# ── CLI ────────────────────────────────────────────────────────────────────
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Train / inspect the learned router.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="train from a SQLiteTraceStore and write the model")
+    train.add_argument("--traces", required=True, help="SQLiteTraceStore database")
+    train.add_argument("--out", required=True, help="model file (.npz), replaced atomically")
+    train.add_argument("--since-hours", type=float, help="only use spans from the last N hours")
+    train.add_argument("--features", type=int, default=2**14, help="hashed feature dimension")
+    train.add_argument("--holdout", type=float, default=0.1, help="fraction held out for accuracy")
+    predict = sub.add_parser("predict", help="rank children for an input")
+    predict.add_argument("model")
+    predict.add_argument("text")
+    args = parser.parse_args(argv)
+
+    if args.command == "predict":
+        model = NaiveBayesRouterModel.load(args.model)
+        scores = model.scores(args.text)
+        for i in np.argsort(-scores)[:5]:
+            print(f"  {scores[i]:>10.2f}  {model.classes[i]}")
+        return
+
+    since = time.time() - args.since_hours * 3600 if args.since_hours else None
+    examples = examples_from_traces(args.traces, since=since)
+    if not examples:
+        sys.exit("No successful node spans with inputs in the trace store.")
+    random.Random(0).shuffle(examples)
+    n_test = int(len(examples) * args.holdout)
+    test, fit_on = examples[:n_test], examples[n_test:]
+    model = NaiveBayesRouterModel.fit(fit_on, n_features=args.features)
+    if test:
+        correct = sum(model.predict(text) == child for text, child in test)
+        print(f"  holdout accuracy: {correct / len(test):.1%} ({len(test):,} examples)")
+    model = NaiveBayesRouterModel.fit(examples, n_features=args.features)  # final model uses all data
+    model.save(args.out)
+    print(f"  trained on {len(examples):,} examples, {len(model.classes)} children → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
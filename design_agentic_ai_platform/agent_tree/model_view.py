@@ -0,0 +1,128 @@
+"""
+Read-only, zero-copy views over validated models.
+
+WHY:  AgentNode.as_tool() used to return result.model_dump(): every nested
+      agent-as-tool call rebuilt the whole HandoffResult (traces, tool
+      results, payload) as fresh dicts, and parents that wanted typed
+      access re-validated those dicts into a new model.  In a deep agent
+      chain that is one full copy + one validation per level.
+
+ModelView gives dict-style callers what they expect — view["summary"],
+view.get("payload"), iteration, len() — straight from the validated model,
+without copying it.  Nested models come back as views, dicts as
+MappingProxyType and lists as read-only sequences, all wrapping the
+original objects.  Writes raise TypeError.
+
+    view = await child_tool("why was #4821 rejected?")   # as_tool(mode="view")
+    view["traces"]["token_usage"]     # no dict was built
+    as_handoff(view)                  # the original HandoffResult, no re-validation
+    view.to_dict()                    # explicit copy — only at external boundaries
+
+Read-only is shallow protection against accidental writes through the
+view: the model itself stays mutable for whoever holds it.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping, Sequence
+from types import MappingProxyType
+from typing import Any, overload
+
+from pydantic import BaseModel
+
+from .handoff_models import HandoffResult
+
+
+def _wrap(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return ModelView(value)
+    if type(value) is dict:
+        return MappingProxyType(value)
+    if type(value) is list:
+        return ListView(value)
+    return value
+
+
+class ModelView(Mapping[str, Any]):
+    """Read-only Mapping over a Pydantic model's fields (no copy)."""
+
+    __slots__ = ("_model",)
+
+    def __init__(self, model: BaseModel) -> None:
+        self._model = model
+
+    @property
+    def model(self) -> BaseModel:
+        """The wrapped model — typed access, still no copy."""
+        return self._model
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in type(self._model).model_fields:
+            raise KeyError(key)
+        return _wrap(getattr(self._model, key))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(type(self._model).model_fields)
+
+    def __len__(self) -> int:
+        return len(type(self._model).model_fields)
+
+    def __getattr__(self, name: str) -> Any:
+        # view.summary works like the model attribute, but stays read-only
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _wrap(getattr(self._model, name))
+
+    def to_dict(self) -> dict[str, Any]:
+        """Deep dict copy — for external boundaries (JSON, other services)."""
+        return self._model.model_dump()
+
+    def __repr__(self) -> str:
+        return f"ModelView({self._model!r})"
+
+
+class ListView(Sequence[Any]):
+    """Read-only sequence over a list; items are wrapped on access."""
+
+    __slots__ = ("_items",)
+
+    def __init__(self, items: list[Any]) -> None:
+        self._items = items
+
+    @overload
+    def __getitem__(self, index: int) -> Any: ...
+    @overload
+    def __getitem__(self, index: slice) -> ListView: ...
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            return ListView(self._items[index])
+        return _wrap(self._items[index])
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ListView):
+            other = other._items
+        return self._items == other
+
+    def __repr__(self) -> str:
+        return f"ListView({self._items!r})"
+
+
+def unwrap(value: Any) -> Any:
+    """The model behind a ModelView; any other value unchanged."""
+    return value._model if isinstance(value, ModelView) else value
+
+
+def as_handoff(value: HandoffResult | ModelView | Mapping[str, Any]) -> HandoffResult:
+    """Typed HandoffResult from any as_tool() output, validating only dicts.
+
+    A HandoffResult (mode="model") or view (mode="view") is returned as-is —
+    it was validated when the child built it.
+    """
+    value = unwrap(value)
+    if isinstance(value, HandoffResult):
+        return value
+    return HandoffResult.model_validate(value)
@@ -21,12 +21,19 @@ WHY async:  LLM + tool calls are I/O-bound.  Async keeps the event loop
 
 from __future__ import annotations
 
+import asyncio
+import uuid
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from typing import Any, Callable, Awaitable
 
 from .agent_node import AgentNode
 from .agent_tree import AgentTree
+from .artifact_store import ArtifactStore
+from .budget import Budget, CostEstimator
 from .handoff_models import HandoffResult, ToolResult, SupervisorResult
+from .retention import HandoffRetention, HandoffSink
+from .step_log import StepKind, StepLog, StepRecord
 
 
 # ── Hook protocol ──────────────────────────────────────────────────────────
@@ -91,6 +98,22 @@ class OrchestratorHooks:
 #   Returns a JSON-serialisable plan that gets prepended to the user input.
 PlannerCallable = Callable[[str], Awaitable[dict[str, Any]]]
 
+# ── Router type ────────────────────────────────────────────────────────────
+# Signature:  (execution_input: str, children: list[AgentNode]) -> list[AgentNode]
+#   Returns the children in the order they should be tried.  Defaults to
+#   SupervisorOrchestrator._route (keyword overlap); see learned_router.py.
+RouterCallable = Callable[[str, list[AgentNode]], list[AgentNode]]
+
+# The text the router ranked children on.  Children receive the enriched
+# input (earlier steps appended), so hooks that collect router training data
+# read this instead; it is set only while on_node_start runs.
+_routed_input: ContextVar[str | None] = ContextVar("routed_input", default=None)
+
+
+def routed_input() -> str | None:
+    """The pre-enrichment execution input, inside an on_node_start hook."""
+    return _routed_input.get()
+
 
 # ── Supervisor Orchestrator ────────────────────────────────────────────────
 
@@ -105,7 +128,8 @@ class SupervisorOrchestrator:
     Routing strategy (intentionally simple):
       - Match keywords in user input against child node names / tools
       - Fall back to first child if no match
-      - Replace with LLM-based routing for production use
+      - Replace via `router` (e.g. learned_router.LearnedRouter) or with
+        LLM-based routing for production use
 
     Loop termination:
       - A child returns status "ok"           → aggregate and finish
@@ -113,21 +137,90 @@ class SupervisorOrchestrator:
       - A child returns "failed"              → try next child
       - All children exhausted                → return partial result
       - Step limit reached                    → return partial result
+      - Token / cost budget exhausted         → return partial result
+
+    Budgets (optional):
+      token_budget / cost_budget cap a run (per-request overrides via run()).
+      cost_estimator learns each child's typical token usage from its
+      handoffs; children whose expected cost exceeds what is left of the
+      budget are skipped instead of being started and overrunning it.
+
+    Durability (optional):
+      With a step_log, the plan, routed order, every handoff (+ the
+      enriched context after it) and the final result are appended to the
+      log.  Calling run() again with the same run_id resumes from the last
+      completed step — already-paid planner / child calls are not redone.
+
+    Large payloads (optional):
+      With an artifact_store, payload values and tool outputs above its
+      threshold are moved into the store as soon as a child returns, and
+      replaced by small reference markers — validation, hooks, the step
+      log and the final result only ever carry the references.
+
+    Retention (optional):
+      retention limits how much of each handoff the run keeps in memory and
+      returns in handoffs_received (all / last N / summaries only).  A
+      handoff_sink receives every full handoff as it arrives, so nothing
+      is lost by retaining less.
     """
 
     tree: AgentTree
     hooks: OrchestratorHooks = field(default_factory=OrchestratorHooks)
     max_steps: int = 10
     planner: PlannerCallable | None = None
+    step_log: StepLog | None = None
+    token_budget: int | None = None
+    cost_budget: float | None = None
+    cost_estimator: CostEstimator = field(default_factory=CostEstimator)
+    artifact_store: ArtifactStore | None = None
+    retention: HandoffRetention = field(default_factory=HandoffRetention)
+    handoff_sink: HandoffSink | None = None
+    router: RouterCallable | None = None
+
+    async def run(
+        self,
+        user_input: str,
+        *,
+        run_id: str | None = None,
+        token_budget: int | None = None,
+        cost_budget: float | None = None,
+    ) -> SupervisorResult:
+        """Execute the full orchestration loop and return the final result.
+
+        *run_id* identifies the run in the step log.  Passing the run_id of
+        an interrupted run resumes it; omitting it starts a fresh run (a new
+        id is generated when a step log is configured).
+
+        *token_budget* / *cost_budget* override the orchestrator defaults
+        for this request.
+        """
 
-    async def run(self, user_input: str) -> SupervisorResult:
-        """Execute the full orchestration loop and return the final result."""
+        # ── Resume state from the step log ────────────────────────────
+        resumed = _ResumeState()
+        if self.step_log is not None and run_id is not None:
+            # load() flushes pending writes — keep that off the event loop
+            records = await asyncio.to_thread(self.step_log.load, run_id)
+            resumed = _ResumeState.from_records(records)
+            if resumed.has_plan and resumed.user_input != user_input:
+                raise ValueError(
+                    f"run_id {run_id!r} was started with a different user_input; "
+                    f"resume it with the original input or use a new run_id"
+                )
+            if resumed.final is not None:
+                return resumed.final
+        elif run_id is None and (self.step_log is not None or self.handoff_sink is not None):
+            run_id = uuid.uuid4().hex
+        seq = resumed.next_seq
 
         # ── Phase 1: Plan (optional) ──────────────────────────────────
         # Mirrors reference's planner_activity → call_reasoner()
         plan: dict[str, Any] | None = None
-        if self.planner is not None:
-            plan = await self.planner(user_input)
+        if resumed.has_plan:
+            plan = resumed.plan
+        else:
+            if self.planner is not None:
+                plan = await self.planner(user_input)
+            seq = self._log(run_id, seq, "plan", {"plan": plan, "user_input": user_input})
 
         # Prepend plan to input if available (same pattern as reference's
         # main.py: "SYSTEM PLAN:\n{plan}\n\nUSER QUERY:\n{msg}")
@@ -138,26 +231,65 @@ class SupervisorOrchestrator:
 
         # ── Phase 2: Route + Execute ──────────────────────────────────
         root = self.tree.root
-        handoffs: list[HandoffResult] = []
-        total_tokens = 0
-        step = 0
+        # Retained handoffs only — totals below always count every step
+        handoffs = self.retention.new_buffer(resumed.handoffs)
+        agents_run = list(resumed.completed)
+        total_tokens = sum(h.traces.token_usage for h in resumed.handoffs)
+        total_cost = sum(
+            self.cost_estimator.cost_of(name, h.traces.token_usage)
+            for name, h in zip(resumed.completed, resumed.handoffs)
+        )
+        step = len(resumed.handoffs)
+
+        estimator = self.cost_estimator
+        budget = Budget(
+            tokens=token_budget if token_budget is not None else self.token_budget,
+            cost=cost_budget if cost_budget is not None else self.cost_budget,
+        )
+        budget.charge(total_tokens, total_cost)
+        budget_stop = False
 
         # WHY ordered: try best-match child first, then fall through.
-        ordered_children = self._route(execution_input, root.children)
+        ordered_children = resumed.reorder(root.children)
+        if ordered_children is None:
+            route = self.router or self._route
+            ordered_children = route(execution_input, root.children)
+            seq = self._log(run_id, seq, "route", {"order": [c.name for c in ordered_children]})
 
         # Context accumulator — enriched between steps so the next child
         # can see what previous children found.  Mirrors the reference's
         # pattern of prepending previous results to the input.
-        enriched_input = execution_input
+        enriched_input = resumed.enriched_input or execution_input
 
-        for child in ordered_children:
+        # Children that already ran in an interrupted attempt are skipped
+        done = set(resumed.completed)
+        remaining = [c for c in ordered_children if c.name not in done]
+
+        # A logged "ok" handoff already answered the request (the crash hit
+        # before the final record was committed) — finish without re-running
+        answer = resumed.answer
+
+        while remaining and answer is None:
             if step >= self.max_steps:
                 break
+            if budget.exhausted:
+                budget_stop = True
+                break
+
+            # -- Next routed child that fits the remaining budget
+            child = self._next_affordable(remaining, budget)
+            if child is None:
+                budget_stop = True
+                break
 
             step += 1
 
             # -- Hook: node start
-            await self.hooks.fire_node_start(child, enriched_input)
+            token = _routed_input.set(execution_input)
+            try:
+                await self.hooks.fire_node_start(child, enriched_input)
+            finally:
+                _routed_input.reset(token)
 
             # -- Execute child agent
             try:
@@ -171,6 +303,13 @@ class SupervisorOrchestrator:
                     summary=f"Agent raised an exception: {exc}",
                 )
 
+            # -- Offload large blobs first, so nothing below copies them.  The
+            #    size check runs inline; only real offloads (encode + fsync)
+            #    pay the hop to a thread.
+            store = self.artifact_store
+            if store is not None and store.may_offload(result):
+                result = await asyncio.to_thread(store.offload_handoff, result)
+
             # -- Validate (Pydantic already enforces schema at construction,
             #    but we re-validate here to catch any manual dict→model issues)
             result = HandoffResult.model_validate(result.model_dump())
@@ -179,19 +318,16 @@ class SupervisorOrchestrator:
             await self.hooks.fire_node_end(child, result)
             await self.hooks.fire_handoff(result)
 
-            handoffs.append(result)
-            total_tokens += result.traces.token_usage
-
-            # -- Supervisor decision: is the answer good enough?
-            if result.status == "ok":
-                return SupervisorResult(
-                    answer=result.summary,
-                    plan=plan,
-                    handoffs_received=handoffs,
-                    status="completed",
-                    total_steps=step,
-                    total_tokens=total_tokens,
-                )
+            handoffs.append(self.retention.retain(result))
+            agents_run.append(child.name)
+            if self.handoff_sink is not None and run_id is not None:
+                self.handoff_sink.write(run_id, step, child.name, result)
+            tokens = result.traces.token_usage
+            cost = estimator.cost_of(child.name, tokens)
+            total_tokens += tokens
+            total_cost += cost
+            budget.charge(tokens, cost)
+            estimator.observe(child.name, tokens)
 
             # -- "needs_more_info": enrich context for next child
             #    (append what this child found so the next one can build on it)
@@ -202,16 +338,71 @@ class SupervisorOrchestrator:
                 )
             # else "failed": try next child with same input
 
-        # ── All children tried or step limit hit ──────────────────────
+            seq = self._log(run_id, seq, "handoff", {
+                "step": step,
+                "agent": child.name,
+                "result": result,
+                "enriched_input": enriched_input,
+            })
+
+            # -- Supervisor decision: is the answer good enough?
+            if result.status == "ok":
+                answer = result
+
+        if answer is not None:
+            return self._finish(run_id, seq, SupervisorResult(
+                answer=answer.summary,
+                plan=plan,
+                handoffs_received=list(handoffs),
+                agents_run=list(agents_run),
+                status="completed",
+                total_steps=step,
+                total_tokens=total_tokens,
+                total_cost=total_cost,
+                run_id=run_id,
+            ))
+
+        # ── All children tried, step limit or budget hit ──────────────
         final_summary = "; ".join(h.summary for h in handoffs) or "No children executed."
-        return SupervisorResult(
-            answer=f"Partial result — {final_summary}",
+        reason = " (budget exhausted)" if budget_stop else ""
+        return self._finish(run_id, seq, SupervisorResult(
+            answer=f"Partial result{reason} — {final_summary}",
             plan=plan,
-            handoffs_received=handoffs,
-            status="partial" if handoffs else "failed",
+            handoffs_received=list(handoffs),
+            agents_run=list(agents_run),
+            status="partial" if step or budget_stop else "failed",
             total_steps=step,
             total_tokens=total_tokens,
-        )
+            total_cost=total_cost,
+            run_id=run_id,
+        ))
+
+    # ── Budget helper ─────────────────────────────────────────────────
+
+    def _next_affordable(self, remaining: list[AgentNode], budget: Budget) -> AgentNode | None:
+        """Pop routed children until one is expected to fit in *budget*.
+
+        Children skipped here are dropped for good — the budget only
+        shrinks, so a child that doesn't fit now never will.
+        """
+        while remaining:
+            child = remaining.pop(0)
+            if budget.affords(self.cost_estimator, child.name):
+                return child
+        return None
+
+    # ── Step log helpers ──────────────────────────────────────────────
+
+    def _log(self, run_id: str | None, seq: int, kind: StepKind, data: dict[str, Any]) -> int:
+        """Append one record (non-blocking, group-committed).  Returns the next seq."""
+        if self.step_log is None or run_id is None:
+            return seq
+        self.step_log.append(run_id, seq, kind, data)
+        return seq + 1
+
+    def _finish(self, run_id: str | None, seq: int, result: SupervisorResult) -> SupervisorResult:
+        self._log(run_id, seq, "final", {"result": result})
+        return result
 
     # ── Routing helper ────────────────────────────────────────────────
 
@@ -230,3 +421,56 @@ class SupervisorOrchestrator:
             return sum(1 for kw in keywords if kw in input_lower)
 
         return sorted(children, key=score, reverse=True)
+
+
+# ── Resume state ───────────────────────────────────────────────────────────
+
+@dataclass
+class _ResumeState:
+    """What an interrupted run already completed, rebuilt from its step log."""
+
+    has_plan: bool = False
+    plan: dict[str, Any] | None = None
+    user_input: str | None = None
+    order: list[str] | None = None
+    handoffs: list[HandoffResult] = field(default_factory=list)
+    completed: list[str] = field(default_factory=list)  # child names, in run order
+    enriched_input: str | None = None
+    final: SupervisorResult | None = None
+    next_seq: int = 0
+
+    @classmethod
+    def from_records(cls, records: list[StepRecord]) -> _ResumeState:
+        state = cls()
+        for record in records:
+            data = record.data
+            if record.kind == "plan":
+                state.has_plan, state.plan = True, data["plan"]
+                state.user_input = data["user_input"]
+            elif record.kind == "route":
+                state.order = data["order"]
+            elif record.kind == "handoff":
+                # JSON-mode dump (ISO timestamps) → validate in lax mode
+                state.handoffs.append(HandoffResult.model_validate(data["result"], strict=False))
+                state.completed.append(data["agent"])
+                state.enriched_input = data["enriched_input"]
+            elif record.kind == "final":
+                state.final = SupervisorResult.model_validate(data["result"], strict=False)
+            state.next_seq = record.seq + 1
+        return state
+
+    @property
+    def answer(self) -> HandoffResult | None:
+        """The last logged handoff if it answered the request ("ok"), else None."""
+        if self.handoffs and self.handoffs[-1].status == "ok":
+            return self.handoffs[-1]
+        return None
+
+    def reorder(self, children: list[AgentNode]) -> list[AgentNode] | None:
+        """Re-apply the logged routing order, or None if it can't be trusted."""
+        if self.order is None:
+            return None
+        by_name = {c.name: c for c in children}
+        if sorted(by_name) != sorted(self.order):
+            return None  # tree changed since the run started — re-route
+        return [by_name[name] for name in self.order]
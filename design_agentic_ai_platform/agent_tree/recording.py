@@ -0,0 +1,406 @@
+"""
+Record / replay harness for agent and tool I/O.
+
+WHY:  Reproducing a slow production request today means hitting live LLMs
+      and ERPs.  Recording every agent run, tool call and planner call once
+      lets us replay that traffic offline, deterministically, to benchmark
+      and profile orchestrator changes against real request shapes.
+
+Record:
+    recorder = Recorder("traffic.jsonl.gz")
+    recorder.instrument(orchestrator)          # wraps agents, tools, planner in place
+    result = await recorder.run(orchestrator, prompt)
+    recorder.close()
+
+Replay:
+    replayer = Replayer("traffic.jsonl.gz", latency_scale=1.0)
+    replayer.install(orchestrator)             # swaps in recorded outputs
+    for prompt in replayer.requests:
+        await orchestrator.run(prompt)
+
+    python -m agent_tree.recording traffic.jsonl.gz --factory my_mod:build \\
+        --concurrency 64 --latency-scale 1.0 --profile replay.prof
+
+File format: gzip JSON lines, one entry per call:
+    {"kind": "request" | "planner" | "agent" | "tool", "node": ..., "tool": ...,
+     "key": sha1(input)[:16], "output": ..., "error": ..., "latency_ms": ...}
+Inputs are stored only as hashes (plus top-level request text), which keeps
+recordings compact.  Calls are matched by (kind, node, tool, key); repeated
+identical calls replay their recorded outputs in order, and a call past the
+last recorded one raises ReplayMiss (reset() rewinds for another pass).  Values JSON can't
+represent are hashed by their repr with any memory address stripped, so
+the key is the same in the recording and the replaying process.
+
+A recording cut short by a crash (the gzip stream is never closed) still
+replays: entries are read up to the truncation point.
+
+Note:  only calls that go through the node's registry are captured — an
+agent that calls a tool function directly (not via run_tool) is replayed as
+a whole, which is usually what you want.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import importlib
+import json
+import os
+import re
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Literal
+
+from .agent_node import AgentNode
+from .agent_tree import AgentTree
+from .batch_writer import BatchWriter
+from .codec import to_json
+from .handoff_models import HandoffResult, SupervisorResult
+from .model_view import unwrap
+from .orchestrator import SupervisorOrchestrator
+from .tool_executors import TimedTool
+
+
+EntryKind = Literal["request", "planner", "agent", "tool"]
+
+
+_ADDRESS = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+def _stable_repr(value: Any) -> str:
+    """repr() without object addresses, which differ from process to process."""
+    return _ADDRESS.sub("", repr(value))
+
+
+def _key(value: Any) -> str:
+    blob = json.dumps(value, sort_keys=True, default=_stable_repr).encode()
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+
+def _iter_nodes(tree: AgentTree) -> list[AgentNode]:
+    nodes, stack = [], [tree.root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.children)
+    return nodes
+
+
+# ── Recording ──────────────────────────────────────────────────────────────
+
+class _GzipJsonlWriter(BatchWriter[bytes]):
+    """Appends entries to a gzip JSON-lines file off the event loop.
+
+    Entries are serialized on the caller's thread (append()): outputs are
+    live objects an agent may keep mutating, and the writer thread must
+    neither record a later state nor iterate a dict that is changing.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._file = gzip.open(path, "wb")
+
+    def append(self, entry: dict[str, Any]) -> None:
+        self.submit(to_json(entry, fallback=repr) + b"\n")
+
+    def _write_batch(self, records: list[bytes]) -> None:
+        self._file.write(b"".join(records))
+        self._file.flush()
+
+    def _close_resources(self) -> None:
+        self._file.close()
+
+
+class Recorder:
+    """Wraps agent / tool / planner callables so every call is recorded."""
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self._writer = _GzipJsonlWriter(path)
+
+    def instrument(self, orchestrator: SupervisorOrchestrator) -> None:
+        """Instrument the orchestrator's tree and planner in place."""
+        self.instrument_tree(orchestrator.tree)
+        if orchestrator.planner is not None:
+            planner = orchestrator.planner
+
+            async def recorded_planner(user_input: str) -> dict[str, Any]:
+                return await self._call("planner", None, None, user_input, planner, user_input)
+
+            orchestrator.planner = recorded_planner
+
+    def instrument_tree(self, tree: AgentTree) -> None:
+        for node in _iter_nodes(tree):
+            if node.agent is not None:
+                node.agent = self._wrap_agent(node.name, node.agent)
+            for tool_name, fn in list(node._tool_fns.items()):
+                node._tool_fns[tool_name] = self._wrap_tool(node.name, tool_name, fn)
+
+    async def run(
+        self, orchestrator: SupervisorOrchestrator, user_input: str, **run_kwargs: Any
+    ) -> SupervisorResult:
+        """Record the top-level request text, then run it."""
+        self._writer.append({"kind": "request", "input": user_input, "t": time.time()})
+        return await orchestrator.run(user_input, **run_kwargs)
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def __enter__(self) -> Recorder:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # ── Internals ──────────────────────────────────────────────────────
+
+    def _wrap_agent(
+        self, node_name: str, agent: Callable[[str], Awaitable[HandoffResult]]
+    ) -> Callable[[str], Awaitable[HandoffResult]]:
+        async def recorded_agent(user_input: str) -> HandoffResult:
+            return await self._call("agent", node_name, None, user_input, agent, user_input)
+
+        return recorded_agent
+
+    def _wrap_tool(
+        self, node_name: str, tool_name: str, fn: Callable[..., Awaitable[Any]]
+    ) -> _RecordedTool:
+        return _RecordedTool(self, node_name, tool_name, fn)
+
+    async def _call(
+        self,
+        kind: EntryKind,
+        node: str | None,
+        tool: str | None,
+        key_input: Any,
+        fn: Callable[..., Awaitable[Any]],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        entry: dict[str, Any] = {"kind": kind, "node": node, "tool": tool, "key": _key(key_input)}
+        start = time.perf_counter()
+        try:
+            output = await fn(*args, **kwargs)
+        except Exception as exc:
+            entry["error"] = str(exc)
+            raise
+        else:
+            entry["output"] = unwrap(output)
+            return output
+        finally:
+            entry["latency_ms"] = (time.perf_counter() - start) * 1000
+            self._writer.append(entry)  # serialized now, written in the background
+
+
+class _RecordedTool(TimedTool):
+    """Records a registry tool while keeping its (queue_ms, exec_ms) split.
+
+    Offloaded / pooled / scheduled tools are TimedTools; recording goes
+    through their invoke() so the timings still reach the ToolResult.
+    """
+
+    def __init__(
+        self, recorder: Recorder, node_name: str, tool_name: str, fn: Callable[..., Awaitable[Any]]
+    ) -> None:
+        self.recorder = recorder
+        self.node_name = node_name
+        self.fn = fn
+        self.__name__ = tool_name
+        self.__doc__ = getattr(fn, "__doc__", None)
+
+    async def invoke(self, kwargs: dict[str, Any]) -> tuple[Any, int, int]:
+        timings = (0, 0)
+
+        async def call() -> Any:
+            nonlocal timings
+            if isinstance(self.fn, TimedTool):
+                output, queue_ms, exec_ms = await self.fn.invoke(kwargs)
+                timings = (queue_ms, exec_ms)
+                return output
+            start = time.perf_counter()
+            output = await self.fn(**kwargs)
+            timings = (0, int((time.perf_counter() - start) * 1000))
+            return output
+
+        output = await self.recorder._call("tool", self.node_name, self.__name__, kwargs, call)
+        return (output, *timings)
+
+    def __repr__(self) -> str:
+        return f"_RecordedTool({self.__name__!r}, {self.fn!r})"
+
+
+# ── Replay ─────────────────────────────────────────────────────────────────
+
+class ReplayMiss(LookupError):
+    """A call was made that the recording has no entry for."""
+
+
+class Replayer:
+    """Serves recorded outputs back deterministically.
+
+    latency_scale:  None → return immediately (max-throughput profiling);
+                    1.0  → sleep for the recorded latency; 0.5 → half of it.
+    """
+
+    def __init__(
+        self, path: str | os.PathLike[str], *, latency_scale: float | None = None
+    ) -> None:
+        self.latency_scale = latency_scale
+        self.requests: list[str] = []
+        # Calls with no matching recording.  The orchestrator turns a miss
+        # into a failed handoff, so check this after a replay run.
+        self.misses = 0
+        self._entries: dict[tuple[Any, ...], list[dict[str, Any]]] = defaultdict(list)
+        for entry in self._read_entries(path):
+            if entry["kind"] == "request":
+                self.requests.append(entry["input"])
+            else:
+                self._entries[self._lookup_key(entry)].append(entry)
+        self._cursors: dict[tuple[Any, ...], deque[dict[str, Any]]] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        """Rewind every call sequence to the start of the recording."""
+        self._cursors = {k: deque(v) for k, v in self._entries.items()}
+
+    def install(self, target: SupervisorOrchestrator | AgentTree) -> None:
+        """Replace agent / tool (and planner) callables with replay stubs."""
+        tree = target.tree if isinstance(target, SupervisorOrchestrator) else target
+        for node in _iter_nodes(tree):
+            if node.agent is not None:
+                node.agent = self._agent_stub(node.name)
+            for tool_name in list(node._tool_fns):
+                node._tool_fns[tool_name] = self._tool_stub(node.name, tool_name)
+        if isinstance(target, SupervisorOrchestrator) and target.planner is not None:
+            target.planner = self._planner_stub()
+
+    # ── Stubs ──────────────────────────────────────────────────────────
+
+    def _agent_stub(self, node_name: str) -> Callable[[str], Awaitable[HandoffResult]]:
+        async def replay_agent(user_input: str) -> HandoffResult:
+            output = await self._serve(("agent", node_name, None, _key(user_input)))
+            return HandoffResult.model_validate(output, strict=False)
+
+        return replay_agent
+
+    def _tool_stub(self, node_name: str, tool_name: str) -> Callable[..., Awaitable[Any]]:
+        async def replay_tool(**kwargs: Any) -> Any:
+            return await self._serve(("tool", node_name, tool_name, _key(kwargs)))
+
+        replay_tool.__name__ = tool_name
+        return replay_tool
+
+    def _planner_stub(self) -> Callable[[str], Awaitable[dict[str, Any]]]:
+        async def replay_planner(user_input: str) -> dict[str, Any]:
+            return await self._serve(("planner", None, None, _key(user_input)))
+
+        return replay_planner
+
+    async def _serve(self, key: tuple[Any, ...]) -> Any:
+        queue = self._cursors.get(key)
+        if not queue:
+            # More calls than were recorded is a divergence, not a reason to
+            # serve a stale entry again — reset() starts a fresh pass.
+            self.misses += 1
+            where = f"{key[0]} call for node={key[1]!r} tool={key[2]!r}"
+            if queue is None:
+                raise ReplayMiss(f"No recorded {where}")
+            raise ReplayMiss(f"Recorded {where} exhausted — reset() to replay again")
+        entry = queue.popleft()
+        if self.latency_scale:
+            await asyncio.sleep(entry["latency_ms"] / 1000 * self.latency_scale)
+        if "error" in entry:
+            raise RuntimeError(entry["error"])
+        return entry["output"]
+
+    @staticmethod
+    def _read_entries(path: str | os.PathLike[str]) -> list[dict[str, Any]]:
+        """Every complete entry — up to the truncation point of a crashed recording."""
+        entries: list[dict[str, Any]] = []
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # torn final write
+                    entries.append(json.loads(line))
+            except (EOFError, gzip.BadGzipFile):
+                pass  # stream never closed (process died) — keep what was flushed
+        return entries
+
+    @staticmethod
+    def _lookup_key(entry: dict[str, Any]) -> tuple[Any, ...]:
+        return (entry["kind"], entry["node"], entry["tool"], entry["key"])
+
+
+# ── CLI: replay a recording against an orchestrator ───────────────────────
+
+async def _replay_benchmark(
+    orchestrator: SupervisorOrchestrator, requests: list[str], concurrency: int
+) -> list[float]:
+    slots = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(prompt: str) -> None:
+        async with slots:
+            start = time.perf_counter()
+            await orchestrator.run(prompt)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(p) for p in requests))
+    return latencies
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded traffic against an orchestrator.")
+    parser.add_argument("recording")
+    parser.add_argument("--factory", required=True,
+                        help="module:function returning a SupervisorOrchestrator")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-scale", type=float, default=None,
+                        help="inject recorded latencies scaled by this factor (default: none)")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the request list N times")
+    parser.add_argument("--profile", help="write cProfile stats to this path")
+    args = parser.parse_args(argv)
+
+    module_name, _, attr = args.factory.partition(":")
+    orchestrator = getattr(importlib.import_module(module_name), attr)()
+    replayer = Replayer(args.recording, latency_scale=args.latency_scale)
+    replayer.install(orchestrator)
+
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    latencies: list[float] = []
+    wall = 0.0
+    for _ in range(args.repeat):
+        replayer.reset()  # each pass consumes the recorded call sequences once
+        start = time.perf_counter()
+        latencies += asyncio.run(
+            _replay_benchmark(orchestrator, replayer.requests, args.concurrency)
+        )
+        wall += time.perf_counter() - start
+    latencies.sort()
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+
+    n = len(latencies)
+    if not n:
+        print("Recording contains no requests.")
+        return
+    print(f"  requests:    {n}")
+    print(f"  wall time:   {wall:.3f}s  ({n / wall:.1f} req/s)")
+    print(f"  p50 latency: {latencies[n // 2] * 1000:.2f}ms")
+    print(f"  p99 latency: {latencies[min(n - 1, int(n * 0.99))] * 1000:.2f}ms")
+    if replayer.misses:
+        print(f"  WARNING: {replayer.misses} calls had no recording — the orchestrator "
+              f"(planner / tree) differs from the one that was recorded")
+    if args.profile:
+        print(f"  profile:     {args.profile}")
+
+
+if __name__ == "__main__":
+    main()
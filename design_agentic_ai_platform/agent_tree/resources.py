@@ -0,0 +1,428 @@
+"""
+Shared, pooled tool resources — one HTTP session / DB pool for the whole tree.
+
+WHY:  Tools are bare coroutines registered per node.  A tool that talks to
+      a backend (erp_lookup is an HTTP call in production) either opens a
+      connection per call — paying a TCP + TLS handshake every time — or
+      keeps its own private client, so socket counts grow with the number
+      of tools × nodes and nobody closes them on shutdown.
+
+Layout:
+
+    ResourceRegistry ── "erp_http" → shared client object (created at start())
+                    └── "orders_db" → ConnectionPool (max_size bounds sockets)
+
+    @uses("erp_http", db="orders_db")            # declare dependencies
+    async def erp_lookup(invoice_id, *, erp_http, db): ...
+
+    registry.bind(tree)          # wraps every declaring tool in the tree
+    async with registry:         # start(): create + warm up; exit: shutdown()
+        await orchestrator.run(prompt)
+
+Injection per call:
+  - plain resources are passed as-is (the shared object is the pool, e.g.
+    an aiohttp.ClientSession or httpx.AsyncClient);
+  - ConnectionPool resources are checked out for the duration of the call
+    and returned afterwards.  Time spent waiting for a free connection is
+    reported as ToolResult.queue_ms.
+
+Resources belong to the event loop that started them, so only code running
+on that loop may use them: async tools and sync tools on the "inline"
+executor.  bind() rejects a declaring tool on "thread" (an asyncio client
+driven from a worker thread races the loop), "process" or "sandbox" (live
+connections don't cross process boundaries).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Generic, TypeVar
+
+from .tool_executors import OffloadedTool, TimedTool
+
+if TYPE_CHECKING:
+    from .agent_tree import AgentTree
+    from .compact_tree import CompactAgentTree
+
+T = TypeVar("T")
+
+_RESOURCES_ATTR = "__tool_resources__"
+
+
+def uses(*names: str, **aliases: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Declare the registry resources a tool needs.
+
+    ``@uses("erp_http")`` injects resource "erp_http" as kwarg ``erp_http``;
+    ``@uses(db="orders_db")`` injects resource "orders_db" as kwarg ``db``.
+    """
+    deps = {name: name for name in names} | aliases
+
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        setattr(fn, _RESOURCES_ATTR, dict(deps))
+        return fn
+
+    return decorate
+
+
+def declared_resources(fn: Any) -> dict[str, str]:
+    """kwarg → resource name declared on *fn* (or on the sync function it offloads)."""
+    target = fn.fn if isinstance(fn, OffloadedTool) else fn
+    return getattr(target, _RESOURCES_ATTR, {})
+
+
+async def _maybe_await(value: Any) -> Any:
+    return await value if inspect.isawaitable(value) else value
+
+
+# ── Connection pool ────────────────────────────────────────────────────────
+
+@dataclass
+class PoolStats:
+    size: int
+    idle: int
+    in_use: int
+    waiting: int
+    created: int
+    reused: int
+
+
+class ConnectionPool(Generic[T]):
+    """Bounded async pool of connections created by *connect*.
+
+    At most max_size connections exist at once; callers beyond that wait
+    (up to acquire_timeout_s).  Idle connections are reused most-recent
+    first, and those idle longer than max_idle_s are closed instead.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[T]],
+        *,
+        close: Callable[[T], Any] | None = None,
+        max_size: int = 10,
+        min_size: int = 0,
+        acquire_timeout_s: float | None = None,
+        max_idle_s: float | None = None,
+    ) -> None:
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("Need 0 <= min_size <= max_size and max_size >= 1")
+        self._connect = connect
+        self._close = close
+        self.max_size = max_size
+        self.min_size = min_size
+        self.acquire_timeout_s = acquire_timeout_s
+        self.max_idle_s = max_idle_s
+        self._idle: deque[tuple[T, float]] = deque()  # (connection, returned_at)
+        self._size = 0
+        self._waiting = 0
+        self._created = 0
+        self._reused = 0
+        self._closed = False
+        self._cond: asyncio.Condition | None = None
+
+    @property
+    def cond(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()  # created lazily, on the running loop
+        return self._cond
+
+    async def warmup(self) -> None:
+        """Open connections until min_size exist (handshakes before traffic)."""
+        need = self.min_size - self._size
+        if need <= 0:
+            return
+        self._size += need
+        results = await asyncio.gather(
+            *(self._connect() for _ in range(need)), return_exceptions=True
+        )
+        now = time.monotonic()
+        async with self.cond:
+            for conn in results:
+                if isinstance(conn, BaseException):
+                    self._size -= 1
+                else:
+                    self._created += 1
+                    self._idle.append((conn, now))
+            self.cond.notify_all()
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise errors[0]
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[T]:
+        conn = await self._checkout()
+        try:
+            yield conn
+        finally:
+            async with self.cond:
+                closing = self._closed
+                if not closing:
+                    self._idle.append((conn, time.monotonic()))
+                    self.cond.notify()
+            if closing:
+                try:
+                    await self._dispose(conn)
+                finally:
+                    async with self.cond:
+                        self._size -= 1  # only once it is really closed
+                        self.cond.notify_all()
+
+    async def close(self, timeout_s: float | None = 30.0) -> bool:
+        """Stop handing out connections and close them all.
+
+        Idle connections are closed now; checked-out ones as they are
+        returned.  Waits up to *timeout_s* (None: forever) for the last one
+        and returns True once every connection is closed, False if some
+        were still checked out at the deadline (they close on return).
+        """
+        async with self.cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self.cond.notify_all()
+        for conn in idle:
+            try:
+                await self._dispose(conn)
+            finally:
+                async with self.cond:
+                    self._size -= 1
+        async with self.cond:
+            try:
+                await asyncio.wait_for(self.cond.wait_for(lambda: self._size == 0), timeout_s)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def stats(self) -> PoolStats:
+        return PoolStats(
+            size=self._size,
+            idle=len(self._idle),
+            in_use=self._size - len(self._idle),
+            waiting=self._waiting,
+            created=self._created,
+            reused=self._reused,
+        )
+
+    # ── Internals ──────────────────────────────────────────────────────
+
+    async def _checkout(self) -> T:
+        stale: list[T] = []
+        try:
+            async with self.cond:
+                self._waiting += 1
+                try:
+                    await asyncio.wait_for(
+                        self.cond.wait_for(lambda: self._closed or self._idle or self._size < self.max_size),
+                        self.acquire_timeout_s,
+                    )
+                finally:
+                    self._waiting -= 1
+                if self._closed:
+                    raise RuntimeError("ConnectionPool is closed")
+                now = time.monotonic()
+                while self._idle:
+                    conn, returned_at = self._idle.pop()  # most recently used first
+                    if self.max_idle_s is not None and now - returned_at > self.max_idle_s:
+                        self._size -= 1
+                        stale.append(conn)
+                        continue
+                    self._reused += 1
+                    return conn
+                self._size += 1  # reserve a slot, connect outside the lock
+        finally:
+            for conn in stale:
+                await self._dispose(conn)
+        try:
+            conn = await self._connect()
+        except BaseException:
+            async with self.cond:
+                self._size -= 1
+                self.cond.notify()
+            raise
+        self._created += 1
+        return conn
+
+    async def _dispose(self, conn: T) -> None:
+        if self._close is not None:
+            await _maybe_await(self._close(conn))
+
+
+# ── Registry ───────────────────────────────────────────────────────────────
+
+@dataclass
+class _Entry:
+    name: str
+    factory: Callable[[], Any] | None
+    value: Any
+    close: Callable[[Any], Any] | None
+
+    @property
+    def pooled(self) -> bool:
+        return isinstance(self.value, ConnectionPool)
+
+
+class ResourceRegistry:
+    """Named, shared tool resources with a start / shutdown lifecycle."""
+
+    def __init__(self) -> None:
+        self._entries: dict[str, _Entry] = {}
+        self._started = False
+
+    def register(
+        self,
+        name: str,
+        resource: ConnectionPool[Any] | Callable[[], Any] | Any,
+        *,
+        close: Callable[[Any], Any] | None = None,
+    ) -> None:
+        """Add a resource: a ConnectionPool, a (sync or async) factory called
+        at start(), or a ready object.  *close* overrides how it is released."""
+        if name in self._entries:
+            raise ValueError(f"Resource {name!r} is already registered")
+        if isinstance(resource, ConnectionPool) or not callable(resource):
+            self._entries[name] = _Entry(name, None, resource, close)
+        else:
+            self._entries[name] = _Entry(name, resource, None, close)
+
+    def get(self, name: str) -> Any:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown resource {name!r}; registered: {list(self._entries)}")
+        if entry.value is None:
+            raise RuntimeError(f"Resource {name!r} is not started — call start() first")
+        return entry.value
+
+    # ── Lifecycle ──────────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        """Create factory resources and warm up pools, concurrently.
+
+        If any of them fails, the ones that did start are shut down again
+        before the error propagates — a failed start() leaks nothing.
+        """
+        if self._started:
+            return
+
+        async def start_one(entry: _Entry) -> None:
+            if entry.factory is not None and entry.value is None:
+                entry.value = await _maybe_await(entry.factory())
+            if entry.pooled:
+                await entry.value.warmup()
+
+        results = await asyncio.gather(
+            *(start_one(e) for e in self._entries.values()), return_exceptions=True
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            await self.shutdown()
+            raise errors[0]
+        self._started = True
+
+    async def shutdown(self) -> None:
+        """Release resources in reverse registration order."""
+        for entry in reversed(list(self._entries.values())):
+            if entry.value is None:
+                continue
+            if entry.close is not None:
+                await _maybe_await(entry.close(entry.value))
+            elif entry.pooled:
+                await entry.value.close()
+            elif hasattr(entry.value, "aclose"):
+                await entry.value.aclose()
+            elif hasattr(entry.value, "close"):
+                await _maybe_await(entry.value.close())
+            if entry.factory is not None:
+                entry.value = None  # a later start() creates a fresh one
+        self._started = False
+
+    async def __aenter__(self) -> ResourceRegistry:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.shutdown()
+
+    # ── Tool wiring ────────────────────────────────────────────────────
+
+    def bind(self, tree: AgentTree | CompactAgentTree) -> ResourceRegistry:
+        """Wrap every tool in *tree* that declared resources via @uses.
+
+        Idempotent — call again after adding tools.  Returns the registry so
+        ``async with registry.bind(tree):`` reads naturally.
+        """
+        from .agent_tree import AgentTree
+
+        if isinstance(tree, AgentTree):
+            registries = []
+            stack = [tree.root]
+            while stack:
+                node = stack.pop()
+                registries.append(node._tool_fns)
+                stack.extend(node.children)
+        else:
+            registries = [tree._tool_fns]
+
+        for tool_fns in registries:
+            for key, fn in list(tool_fns.items()):
+                if isinstance(fn, ResourceBoundTool):
+                    continue
+                deps = declared_resources(fn)
+                if not deps:
+                    continue
+                missing = sorted(set(deps.values()) - set(self._entries))
+                if missing:
+                    raise KeyError(f"Tool {getattr(fn, '__name__', key)!r} uses unregistered resources {missing}")
+                if isinstance(fn, OffloadedTool) and fn.policy != "inline":
+                    raise TypeError(
+                        f"Tool {fn.__name__!r} runs off the event loop (executor={fn.policy!r}); "
+                        f"resources can only be injected into async or executor='inline' tools"
+                    )
+                tool_fns[key] = ResourceBoundTool(fn, self, deps)
+        return self
+
+    @asynccontextmanager
+    async def _checkout(self, deps: dict[str, str]) -> AsyncIterator[dict[str, Any]]:
+        injected: dict[str, Any] = {}
+        async with AsyncExitStack() as stack:
+            # Fixed (sorted) order: two tools sharing pools can't deadlock
+            for kwarg, name in sorted(deps.items(), key=lambda kv: kv[1]):
+                value = self.get(name)
+                if isinstance(value, ConnectionPool):
+                    value = await stack.enter_async_context(value.acquire())
+                injected[kwarg] = value
+            yield injected
+
+
+class ResourceBoundTool(TimedTool):
+    """A registered tool plus the resources injected into each call.
+
+    A TimedTool, so run_tool() still reports timings; pool waits count as
+    queue time.
+    """
+
+    def __init__(self, fn: Callable[..., Any], registry: ResourceRegistry, deps: dict[str, str]) -> None:
+        self.fn = fn
+        self.registry = registry
+        self.deps = deps
+        self.__name__ = getattr(fn, "__name__", "tool")
+        self.__doc__ = getattr(fn, "__doc__", None)
+
+    async def invoke(self, kwargs: dict[str, Any]) -> tuple[Any, int, int]:
+        start = time.perf_counter()
+        async with self.registry._checkout(self.deps) as injected:
+            checked_out = time.perf_counter()
+            call_kwargs = {**kwargs, **injected}
+            if isinstance(self.fn, TimedTool):
+                output, queue_ms, exec_ms = await self.fn.invoke(call_kwargs)
+            else:
+                output = await self.fn(**call_kwargs)
+                queue_ms, exec_ms = 0, int((time.perf_counter() - checked_out) * 1000)
+        return output, queue_ms + int((checked_out - start) * 1000), exec_ms
+
+    def __repr__(self) -> str:
+        return f"ResourceBoundTool({self.__name__!r}, uses={sorted(self.deps.values())})"
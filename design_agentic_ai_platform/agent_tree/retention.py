@@ -0,0 +1,195 @@
+"""
+Handoff retention policy + streaming handoff sinks.
+
+WHY:  SupervisorResult.handoffs_received used to hold every HandoffResult —
+      full traces, tool results and payloads — until the run ended.  With a
+      high max_steps and thousands of concurrent runs, those lists were the
+      largest thing on the heap, even though most callers only read the
+      final answer and perhaps the last step or two.
+
+Retention (what stays in memory / in the returned SupervisorResult):
+
+    HandoffRetention("all")                  every handoff, unchanged (default)
+    HandoffRetention("last_n", last_n=3)     only the N most recent handoffs
+    HandoffRetention("summaries")            every handoff, but stripped to
+                                             agent / status / summary /
+                                             artifacts / token + latency counts
+
+Totals (total_steps, total_tokens, total_cost) always cover every step; a
+partial result's answer is built from the retained handoffs only.
+
+Sinks (where the *full* handoffs go, as they arrive):
+  - JsonlHandoffSink   append-only JSON lines
+  - SQLiteHandoffSink  SQLite in WAL mode, keyed by (run_id, step)
+Both are BatchWriters: write() never blocks the event loop, and one commit
+covers many handoffs from many concurrent runs.  load(run_id) reads a run's
+full handoffs back for audit / debugging.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from abc import abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Literal
+
+from .batch_writer import BatchWriter
+from .codec import to_json
+from .handoff_models import HandoffResult
+
+
+RetentionMode = Literal["all", "last_n", "summaries"]
+
+
+@dataclass(frozen=True)
+class HandoffRetention:
+    """How many handoffs a run keeps in memory, and in how much detail."""
+
+    mode: RetentionMode = "all"
+    last_n: int = 1
+
+    def __post_init__(self) -> None:
+        if self.mode == "last_n" and self.last_n < 1:
+            raise ValueError("last_n must be >= 1")
+
+    def new_buffer(self, handoffs: Iterable[HandoffResult] = ()) -> list[HandoffResult] | deque[HandoffResult]:
+        """Container for one run's retained handoffs (use retain() to add)."""
+        buffer: list[HandoffResult] | deque[HandoffResult]
+        buffer = deque(maxlen=self.last_n) if self.mode == "last_n" else []
+        for handoff in handoffs:
+            buffer.append(self.retain(handoff))
+        return buffer
+
+    def retain(self, handoff: HandoffResult) -> HandoffResult:
+        """The form of *handoff* that this policy keeps."""
+        if self.mode != "summaries":
+            return handoff
+        return summarize(handoff)
+
+
+def summarize(handoff: HandoffResult) -> HandoffResult:
+    """Drop payload, tool results and reasoning; keep routing-relevant fields."""
+    traces = handoff.traces
+    return handoff.model_copy(update={
+        "payload": {},
+        "traces": traces.model_copy(update={"tool_results": [], "reasoning_steps": []}),
+    })
+
+
+# ── Sinks ──────────────────────────────────────────────────────────────────
+
+@dataclass
+class HandoffRecord:
+    run_id: str
+    step: int
+    agent: str
+    handoff: HandoffResult
+
+
+class HandoffSink(BatchWriter[Any]):
+    """Base class: write() is non-blocking; load() returns a run's handoffs in step order.
+
+    write() serializes on the caller's thread — the handoff's payload is a
+    live dict the agent may still mutate — and the writer thread only does I/O.
+    """
+
+    def write(self, run_id: str, step: int, agent: str, handoff: HandoffResult) -> None:
+        self.submit(self._encode(HandoffRecord(run_id=run_id, step=step, agent=agent, handoff=handoff)))
+
+    @abstractmethod
+    def _encode(self, record: HandoffRecord) -> Any:
+        """Serialize *record* into what _write_batch() stores.  Runs on the caller's thread."""
+
+    @abstractmethod
+    def load(self, run_id: str) -> list[HandoffResult]:
+        """Every handoff written for *run_id*, in step order."""
+
+
+class JsonlHandoffSink(HandoffSink):
+    """Append-only JSON-lines handoff stream."""
+
+    def __init__(self, path: str | os.PathLike[str], **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "ab")
+
+    def _encode(self, record: HandoffRecord) -> bytes:
+        return to_json(vars(record)) + b"\n"
+
+    def _write_batch(self, records: list[bytes]) -> None:
+        self._file.write(b"".join(records))
+        self._file.flush()
+
+    def _close_resources(self) -> None:
+        self._file.close()
+
+    def load(self, run_id: str) -> list[HandoffResult]:
+        if not self._closed:
+            self.flush()
+        steps: dict[int, HandoffResult] = {}
+        if not self.path.exists():
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # torn final write
+                raw = json.loads(line)
+                if raw["run_id"] == run_id:
+                    # a resumed run may rewrite a step — the last write wins
+                    steps[raw["step"]] = HandoffResult.model_validate(raw["handoff"], strict=False)
+        return [steps[s] for s in sorted(steps)]
+
+
+class SQLiteHandoffSink(HandoffSink):
+    """SQLite handoff store in WAL mode (one transaction per batch)."""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS handoffs (
+            run_id  TEXT NOT NULL,
+            step    INTEGER NOT NULL,
+            agent   TEXT NOT NULL,
+            status  TEXT NOT NULL,
+            handoff TEXT NOT NULL,
+            PRIMARY KEY (run_id, step)
+        )
+    """
+
+    def __init__(self, path: str | os.PathLike[str], **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(self._SCHEMA)
+        self._conn.commit()
+
+    def _encode(self, record: HandoffRecord) -> tuple[str, int, str, str, str]:
+        h = record.handoff
+        return record.run_id, record.step, record.agent, h.status, to_json(h).decode()
+
+    def _write_batch(self, records: list[tuple[str, int, str, str, str]]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO handoffs (run_id, step, agent, status, handoff) "
+                "VALUES (?, ?, ?, ?, ?)",
+                records,
+            )
+
+    def _close_resources(self) -> None:
+        self._conn.close()
+
+    def load(self, run_id: str) -> list[HandoffResult]:
+        if not self._closed:
+            self.flush()
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(
+                "SELECT handoff FROM handoffs WHERE run_id = ? ORDER BY step", (run_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [HandoffResult.model_validate_json(r[0]) for r in rows]
@@ -0,0 +1,392 @@
+"""
+Warm, pre-forked sandbox workers for crash-prone or untrusted tools.
+
+WHY:  Some tools run code we do not trust to behave: third-party parsers
+      that segfault, user-supplied snippets that loop forever or leak
+      memory.  They must run out-of-process, but spawning a fresh
+      interpreter per call costs hundreds of milliseconds, and the shared
+      ProcessPoolExecutor has no per-call timeout (a hung call holds its
+      worker forever) and dies as a whole when one worker crashes.
+
+SandboxPool keeps `size` worker processes started ahead of time, with
+`preload` modules already imported.  With preload_forkserver=True the POSIX
+forkserver imports them once, so replacement workers fork warm in
+milliseconds — but the forkserver is process-wide, so that is opt-in for
+the application that owns the process.  Each call:
+
+  - runs in one worker, with a per-call timeout — on expiry the worker is
+    killed and replaced, and the call raises SandboxTimeout;
+  - survives worker crashes — a dead worker is replaced and the call
+    raises SandboxCrashed;
+  - recycles the worker after `max_calls` calls or once its peak RSS
+    exceeds `max_rss_mb` (leaks don't accumulate); `memory_limit_mb`
+    additionally sets a hard RLIMIT_AS inside the worker.
+
+Replacements are spawned in the background, off the request path.
+shutdown() fails every in-flight or queued call with SandboxCrashed.
+
+    pool = SandboxPool(size=4, timeout_s=10, max_calls=200, preload=("pdfminer",))
+    node.add_tool(parse_pdf, executor="sandbox", executors=ToolExecutors(sandbox=pool))
+    await node.run_tool("parse_pdf", path=...)    # errors / timeouts → ToolResult(status="error")
+
+This isolates the orchestrator from a tool's crashes, hangs and leaks; it
+is not a security boundary.  Hostile code additionally needs OS-level
+sandboxing (containers, seccomp, no network) around the workers.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from multiprocessing.connection import Connection
+from multiprocessing.context import BaseContext
+from typing import Any, Callable
+
+
+class SandboxError(RuntimeError):
+    """A sandboxed call failed for a reason other than the tool raising."""
+
+
+class SandboxTimeout(SandboxError, TimeoutError):
+    pass
+
+
+class SandboxCrashed(SandboxError):
+    pass
+
+
+class SandboxToolError(Exception):
+    """The tool raised inside the worker (message carries the remote type)."""
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _worker_main(conn: Connection, preload: tuple[str, ...], memory_limit_mb: int | None) -> None:
+    """Worker loop: receive (fn, kwargs), reply (status, value, exec_ms, peak_rss_mb)."""
+    if memory_limit_mb:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    try:
+        for module in preload:
+            importlib.import_module(module)
+    except BaseException as exc:
+        conn.send(("error", f"preload failed: {type(exc).__name__}: {exc}"))
+        return
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        fn, kwargs = message
+        start = time.perf_counter()
+        try:
+            reply: tuple[str, Any] = ("ok", fn(**kwargs))
+        except BaseException as exc:
+            reply = ("error", f"{type(exc).__name__}: {exc}")
+        exec_ms = int((time.perf_counter() - start) * 1000)
+        try:
+            conn.send((*reply, exec_ms, _peak_rss_mb()))
+        except Exception as exc:  # output could not be pickled
+            conn.send(("error", f"result not picklable: {exc}", exec_ms, _peak_rss_mb()))
+
+
+class _Worker:
+    __slots__ = ("process", "conn", "calls", "waiter")
+
+    def __init__(self, process: multiprocessing.process.BaseProcess, conn: Connection) -> None:
+        self.process = process
+        self.conn = conn
+        self.calls = 0
+        # (loop, future) while a call awaits the reply — lets _stop() fail it
+        self.waiter: tuple[asyncio.AbstractEventLoop, asyncio.Future[None]] | None = None
+
+
+# call(timeout_s=...) default: use the pool's timeout (None means "no timeout")
+_POOL_TIMEOUT: Any = object()
+
+
+def _default_context() -> BaseContext:
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class SandboxPool:
+    """Fixed-size pool of warm worker processes with per-call timeouts and recycling."""
+
+    def __init__(
+        self,
+        size: int = 4,
+        *,
+        timeout_s: float | None = 30.0,
+        max_calls: int | None = 500,
+        max_rss_mb: float | None = None,
+        memory_limit_mb: int | None = None,
+        preload: tuple[str, ...] = (),
+        mp_context: BaseContext | None = None,
+        start_timeout_s: float = 30.0,
+        preload_forkserver: bool = False,
+    ) -> None:
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        self.size = size
+        self.timeout_s = timeout_s
+        self.max_calls = max_calls
+        self.max_rss_mb = max_rss_mb
+        self.memory_limit_mb = memory_limit_mb
+        self.preload = tuple(preload)
+        self.start_timeout_s = start_timeout_s
+        self._ctx = mp_context or _default_context()
+        if preload_forkserver and self._ctx.get_start_method() == "forkserver":
+            # The worker entry point lives here — preloading this module (and so
+            # agent_tree / pydantic) in the server keeps each fork from re-importing it.
+            # This replaces the preload list of the process-wide forkserver.
+            self._ctx.set_forkserver_preload([__name__, *self.preload])
+        # Touched by the loop, _spawn() helper threads and shutdown() (which
+        # may run in a thread of its own) — hence the lock
+        self._workers: set[_Worker] = set()
+        self._workers_lock = threading.Lock()
+        self._idle: asyncio.Queue[_Worker | None] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._background: set[asyncio.Task[None]] = set()
+        self._started = False
+        self._start_lock: asyncio.Lock | None = None
+        self.recycled = 0
+        self.timeouts = 0
+        self.crashes = 0
+
+    # ── Lifecycle ──────────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        """Spawn and warm every worker (idempotent)."""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._started:
+                return
+            self._idle = asyncio.Queue()
+            self._loop = asyncio.get_running_loop()
+            workers = await asyncio.gather(
+                *(asyncio.to_thread(self._spawn) for _ in range(self.size))
+            )
+            for worker in workers:
+                self._idle.put_nowait(worker)
+            self._started = True
+
+    def shutdown(self) -> None:
+        """Stop every worker.  In-flight and queued calls fail with SandboxCrashed.
+
+        Safe to call from another thread (ToolExecutors' async exit does).
+        """
+        idle, self._idle = self._idle, None
+        self._started = False
+        loop = self._loop
+        if loop is not None:
+            # Tasks and queues belong to the loop: act on them from its thread
+            try:
+                for task in list(self._background):
+                    loop.call_soon_threadsafe(task.cancel)
+                if idle is not None:
+                    # Wake calls still waiting for a worker; each passes the pill on
+                    loop.call_soon_threadsafe(idle.put_nowait, None)
+            except RuntimeError:  # loop already closed
+                pass
+        with self._workers_lock:
+            workers = list(self._workers)
+        for worker in workers:
+            self._stop(worker, kill=True)
+
+    async def __aenter__(self) -> SandboxPool:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await asyncio.to_thread(self.shutdown)
+
+    # ── Calls ──────────────────────────────────────────────────────────
+
+    async def call(
+        self, fn: Callable[..., Any], kwargs: dict[str, Any], *, timeout_s: float | None = _POOL_TIMEOUT
+    ) -> tuple[Any, int, int]:
+        """Run sync *fn* in a worker.  Returns (output, queue_ms, exec_ms).
+
+        *timeout_s* overrides the pool's timeout for this call; None disables it.
+        """
+        if not self._started:
+            await self.start()
+        idle = self._idle
+        assert idle is not None
+        submitted = time.perf_counter()
+        worker = await idle.get()
+        if worker is None:  # shut down while we waited
+            idle.put_nowait(None)
+            raise SandboxCrashed("Sandbox pool shut down before the call ran")
+        queue_ms = int((time.perf_counter() - submitted) * 1000)
+        timeout = self.timeout_s if timeout_s is _POOL_TIMEOUT else timeout_s
+        try:
+            worker.conn.send((fn, kwargs))
+        except (EOFError, OSError) as exc:
+            self._replace(worker, kill=True)
+            self.crashes += 1
+            raise SandboxCrashed(f"Sandbox worker {worker.process.pid} died before the call") from exc
+        except Exception:
+            idle.put_nowait(worker)  # fn / kwargs not picklable — worker untouched
+            raise
+        try:
+            status, value, exec_ms, peak_rss_mb = await asyncio.wait_for(self._recv(worker), timeout)
+        except asyncio.TimeoutError:
+            self._replace(worker, kill=True)
+            self.timeouts += 1
+            raise SandboxTimeout(f"Sandboxed call exceeded {timeout}s; worker killed") from None
+        except (EOFError, OSError):
+            if not self._alive(worker):  # stopped by shutdown(), not a crash
+                raise SandboxCrashed("Sandbox pool shut down during the call") from None
+            worker.process.join(1)
+            code = worker.process.exitcode
+            self._replace(worker, kill=True)
+            self.crashes += 1
+            raise SandboxCrashed(f"Sandbox worker crashed (exit code {code})") from None
+        except asyncio.CancelledError:
+            self._replace(worker, kill=True)  # still busy with the abandoned call
+            raise
+
+        worker.calls += 1
+        if not self._alive(worker):
+            pass  # pool shut down as the reply arrived; the result still stands
+        elif (self.max_calls is not None and worker.calls >= self.max_calls) or (
+            self.max_rss_mb is not None and peak_rss_mb > self.max_rss_mb
+        ):
+            self.recycled += 1
+            self._replace(worker, kill=False)
+        else:
+            idle.put_nowait(worker)
+        if status == "error":
+            raise SandboxToolError(value)
+        return value, queue_ms, exec_ms
+
+    # ── Internals ──────────────────────────────────────────────────────
+
+    def _spawn(self) -> _Worker:
+        """Start one worker and wait until its preloads are imported (blocking)."""
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.preload, self.memory_limit_mb),
+            name="agent-sandbox",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        if not parent_conn.poll(self.start_timeout_s):
+            process.kill()
+            raise SandboxError(f"Sandbox worker did not start within {self.start_timeout_s}s")
+        try:
+            status, detail = parent_conn.recv()
+        except EOFError:
+            process.join(1)
+            raise SandboxError(f"Sandbox worker exited during startup (exit code {process.exitcode})") from None
+        if status != "ready":
+            process.join(1)
+            raise SandboxError(detail)
+        worker = _Worker(process, parent_conn)
+        with self._workers_lock:
+            self._workers.add(worker)
+        return worker
+
+    @staticmethod
+    async def _recv(worker: _Worker) -> Any:
+        loop = asyncio.get_running_loop()
+        readable: asyncio.Future[None] = loop.create_future()
+        fd = worker.conn.fileno()
+        loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        worker.waiter = (loop, readable)
+        try:
+            await readable
+        finally:
+            worker.waiter = None
+            loop.remove_reader(fd)
+        return worker.conn.recv()
+
+    @staticmethod
+    def _fail_waiter(worker: _Worker) -> None:
+        """Wake a call blocked on *worker*'s reply — closing the pipe alone does not."""
+        if worker.waiter is None:
+            return
+        loop, readable = worker.waiter
+
+        def fail() -> None:
+            if not readable.done():
+                readable.set_exception(EOFError("sandbox worker stopped"))
+
+        try:
+            loop.call_soon_threadsafe(fail)
+        except RuntimeError:  # loop already closed
+            pass
+
+    def _alive(self, worker: _Worker) -> bool:
+        """False once *worker* was stopped (replaced, or by shutdown())."""
+        with self._workers_lock:
+            return worker in self._workers
+
+    def _stop(self, worker: _Worker, *, kill: bool) -> None:
+        with self._workers_lock:
+            self._workers.discard(worker)
+        self._fail_waiter(worker)
+        try:
+            if kill:
+                worker.process.kill()
+            else:
+                worker.conn.send(None)  # finish cleanly
+        except (OSError, ValueError):
+            pass
+        worker.conn.close()
+
+    def _replace(self, worker: _Worker, *, kill: bool) -> None:
+        """Retire *worker* and spawn its replacement in the background."""
+        self._stop(worker, kill=kill)
+        idle = self._idle
+
+        async def respawn() -> None:
+            await asyncio.to_thread(worker.process.join, 5)
+            delay = 0.5
+            while True:
+                try:
+                    replacement = await asyncio.to_thread(self._spawn)
+                    break
+                except SandboxError:
+                    if idle is not self._idle:
+                        return
+                    await asyncio.sleep(delay)  # keep the pool at size; back off
+                    delay = min(delay * 2, 30.0)
+            if idle is self._idle and idle is not None:
+                idle.put_nowait(replacement)
+            else:  # pool was shut down meanwhile
+                self._stop(replacement, kill=True)
+
+        task = asyncio.get_running_loop().create_task(respawn())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "workers": len(self._workers),  # len() of a set is atomic
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "recycled": self.recycled,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+        }
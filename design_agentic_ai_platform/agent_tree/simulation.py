@@ -0,0 +1,464 @@
+"""
+Virtual-time simulation of orchestrator traffic, for capacity planning.
+
+WHY:  Sizing max_concurrency, queue limits and backend pools today means a
+      load test against real LLMs and ERPs — slow, expensive, and never
+      quite reproducible.  Agents and tools spend almost all their time
+      *waiting*; if waiting is simulated, an hour of production traffic
+      through thousands of agents runs in seconds, deterministically.
+
+Clock:
+    VirtualClockLoop is an asyncio event loop whose time() is virtual: when
+    every task is waiting on a timer, the loop jumps straight to the next
+    deadline instead of sleeping.  asyncio.sleep(), wait_for() timeouts and
+    loop.time()-based code (AdmissionController's CoDel) run unchanged.
+
+        result = run_virtual(orchestrator.run(prompt))
+
+    Replayer(latency_scale=1.0) works under it too: recorded traffic with
+    its recorded latencies, replayed in virtual time.
+
+Scenario:
+    report = simulate(Scenario(arrival_rate=50, duration_s=3600, children=1000,
+                               max_concurrency=128, tool_limit=32))
+    print(report.format())
+
+    simulate() builds a synthetic tree — root + N children with simulated
+    LLM think time, each calling tools on shared, concurrency-limited
+    backends (SimTool) — and drives Poisson arrivals through an
+    AdmissionController.  The report has end-to-end / admission-queue /
+    service latency percentiles, shed counts, in-flight concurrency, and
+    per-backend wait and utilisation.
+
+    python -m agent_tree.simulation --rate 50 --duration 3600 --concurrency 32,64,128
+
+Limits: only awaited timers are simulated.  Real I/O and thread / process
+pool tools are not — they take wall time and virtual time does not wait for
+them — so simulated trees should use async tools such as SimTool.  CPU work
+(routing, validation) costs wall time but no virtual time; with very wide
+trees the default keyword _route() dominates wall time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Coroutine, TypeVar
+
+from .admission import DEFAULT_CLASSES, AdmissionController, PriorityClass
+from .agent_node import AgentNode
+from .agent_tree import AgentTree
+from .handoff_models import HandoffResult, HandoffTraces
+from .orchestrator import SupervisorOrchestrator
+from .retention import HandoffRetention
+
+T = TypeVar("T")
+
+# Seconds to wait, drawn per call from the simulation's seeded RNG
+Latency = Callable[[random.Random], float]
+
+
+def constant(seconds: float) -> Latency:
+    return lambda rng: seconds
+
+
+def exponential(mean_s: float) -> Latency:
+    return lambda rng: rng.expovariate(1 / mean_s)
+
+
+def lognormal(median_s: float, sigma: float = 0.5) -> Latency:
+    """Right-skewed latency (typical of LLM and RPC calls) with the given median."""
+    mu = math.log(median_s)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+# ── Virtual clock ──────────────────────────────────────────────────────────
+
+class _VirtualSelector:
+    """Wraps the loop's selector: a timed wait advances the clock instead of blocking."""
+
+    def __init__(self, selector: Any, loop: VirtualClockLoop) -> None:
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout: float | None = None) -> list[Any]:
+        if timeout is None:
+            # No timer pending: only real I/O (thread results, signals) can wake us
+            return self._selector.select(None)
+        events = self._selector.select(0)
+        if not events and timeout > 0:
+            self._loop._now += timeout
+        return events
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._selector, name)
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Event loop on a virtual clock that jumps to the next timer when idle."""
+
+    def __init__(self, start: float = 0.0) -> None:
+        super().__init__()
+        self._now = start
+        self._selector = _VirtualSelector(self._selector, self)
+
+    def time(self) -> float:
+        return self._now
+
+
+def run_virtual(main: Coroutine[Any, Any, T]) -> T:
+    """asyncio.run(), on a fresh VirtualClockLoop."""
+    loop = VirtualClockLoop()
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+# ── Simulated tools and agents ─────────────────────────────────────────────
+
+@dataclass
+class BackendStats:
+    name: str
+    limit: int | None
+    calls: int = 0
+    errors: int = 0
+    busy_s: float = 0.0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    waits: list[float] = field(default_factory=list, repr=False)
+
+
+class SimTool:
+    """Async tool on a simulated backend: per-call latency, optional concurrency limit.
+
+    Calls beyond *limit* queue for a slot (the backend's connection pool or
+    rate limit); that wait is what BackendStats.waits measures.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        latency: Latency,
+        *,
+        rng: random.Random,
+        limit: int | None = None,
+        error_rate: float = 0.0,
+    ) -> None:
+        self.__name__ = name
+        self.latency = latency
+        self.rng = rng
+        self.error_rate = error_rate
+        self.stats = BackendStats(name, limit)
+        self._slots = asyncio.Semaphore(limit) if limit else None
+
+    async def __call__(self, **kwargs: Any) -> dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        stats = self.stats
+        queued = loop.time()
+        if self._slots is not None:
+            await self._slots.acquire()
+        try:
+            stats.waits.append(loop.time() - queued)
+            stats.calls += 1
+            stats.in_flight += 1
+            stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+            service = self.latency(self.rng)
+            await asyncio.sleep(service)
+            stats.busy_s += service
+        finally:
+            stats.in_flight -= 1
+            if self._slots is not None:
+                self._slots.release()
+        if self.error_rate and self.rng.random() < self.error_rate:
+            stats.errors += 1
+            raise RuntimeError(f"{self.__name__} failed")
+        return {"backend": self.__name__}
+
+
+class SimAgent:
+    """Agent that 'thinks' (simulated LLM call), then runs each of its node's tools."""
+
+    def __init__(
+        self,
+        node: AgentNode,
+        think: Latency,
+        *,
+        rng: random.Random,
+        ok_rate: float = 0.8,
+        tokens: tuple[int, int] = (500, 2500),
+    ) -> None:
+        self.node = node
+        self.think = think
+        self.rng = rng
+        self.ok_rate = ok_rate
+        self.tokens = tokens
+
+    async def __call__(self, user_input: str) -> HandoffResult:
+        await asyncio.sleep(self.think(self.rng))
+        results = [await self.node.run_tool(name) for name in self.node.tools]
+        ok = all(r.status == "ok" for r in results) and self.rng.random() < self.ok_rate
+        return HandoffResult(
+            from_agent=self.node.name,
+            to_agent="supervisor",
+            status="ok" if ok else "needs_more_info",
+            summary=f"{self.node.name} {'answered' if ok else 'needs more context'}",
+            traces=HandoffTraces(
+                tool_calls=list(self.node.tools),
+                tool_results=results,
+                token_usage=self.rng.randint(*self.tokens),
+            ),
+        )
+
+
+# ── Scenario ───────────────────────────────────────────────────────────────
+
+@dataclass
+class Scenario:
+    """Traffic, tree shape, latencies and limits for one simulated run."""
+
+    arrival_rate: float = 20.0               # requests / virtual second (Poisson)
+    duration_s: float = 600.0                # arrivals stop after this; in-flight runs finish
+    children: int = 50                       # root fan-out
+    tools_per_agent: int = 2
+    backends: int = 4                        # shared tool backends the agents' tools call
+    tool_limit: int | None = 32              # concurrent calls per backend (None = unlimited)
+    tool_error_rate: float = 0.0
+    max_concurrency: int = 64                # AdmissionController slots
+    max_queue: int = 1024
+    classes: tuple[PriorityClass, ...] = DEFAULT_CLASSES
+    agent_latency: Latency = lognormal(1.0, 0.5)
+    tool_latency: Latency = lognormal(0.1, 0.8)
+    ok_rate: float = 0.8                     # P(child answers) — else the next child is tried
+    tokens: tuple[int, int] = (500, 2500)
+    max_steps: int = 3
+    seed: int = 0
+
+
+def build_tree(scenario: Scenario, rng: random.Random) -> tuple[AgentTree, list[SimTool]]:
+    """Root + scenario.children SimAgents whose tools share scenario.backends SimTools."""
+    backends = [
+        SimTool(f"backend_{b}", scenario.tool_latency, rng=rng,
+                limit=scenario.tool_limit, error_rate=scenario.tool_error_rate)
+        for b in range(scenario.backends)
+    ]
+    width = len(str(scenario.children))
+    root = AgentNode("supervisor")
+    for i in range(scenario.children):
+        child = AgentNode(f"agent-{i:0{width}d}")
+        for tool in rng.sample(backends, min(scenario.tools_per_agent, len(backends))):
+            child.add_tool(tool, name=tool.__name__)
+        child.set_agent(SimAgent(child, scenario.agent_latency, rng=rng,
+                                 ok_rate=scenario.ok_rate, tokens=scenario.tokens))
+        root.add_child(child)
+    return AgentTree(root), backends
+
+
+# ── Report ─────────────────────────────────────────────────────────────────
+
+def _quantile(sorted_values: list[float], q: float) -> float:
+    n = len(sorted_values)
+    return sorted_values[min(n - 1, int(n * q))] if n else 0.0
+
+
+@dataclass
+class SimReport:
+    scenario: Scenario
+    virtual_s: float
+    wall_s: float
+    statuses: dict[str, int]
+    latency_s: list[float]          # end to end, admitted requests (sorted)
+    queue_s: list[float]            # waiting for an admission slot (sorted)
+    service_s: list[float]          # inside orchestrator.run (sorted)
+    mean_in_flight: float
+    peak_in_flight: int
+    backends: list[BackendStats]
+
+    @property
+    def requests(self) -> int:
+        return sum(self.statuses.values())
+
+    @property
+    def rejected_rate(self) -> float:
+        return self.statuses.get("rejected", 0) / self.requests if self.requests else 0.0
+
+    @property
+    def utilisation(self) -> float:
+        return self.mean_in_flight / self.scenario.max_concurrency
+
+    def format(self) -> str:
+        sc = self.scenario
+        done = self.requests - self.statuses.get("rejected", 0)
+        lines = [
+            f"  simulated        {self.virtual_s:,.0f}s in {self.wall_s:.2f}s wall "
+            f"({self.virtual_s / max(self.wall_s, 1e-9):,.0f}x)",
+            f"  requests         {self.requests:,}  ({sc.arrival_rate:g}/s offered, "
+            f"{done / max(self.virtual_s, 1e-9):.1f}/s admitted)",
+            "  status           " + "  ".join(f"{k} {v:,}" for k, v in sorted(self.statuses.items())),
+            f"  latency p50/p99  {_quantile(self.latency_s, 0.5):.2f}s / {_quantile(self.latency_s, 0.99):.2f}s",
+            f"  queue   p50/p99  {_quantile(self.queue_s, 0.5):.2f}s / {_quantile(self.queue_s, 0.99):.2f}s",
+            f"  service p50/p99  {_quantile(self.service_s, 0.5):.2f}s / {_quantile(self.service_s, 0.99):.2f}s",
+            f"  in-flight runs   mean {self.mean_in_flight:.1f}, peak {self.peak_in_flight} "
+            f"of {sc.max_concurrency} ({self.utilisation:.0%} utilised)",
+            f"  {'backend':<14}{'calls':>10}{'wait p50':>10}{'wait p99':>10}{'util':>8}{'peak':>7}",
+        ]
+        for b in self.backends:
+            waits = sorted(b.waits)
+            capacity = (b.limit or max(b.peak_in_flight, 1)) * self.virtual_s
+            lines.append(
+                f"  {b.name:<14}{b.calls:>10,}{_quantile(waits, 0.5):>9.2f}s"
+                f"{_quantile(waits, 0.99):>9.2f}s{b.busy_s / max(capacity, 1e-9):>8.0%}{b.peak_in_flight:>7}"
+            )
+        return "\n".join(lines)
+
+
+# ── Driver ─────────────────────────────────────────────────────────────────
+
+async def _drive(scenario: Scenario) -> SimReport:
+    loop = asyncio.get_running_loop()
+    rng = random.Random(scenario.seed)
+    tree, backends = build_tree(scenario, rng)
+    orchestrator = SupervisorOrchestrator(
+        tree=tree, max_steps=scenario.max_steps, retention=HandoffRetention("summaries")
+    )
+    gate = AdmissionController(
+        orchestrator,
+        max_concurrency=scenario.max_concurrency,
+        max_queue=scenario.max_queue,
+        classes=scenario.classes,
+    )
+
+    statuses: dict[str, int] = {}
+    latency: list[float] = []
+    queue: list[float] = []
+    service: list[float] = []
+    service_start: dict[asyncio.Task[Any], float] = {}
+    in_flight = peak = 0
+    area = 0.0          # ∫ in_flight dt, for the time-weighted mean
+    last_change = loop.time()
+
+    def track(delta: int) -> None:
+        nonlocal in_flight, peak, area, last_change
+        now = loop.time()
+        area += in_flight * (now - last_change)
+        last_change = now
+        in_flight += delta
+        peak = max(peak, in_flight)
+
+    run = orchestrator.run
+
+    async def timed_run(user_input: str, **kwargs: Any) -> Any:
+        start = loop.time()
+        service_start[asyncio.current_task()] = start
+        track(+1)
+        try:
+            return await run(user_input, **kwargs)
+        finally:
+            track(-1)
+            service.append(loop.time() - start)
+
+    orchestrator.run = timed_run  # type: ignore[method-assign]
+
+    names = [c.name for c in tree.root.children]
+
+    async def one(prompt: str) -> None:
+        arrived = loop.time()
+        result = await gate.run(prompt)
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+        started = service_start.pop(asyncio.current_task(), None)
+        if started is not None:
+            queue.append(started - arrived)
+            latency.append(loop.time() - arrived)
+
+    pending: set[asyncio.Task[None]] = set()
+    start_wall = time.perf_counter()
+    at = 0.0
+    while True:
+        at += rng.expovariate(scenario.arrival_rate)
+        if at >= scenario.duration_s:
+            break
+        await asyncio.sleep(at - loop.time())
+        task = loop.create_task(one(f"request for {rng.choice(names)}"))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    while pending:
+        await asyncio.gather(*pending)
+    track(0)
+
+    virtual_s = loop.time()
+    return SimReport(
+        scenario=scenario,
+        virtual_s=virtual_s,
+        wall_s=time.perf_counter() - start_wall,
+        statuses=statuses,
+        latency_s=sorted(latency),
+        queue_s=sorted(queue),
+        service_s=sorted(service),
+        mean_in_flight=area / virtual_s if virtual_s else 0.0,
+        peak_in_flight=peak,
+        backends=[b.stats for b in backends],
+    )
+
+
+def simulate(scenario: Scenario) -> SimReport:
+    """Run *scenario* in virtual time.  Same scenario + seed → same report."""
+    return run_virtual(_drive(scenario))
+
+
+# ── CLI: sweep admission concurrency ───────────────────────────────────────
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Simulate orchestrator traffic in virtual time.")
+    parser.add_argument("--rate", type=float, default=20.0, help="arrivals per second")
+    parser.add_argument("--duration", type=float, default=600.0, help="simulated seconds of arrivals")
+    parser.add_argument("--children", type=int, default=50)
+    parser.add_argument("--concurrency", default="16,32,64", help="comma-separated max_concurrency values")
+    parser.add_argument("--max-queue", type=int, default=1024)
+    parser.add_argument("--backends", type=int, default=4)
+    parser.add_argument("--tool-limit", type=int, default=32, help="0 = unlimited")
+    parser.add_argument("--agent-latency", type=float, default=1.0, help="median seconds per agent think")
+    parser.add_argument("--tool-latency", type=float, default=0.1, help="median seconds per tool call")
+    parser.add_argument("--ok-rate", type=float, default=0.8)
+    parser.add_argument("--max-steps", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--detail", action="store_true", help="print the full report per setting")
+    args = parser.parse_args(argv)
+
+    print("=" * 64)
+    print(f"VIRTUAL-TIME SIMULATION  ({args.rate:g} req/s for {args.duration:g}s, "
+          f"{args.children} children)")
+    print("=" * 64)
+    print(f"  {'slots':>6}{'admit/s':>9}{'rejected':>10}{'p50':>8}{'p99':>8}{'queue p99':>11}{'util':>7}{'wall':>7}")
+    for slots in (int(s) for s in args.concurrency.split(",")):
+        report = simulate(Scenario(
+            arrival_rate=args.rate,
+            duration_s=args.duration,
+            children=args.children,
+            backends=args.backends,
+            tool_limit=args.tool_limit or None,
+            max_concurrency=slots,
+            max_queue=args.max_queue,
+            agent_latency=lognormal(args.agent_latency, 0.5),
+            tool_latency=lognormal(args.tool_latency, 0.8),
+            ok_rate=args.ok_rate,
+            max_steps=args.max_steps,
+            seed=args.seed,
+        ))
+        admitted = report.requests - report.statuses.get("rejected", 0)
+        print(
+            f"  {slots:>6}{admitted / report.virtual_s:>9.1f}{report.rejected_rate:>10.1%}"
+            f"{_quantile(report.latency_s, 0.5):>7.2f}s{_quantile(report.latency_s, 0.99):>7.2f}s"
+            f"{_quantile(report.queue_s, 0.99):>10.2f}s{report.utilisation:>7.0%}{report.wall_s:>6.1f}s"
+        )
+        if args.detail:
+            print(report.format())
+            print()
+
+
+if __name__ == "__main__":
+    main()
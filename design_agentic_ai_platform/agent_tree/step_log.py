@@ -0,0 +1,155 @@
+"""
+Durable step log — lets a SupervisorOrchestrator run resume after a crash.
+
+WHY:  A run may have already paid for a planner call and several child
+      agents (LLM + tool calls) when the worker dies or is redeployed.
+      Recording each step lets a new worker pick the run up at the last
+      completed step instead of redoing that work.
+
+Record kinds (one run = an ordered sequence keyed by run_id + seq):
+  plan      {"plan": dict | None, "user_input": str}  (resume checks the input)
+  route     {"order": [child names in routed order]}
+  handoff   {"step": n, "result": HandoffResult,
+             "enriched_input": context after this step}
+  final     {"result": SupervisorResult}
+
+Records may hold models.  append() serializes each one on the caller's
+thread (a single codec.to_json() pass), so an agent that mutates its payload
+afterwards cannot change what was logged; the writer thread only does I/O.
+load() returns plain JSON data.
+
+Two backends, both built on BatchWriter (group commit, no fsync per step):
+  - JsonlStepLog   append-only JSON-lines file, one fsync per batch
+  - SQLiteStepLog  SQLite in WAL mode, one transaction per batch
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from abc import abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal
+
+from .batch_writer import BatchWriter
+from .codec import to_json
+
+
+StepKind = Literal["plan", "route", "handoff", "final"]
+
+
+@dataclass
+class StepRecord:
+    """One persisted step of an orchestration run."""
+
+    run_id: str
+    seq: int
+    kind: StepKind
+    data: dict[str, Any]
+
+
+class StepLog(BatchWriter[Any]):
+    """Base class: append() is non-blocking; load() returns a run's records in order."""
+
+    def append(self, run_id: str, seq: int, kind: StepKind, data: dict[str, Any]) -> None:
+        self.submit(self._encode(StepRecord(run_id=run_id, seq=seq, kind=kind, data=data)))
+
+    @abstractmethod
+    def _encode(self, record: StepRecord) -> Any:
+        """Serialize *record* into what _write_batch() stores.  Runs on the caller's thread."""
+
+    @abstractmethod
+    def load(self, run_id: str) -> list[StepRecord]:
+        """Every record of *run_id*, in seq order."""
+
+
+class JsonlStepLog(StepLog):
+    """Append-only JSON-lines step log (one fsync per batch)."""
+
+    def __init__(self, path: str | os.PathLike[str], **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "ab")
+
+    def _encode(self, record: StepRecord) -> bytes:
+        return to_json(vars(record)) + b"\n"
+
+    def _write_batch(self, records: list[bytes]) -> None:
+        self._file.write(b"".join(records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _close_resources(self) -> None:
+        self._file.close()
+
+    def load(self, run_id: str) -> list[StepRecord]:
+        # Pending records from this process must be visible to a resume
+        if not self._closed:
+            self.flush()
+        records: list[StepRecord] = []
+        if not self.path.exists():
+            return records
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # torn final write from a crash — ignore it
+                raw = json.loads(line)
+                if raw["run_id"] == run_id:
+                    records.append(StepRecord(**raw))
+        records.sort(key=lambda r: r.seq)
+        return records
+
+
+class SQLiteStepLog(StepLog):
+    """SQLite step log in WAL mode (one transaction per batch)."""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS steps (
+            run_id TEXT NOT NULL,
+            seq    INTEGER NOT NULL,
+            kind   TEXT NOT NULL,
+            data   TEXT NOT NULL,
+            PRIMARY KEY (run_id, seq)
+        )
+    """
+
+    def __init__(self, path: str | os.PathLike[str], **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = str(path)
+        # Used only by the writer thread after construction
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(self._SCHEMA)
+        self._conn.commit()
+
+    def _encode(self, record: StepRecord) -> tuple[str, int, str, str]:
+        return record.run_id, record.seq, record.kind, to_json(record.data).decode()
+
+    def _write_batch(self, records: list[tuple[str, int, str, str]]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO steps (run_id, seq, kind, data) VALUES (?, ?, ?, ?)",
+                records,
+            )
+
+    def _close_resources(self) -> None:
+        self._conn.close()
+
+    def load(self, run_id: str) -> list[StepRecord]:
+        if not self._closed:
+            self.flush()
+        # Separate read connection — WAL readers never block the writer
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(
+                "SELECT run_id, seq, kind, data FROM steps WHERE run_id = ? ORDER BY seq",
+                (run_id,),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            StepRecord(run_id=r[0], seq=r[1], kind=r[2], data=json.loads(r[3])) for r in rows
+        ]
@@ -0,0 +1,280 @@
+"""
+Executor policies for sync and CPU-bound tools.
+
+WHY:  run_tool() awaits tools on the event loop.  A sync library call
+      (PDF parsing, regex-heavy classifiers) or a CPU-heavy loop inside a
+      tool blocks every concurrent orchestration sharing that loop.
+
+Policies (chosen per tool at registration via add_tool(executor=...)):
+  - "inline"   call the sync function directly on the loop thread
+               (cheapest; only for sub-millisecond work)
+  - "thread"   run in a shared ThreadPoolExecutor (I/O-ish or GIL-releasing
+               sync code — the default for sync callables)
+  - "process"  run in a shared ProcessPoolExecutor (pure-Python CPU work);
+               the function must be picklable, i.e. a module-level def
+  - "sandbox"  run in a warm SandboxPool worker (crash-prone / untrusted
+               code): per-call timeout, crashed workers replaced, workers
+               recycled after N calls or a memory limit.  Picklable, too.
+
+Pools are owned by a ToolExecutors instance, created lazily on first use and
+torn down by shutdown() (or the context-manager exit).  Timings come back
+as (queue_ms, exec_ms) so ToolResult can separate pool wait from work.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import os
+import pickle
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.context import BaseContext
+from typing import Any, Callable, Literal
+
+
+from .sandbox import SandboxPool
+
+ExecutorPolicy = Literal["inline", "thread", "process", "sandbox"]
+
+
+def _timed_call(fn: Callable[..., Any], kwargs: dict[str, Any]) -> tuple[float, float, Any]:
+    """Worker-side wrapper: returns (start, end, output).
+
+    Module-level so it pickles for the process pool.  perf_counter() is a
+    system-wide monotonic clock on Linux/macOS/Windows, so start/end are
+    comparable with the submitting process's clock.
+    """
+    start = time.perf_counter()
+    output = fn(**kwargs)
+    return start, time.perf_counter(), output
+
+
+def _noop() -> None:
+    return None
+
+
+def is_async_callable(fn: Callable[..., Any]) -> bool:
+    """True for `async def` functions, partials of them, and async __call__ objects."""
+    return inspect.iscoroutinefunction(fn) or inspect.iscoroutinefunction(
+        getattr(fn, "__call__", None)
+    )
+
+
+def check_picklable(fn: Callable[..., Any], tool_name: str, policy: str = "process") -> None:
+    """Raise TypeError if *fn* cannot be shipped to a worker process."""
+    try:
+        pickle.dumps(fn)
+    except Exception as exc:
+        raise TypeError(
+            f"Tool '{tool_name}' cannot use executor={policy!r}: {fn!r} is not "
+            f"picklable ({exc}).  Define it at module level (no lambdas or closures)."
+        ) from exc
+
+
+class ToolExecutors:
+    """Managed thread + process pools shared by every tool that opts in.
+
+    Pools are created lazily, so an unused policy costs nothing.  After
+    shutdown() the next submission lazily creates fresh pools again.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_threads: int | None = None,
+        max_processes: int | None = None,
+        mp_context: BaseContext | None = None,
+        sandbox: SandboxPool | None = None,
+    ) -> None:
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+        self.mp_context = mp_context
+        self._threads: ThreadPoolExecutor | None = None
+        self._processes: ProcessPoolExecutor | None = None
+        self._sandbox = sandbox
+
+    # ── Pools ──────────────────────────────────────────────────────────
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(
+                max_workers=self.max_threads, thread_name_prefix="agent-tool"
+            )
+        return self._threads
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.max_processes, mp_context=self.mp_context
+            )
+        return self._processes
+
+    @property
+    def sandbox_pool(self) -> SandboxPool:
+        if self._sandbox is None:
+            self._sandbox = SandboxPool(mp_context=self.mp_context)
+        return self._sandbox
+
+    def _pool(self, policy: ExecutorPolicy) -> Executor:
+        if policy == "thread":
+            return self.thread_pool
+        if policy == "process":
+            return self.process_pool
+        raise ValueError(f"Policy {policy!r} has no pool")
+
+    # ── Lifecycle ──────────────────────────────────────────────────────
+
+    async def warmup(self, *policies: ExecutorPolicy) -> None:
+        """Spawn pool workers ahead of the first request (mainly for "process" / "sandbox")."""
+        loop = asyncio.get_running_loop()
+        for policy in policies or ("thread", "process"):
+            if policy == "sandbox":
+                await self.sandbox_pool.start()
+                continue
+            pool = self._pool(policy)
+            n = self._worker_count(policy)
+            await asyncio.gather(*(loop.run_in_executor(pool, _noop) for _ in range(n)))
+
+    def _worker_count(self, policy: ExecutorPolicy) -> int:
+        """Configured pool size, or the stdlib default when left unset."""
+        cpus = os.cpu_count() or 1
+        if policy == "thread":
+            return self.max_threads or min(32, cpus + 4)
+        return self.max_processes or cpus
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop all pools.  Queued-but-unstarted work is cancelled."""
+        if self._threads is not None:
+            self._threads.shutdown(wait=wait, cancel_futures=True)
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait, cancel_futures=True)
+            self._processes = None
+        if self._sandbox is not None:
+            self._sandbox.shutdown()
+
+    def __enter__(self) -> ToolExecutors:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
+
+    async def __aenter__(self) -> ToolExecutors:
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        # Blocking join would stall the loop — wait in a helper thread instead
+        await asyncio.to_thread(self.shutdown)
+
+    # ── Execution ──────────────────────────────────────────────────────
+
+    async def submit(
+        self, fn: Callable[..., Any], policy: ExecutorPolicy, kwargs: dict[str, Any]
+    ) -> tuple[Any, int, int]:
+        """Run sync *fn* under *policy*.  Returns (output, queue_ms, exec_ms)."""
+        if policy == "inline":
+            start = time.perf_counter()
+            output = fn(**kwargs)
+            return output, 0, int((time.perf_counter() - start) * 1000)
+        if policy == "sandbox":
+            return await self.sandbox_pool.call(fn, kwargs)
+
+        submitted = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        started, finished, output = await loop.run_in_executor(
+            self._pool(policy), functools.partial(_timed_call, fn, kwargs)
+        )
+        queue_ms = max(0, int((started - submitted) * 1000))
+        return output, queue_ms, int((finished - started) * 1000)
+
+
+# Process-wide default used when add_tool() is not given explicit executors.
+DEFAULT_EXECUTORS = ToolExecutors()
+
+
+class TimedTool(ABC):
+    """Registry entry that reports its own (output, queue_ms, exec_ms) split.
+
+    run_tool() calls invoke() instead of awaiting the tool directly, so
+    wrappers that wait for something first — a pool thread, a pooled
+    connection, a fair-share slot — report that wait as queue time.
+    """
+
+    __name__: str
+
+    @abstractmethod
+    async def invoke(self, kwargs: dict[str, Any]) -> tuple[Any, int, int]:
+        """Run the tool on *kwargs*; returns (output, queue_ms, exec_ms)."""
+
+    async def __call__(self, **kwargs: Any) -> Any:
+        output, _queue_ms, _exec_ms = await self.invoke(kwargs)
+        return output
+
+
+class OffloadedTool(TimedTool):
+    """Async facade over a sync tool function plus its executor policy.
+
+    Stored in the node's tool registry like any async tool, so callers that
+    `await fn(**kwargs)` directly keep working; run_tool() uses invoke() to
+    also collect queue/exec timings.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[..., Any],
+        policy: ExecutorPolicy,
+        executors: ToolExecutors,
+        name: str,
+    ) -> None:
+        self.fn = fn
+        self.policy = policy
+        self.executors = executors
+        self.__name__ = name
+        self.__doc__ = getattr(fn, "__doc__", None)
+
+    async def invoke(self, kwargs: dict[str, Any]) -> tuple[Any, int, int]:
+        output, queue_ms, exec_ms = await self.executors.submit(self.fn, self.policy, kwargs)
+        if inspect.isawaitable(output):
+            # A sync callable that returns an awaitable (a factory, or a
+            # wrapper around an async API): finish it on the loop, as a
+            # plain `await fn(**kwargs)` would.
+            start = time.perf_counter()
+            output = await output
+            exec_ms += int((time.perf_counter() - start) * 1000)
+        return output, queue_ms, exec_ms
+
+    def __repr__(self) -> str:
+        return f"OffloadedTool({self.__name__!r}, policy={self.policy!r})"
+
+
+def resolve_tool(
+    fn: Callable[..., Any],
+    tool_name: str,
+    executor: ExecutorPolicy | None,
+    executors: ToolExecutors | None,
+) -> Callable[..., Any]:
+    """Turn a registered callable into what the tool registry stores.
+
+    Async callables are stored as-is (they only accept executor=None or
+    "inline").  Sync callables are wrapped in an OffloadedTool — "thread"
+    by default so a sync tool never blocks the loop unless asked to.
+    """
+    if is_async_callable(fn):
+        if executor not in (None, "inline"):
+            raise ValueError(
+                f"Tool '{tool_name}' is async; executor={executor!r} only applies "
+                f"to sync callables"
+            )
+        return fn
+
+    policy: ExecutorPolicy = executor or "thread"
+    if policy not in ("inline", "thread", "process", "sandbox"):
+        raise ValueError(f"Unknown executor policy {policy!r} for tool '{tool_name}'")
+    if policy in ("process", "sandbox"):
+        check_picklable(fn, tool_name, policy)
+    return OffloadedTool(fn, policy, executors or DEFAULT_EXECUTORS, tool_name)
@@ -0,0 +1,319 @@
+"""
+Persistent trace store — node and tool events in SQLite, plus latency analytics.
+
+WHY:  HandoffTraces live on the per-request HandoffResult and are gone once
+      the response is sent.  "Which node is slowest this week?", "what is
+      erp_lookup's p99?", "where do failures cluster?" could only be answered
+      by re-running traffic.  SQLiteTraceStore keeps every event, written
+      through BatchWriter so the request path never waits on a commit.
+
+Wiring (an OrchestratorHooks consumer):
+
+    traces = SQLiteTraceStore("traces.db")
+    orchestrator = SupervisorOrchestrator(tree=tree, hooks=traces.hooks())
+    # keep existing hooks:  hooks=traces.hooks(chain=my_hooks)
+
+Tables:
+    node_spans  one row per child run: on_node_start → on_node_end wall time,
+                handoff status / target, tokens, the node's input text, and
+                the routed input — the text before earlier steps were
+                appended, which is what a router sees (its training data).
+                on_handoff carries the same HandoffResult, so it needs no
+                row of its own.
+    tool_calls  one row per ToolResult in the handoff's traces — tools run
+                inside agents, so their results arrive with the node's end.
+
+Queries (all accept a since / until window in epoch seconds):
+    slowest_nodes()      mean / p99 / max latency per node
+    tool_latency()       p50 / p99 / max latency and error rate per tool
+    failure_hotspots()   failed nodes and erroring tools, by failure count
+    token_spend()        tokens per node
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Any, Iterator, Sequence
+
+from .agent_node import AgentNode
+from .batch_writer import BatchWriter
+from .handoff_models import HandoffResult
+from .orchestrator import OrchestratorHooks, routed_input
+
+
+# (perf_counter at on_node_start, input text, routed input) for the node
+# running in this task
+_node_span: ContextVar[tuple[float, str, str] | None] = ContextVar("trace_node_span", default=None)
+
+
+@dataclass
+class NodeSpan:
+    ts: float
+    node: str
+    to_agent: str
+    status: str
+    latency_ms: int
+    tokens: int
+    input: str
+    route_input: str
+    summary: str
+    tool_rows: list[tuple[Any, ...]]
+
+
+# ── Query results ──────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class NodeLatency:
+    node: str
+    calls: int
+    mean_ms: float
+    p99_ms: int
+    max_ms: int
+
+
+@dataclass(frozen=True)
+class ToolLatency:
+    tool: str
+    calls: int
+    p50_ms: int
+    p99_ms: int
+    max_ms: int
+    error_rate: float
+
+
+@dataclass(frozen=True)
+class FailureHotspot:
+    node: str
+    tool: str | None   # None → the node itself failed
+    failures: int
+    calls: int
+
+    @property
+    def rate(self) -> float:
+        return self.failures / self.calls if self.calls else 0.0
+
+
+@dataclass(frozen=True)
+class TokenSpend:
+    node: str
+    calls: int
+    tokens: int
+
+
+def _quantile(sorted_values: Sequence[int], q: float) -> int:
+    """Nearest-rank quantile of an ascending sequence."""
+    n = len(sorted_values)
+    return sorted_values[min(n - 1, int(n * q))]
+
+
+# ── Store ──────────────────────────────────────────────────────────────────
+
+class SQLiteTraceStore(BatchWriter[NodeSpan]):
+    """SQLite trace store in WAL mode (one transaction per batch)."""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS node_spans (
+            ts         REAL NOT NULL,
+            node       TEXT NOT NULL,
+            to_agent   TEXT NOT NULL,
+            status     TEXT NOT NULL,
+            latency_ms INTEGER NOT NULL,
+            tokens     INTEGER NOT NULL,
+            input      TEXT NOT NULL,
+            route_input TEXT NOT NULL,
+            summary    TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tool_calls (
+            ts         REAL NOT NULL,
+            node       TEXT NOT NULL,
+            tool       TEXT NOT NULL,
+            status     TEXT NOT NULL,
+            latency_ms INTEGER NOT NULL,
+            queue_ms   INTEGER NOT NULL,
+            exec_ms    INTEGER NOT NULL,
+            error      TEXT
+        );
+        CREATE INDEX IF NOT EXISTS node_spans_ts ON node_spans (ts);
+        CREATE INDEX IF NOT EXISTS tool_calls_ts ON tool_calls (ts);
+    """
+
+    def __init__(self, path: str | os.PathLike[str], *, store_inputs: bool = True, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = str(path)
+        self.store_inputs = store_inputs
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self._SCHEMA)
+        self._conn.commit()
+
+    # ── Hooks ──────────────────────────────────────────────────────────
+
+    def hooks(self, chain: OrchestratorHooks | None = None) -> OrchestratorHooks:
+        """OrchestratorHooks that record into this store.
+
+        Callbacks already set on *chain* still fire, after the store's.
+        """
+        chain = chain or OrchestratorHooks()
+
+        async def on_node_start(node: AgentNode, user_input: str) -> None:
+            _node_span.set((time.perf_counter(), user_input, routed_input() or user_input))
+            await chain.fire_node_start(node, user_input)
+
+        async def on_node_end(node: AgentNode, result: HandoffResult) -> None:
+            self.record(node.name, result)
+            await chain.fire_node_end(node, result)
+
+        return OrchestratorHooks(
+            on_node_start=on_node_start,
+            on_node_end=on_node_end,
+            on_handoff=chain.on_handoff,
+            on_tool_start=chain.on_tool_start,
+            on_tool_end=chain.on_tool_end,
+            on_reasoning_step=chain.on_reasoning_step,
+        )
+
+    def record(self, node: str, result: HandoffResult) -> None:
+        """Queue one node span (and its tool calls).  Never blocks on I/O."""
+        span = _node_span.get()
+        _node_span.set(None)
+        if span is not None:
+            latency_ms = int((time.perf_counter() - span[0]) * 1000)
+            user_input, route_input = span[1:] if self.store_inputs else ("", "")
+        else:
+            latency_ms, user_input, route_input = result.traces.latency_ms, "", ""
+        ts = time.time()
+        self.submit(NodeSpan(
+            ts=ts,
+            node=node,
+            to_agent=result.to_agent,
+            status=result.status,
+            latency_ms=latency_ms,
+            tokens=result.traces.token_usage,
+            input=user_input,
+            route_input=route_input,
+            summary=result.summary,
+            tool_rows=[
+                (ts, node, t.tool_name, t.status, t.latency_ms, t.queue_ms, t.exec_ms, t.error)
+                for t in result.traces.tool_results
+            ],
+        ))
+
+    # ── BatchWriter ────────────────────────────────────────────────────
+
+    def _write_batch(self, records: list[NodeSpan]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO node_spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (r.ts, r.node, r.to_agent, r.status, r.latency_ms, r.tokens, r.input,
+                     r.route_input, r.summary)
+                    for r in records
+                ],
+            )
+            self._conn.executemany(
+                "INSERT INTO tool_calls VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for r in records for row in r.tool_rows],
+            )
+
+    def _close_resources(self) -> None:
+        self._conn.close()
+
+    # ── Queries ────────────────────────────────────────────────────────
+
+    def _query(self, sql: str, since: float | None, until: float | None, *tail: Any) -> list[tuple[Any, ...]]:
+        if not self._closed:
+            self.flush()
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(
+                sql.format(window="ts >= ? AND ts < ?"),
+                (since if since is not None else float("-inf"),
+                 until if until is not None else float("inf"), *tail),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def slowest_nodes(self, limit: int = 10, *, since: float | None = None, until: float | None = None) -> list[NodeLatency]:
+        """Nodes ranked by p99 latency, slowest first."""
+        rows = self._query(
+            "SELECT node, latency_ms FROM node_spans WHERE {window} ORDER BY node, latency_ms",
+            since, until,
+        )
+        stats = []
+        for node, group in groupby(rows, key=lambda r: r[0]):
+            latencies = [r[1] for r in group]
+            stats.append(NodeLatency(
+                node=node,
+                calls=len(latencies),
+                mean_ms=sum(latencies) / len(latencies),
+                p99_ms=_quantile(latencies, 0.99),
+                max_ms=latencies[-1],
+            ))
+        stats.sort(key=lambda s: s.p99_ms, reverse=True)
+        return stats[:limit]
+
+    def tool_latency(self, *, since: float | None = None, until: float | None = None) -> list[ToolLatency]:
+        """Per-tool latency percentiles, slowest p99 first."""
+        rows = self._query(
+            "SELECT tool, latency_ms, status FROM tool_calls WHERE {window} ORDER BY tool, latency_ms",
+            since, until,
+        )
+        stats = []
+        for tool, group in groupby(rows, key=lambda r: r[0]):
+            calls = list(group)
+            latencies = [r[1] for r in calls]
+            stats.append(ToolLatency(
+                tool=tool,
+                calls=len(calls),
+                p50_ms=_quantile(latencies, 0.50),
+                p99_ms=_quantile(latencies, 0.99),
+                max_ms=latencies[-1],
+                error_rate=sum(r[2] == "error" for r in calls) / len(calls),
+            ))
+        stats.sort(key=lambda s: s.p99_ms, reverse=True)
+        return stats
+
+    def failure_hotspots(self, limit: int = 10, *, since: float | None = None, until: float | None = None) -> list[FailureHotspot]:
+        """Failed nodes and erroring (node, tool) pairs, most failures first."""
+        node_rows = self._query(
+            "SELECT node, SUM(status = 'failed'), COUNT(*) FROM node_spans "
+            "WHERE {window} GROUP BY node",
+            since, until,
+        )
+        tool_rows = self._query(
+            "SELECT node, tool, SUM(status = 'error'), COUNT(*) FROM tool_calls "
+            "WHERE {window} GROUP BY node, tool",
+            since, until,
+        )
+        spots = [FailureHotspot(node, None, failures, calls) for node, failures, calls in node_rows]
+        spots += [FailureHotspot(node, tool, failures, calls) for node, tool, failures, calls in tool_rows]
+        spots = [s for s in spots if s.failures]
+        spots.sort(key=lambda s: (s.failures, s.rate), reverse=True)
+        return spots[:limit]
+
+    def token_spend(self, *, since: float | None = None, until: float | None = None) -> list[TokenSpend]:
+        """Tokens per node over the window, biggest spender first."""
+        rows = self._query(
+            "SELECT node, COUNT(*), SUM(tokens) FROM node_spans WHERE {window} "
+            "GROUP BY node ORDER BY SUM(tokens) DESC",
+            since, until,
+        )
+        return [TokenSpend(node, calls, tokens) for node, calls, tokens in rows]
+
+    def iter_inputs(self, *, since: float | None = None, until: float | None = None) -> Iterator[tuple[str, str, str]]:
+        """(routed input, node, status) for every recorded span with an input.
+
+        The routed input is the text the router ranked children on, not the
+        enriched text a later child received — so it is what a router trains on.
+        """
+        rows = self._query(
+            "SELECT route_input, node, status FROM node_spans "
+            "WHERE {window} AND route_input != '' ORDER BY ts",
+            since, until,
+        )
+        yield from rows
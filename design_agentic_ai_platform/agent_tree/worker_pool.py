@@ -0,0 +1,407 @@
+"""
+Multi-process orchestration worker pool with a local job queue.
+
+WHY:  One asyncio process tops out on CPU (Pydantic validation, routing,
+      hook dispatch) long before it runs out of I/O concurrency.  Scaling
+      across cores means several processes, each with its own event loop
+      and its own SupervisorOrchestrator instance.
+
+Layout:
+
+    caller ──submit()──▶ JobQueue.jobs ──▶ worker 0 (event loop, N in-flight runs)
+                                      ──▶ worker 1 ...
+    caller ◀─Future──── collector thread ◀── JobQueue.events ◀── workers
+
+  - JobQueue is the broker seam.  LocalJobQueue uses multiprocessing queues;
+    a Redis / SQS / Temporal-backed implementation can replace it without
+    touching the pool.
+  - Results come back by request_id and resolve a concurrent.futures.Future
+    (`await pool.run(...)` wraps it for asyncio callers).
+  - Workers build their orchestrator from a picklable, module-level factory
+    because each process needs its own tree, hooks and connections.
+  - If a worker process dies, the jobs it had claimed are re-queued (up to
+    max_attempts).  A job's run_id defaults to its request_id, so give the
+    factory's orchestrator a step_log and the retry resumes from the last
+    completed step instead of starting over.
+  - A worker can also die after taking a job off the queue but before its
+    "claimed" event is sent.  After a death the pool puts a fence job
+    behind everything still unclaimed: the queue is FIFO, so once a worker
+    takes the fence every earlier job has been dequeued, and any of them
+    that is still unclaimed `claim_grace_s` later was lost — it is
+    re-queued like a claimed one.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from dataclasses import dataclass
+from multiprocessing.context import BaseContext
+from typing import Any, Callable, Literal
+
+from .handoff_models import SupervisorResult
+from .orchestrator import SupervisorOrchestrator
+
+
+# Signature:  () -> SupervisorOrchestrator   (module-level, picklable)
+OrchestratorFactory = Callable[[], SupervisorOrchestrator]
+
+
+@dataclass
+class Job:
+    request_id: str
+    user_input: str
+    run_id: str | None = None   # defaults to request_id, so a retry resumes the same run
+    attempt: int = 1
+    fence: bool = False         # pool-internal marker, never run
+
+    def __post_init__(self) -> None:
+        if self.run_id is None:
+            self.run_id = self.request_id
+
+
+@dataclass
+class JobEvent:
+    """Worker → pool message: a job was claimed, finished or errored (or a fence was reached)."""
+
+    kind: Literal["claimed", "done", "error", "fence"]
+    request_id: str
+    worker: int
+    result_json: str | None = None
+    error: str | None = None
+
+
+# ── Broker seam ────────────────────────────────────────────────────────────
+
+class JobQueue(ABC):
+    """Two channels: jobs (pool → workers) and events (workers → pool).
+
+    get_job() returns "empty" on timeout and None for the shutdown sentinel;
+    get_event() returns None on timeout.  Implementations must be picklable
+    so they can be handed to worker processes.
+    """
+
+    @abstractmethod
+    def put_job(self, job: Job | None) -> None: ...
+
+    @abstractmethod
+    def get_job(self, timeout: float) -> Job | None | Literal["empty"]: ...
+
+    @abstractmethod
+    def put_event(self, event: JobEvent) -> None: ...
+
+    @abstractmethod
+    def get_event(self, timeout: float) -> JobEvent | None: ...
+
+
+class LocalJobQueue(JobQueue):
+    """Single-machine stand-in backed by multiprocessing primitives.
+
+    Jobs use a multiprocessing.Queue.  Events use a locked one-way pipe
+    instead: Queue.put() hands data to a background feeder thread, so a
+    worker that crashes right after claiming a job could lose the "claimed"
+    event — and the pool would never know to re-queue that job.
+    """
+
+    def __init__(self, ctx: BaseContext | None = None) -> None:
+        ctx = ctx or multiprocessing.get_context()
+        self._jobs = ctx.Queue()
+        self._events_reader, self._events_writer = ctx.Pipe(duplex=False)
+        self._events_lock = ctx.Lock()
+
+    def put_job(self, job: Job | None) -> None:
+        self._jobs.put(job)
+
+    def get_job(self, timeout: float) -> Job | None | Literal["empty"]:
+        try:
+            return self._jobs.get(timeout=timeout)
+        except queue.Empty:
+            return "empty"
+
+    def put_event(self, event: JobEvent) -> None:
+        with self._events_lock:
+            self._events_writer.send(event)  # synchronous — no feeder thread
+
+    def get_event(self, timeout: float) -> JobEvent | None:
+        if not self._events_reader.poll(timeout):
+            return None
+        return self._events_reader.recv()
+
+
+# ── Worker process ─────────────────────────────────────────────────────────
+
+def _worker_main(
+    worker: int, factory: OrchestratorFactory, jobs: JobQueue, concurrency: int
+) -> None:
+    asyncio.run(_worker_loop(worker, factory, jobs, concurrency))
+
+
+async def _worker_loop(
+    worker: int, factory: OrchestratorFactory, jobs: JobQueue, concurrency: int
+) -> None:
+    orchestrator = factory()
+    slots = asyncio.Semaphore(concurrency)
+    in_flight: set[asyncio.Task[None]] = set()
+
+    async def handle(job: Job) -> None:
+        try:
+            result = await orchestrator.run(job.user_input, run_id=job.run_id)
+            event = JobEvent("done", job.request_id, worker, result_json=result.model_dump_json())
+        except Exception as exc:
+            event = JobEvent("error", job.request_id, worker, error=f"{type(exc).__name__}: {exc}")
+        finally:
+            slots.release()
+        jobs.put_event(event)
+
+    while True:
+        # Only pull a job when there is capacity — unclaimed jobs stay in
+        # the shared queue for less busy workers.
+        await slots.acquire()
+        job = await asyncio.to_thread(jobs.get_job, 0.5)
+        if job == "empty":
+            slots.release()
+            continue
+        if job is None:
+            slots.release()
+            break
+        if job.fence:
+            slots.release()
+            jobs.put_event(JobEvent("fence", job.request_id, worker))
+            continue
+        jobs.put_event(JobEvent("claimed", job.request_id, worker))
+        task = asyncio.create_task(handle(job))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+# ── Pool ───────────────────────────────────────────────────────────────────
+
+class OrchestratorWorkerPool:
+    """Runs SupervisorOrchestrator instances across worker processes.
+
+    Usage:
+        with OrchestratorWorkerPool(build_orchestrator, workers=8) as pool:
+            result = await pool.run("Why was invoice #4821 rejected?")
+    """
+
+    def __init__(
+        self,
+        factory: OrchestratorFactory,
+        *,
+        workers: int | None = None,
+        concurrency_per_worker: int = 32,
+        jobs: JobQueue | None = None,
+        mp_context: BaseContext | None = None,
+        max_attempts: int = 2,
+        claim_grace_s: float = 2.0,
+    ) -> None:
+        # spawn: the parent runs a collector thread, and forking a threaded
+        # process is unsafe.  The factory must therefore be importable.
+        self._ctx = mp_context or multiprocessing.get_context("spawn")
+        self.factory = factory
+        self.workers = workers or os.cpu_count() or 1
+        self.concurrency_per_worker = concurrency_per_worker
+        self.max_attempts = max_attempts
+        self.claim_grace_s = claim_grace_s
+        self.jobs = jobs or LocalJobQueue(self._ctx)
+
+        self._procs: dict[int, multiprocessing.process.BaseProcess] = {}
+        self._next_worker = 0
+        self._lock = threading.Lock()
+        self._futures: dict[str, Future[SupervisorResult]] = {}
+        self._jobs_by_id: dict[str, Job] = {}
+        self._claimed: dict[str, int] = {}  # request_id → worker
+        self._fences: dict[str, set[str]] = {}  # fence id → unclaimed request_ids queued before it
+        self._fence_checks: list[tuple[float, set[str]]] = []  # (deadline, suspects)
+        self._collector: threading.Thread | None = None
+        self._stopping = False
+
+    # ── Lifecycle ──────────────────────────────────────────────────────
+
+    def start(self) -> OrchestratorWorkerPool:
+        if self._collector is not None:
+            return self
+        for _ in range(self.workers):
+            worker, proc = self._spawn()
+            self._procs[worker] = proc
+        self._collector = threading.Thread(
+            target=self._collect, name="worker-pool-collector", daemon=True
+        )
+        self._collector.start()
+        return self
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop workers after they drain in-flight runs; fail anything left."""
+        if self._collector is None:
+            return
+        with self._lock:
+            # The collector replaces dead workers under the same lock, so
+            # after this no new process appears and the snapshot is complete
+            self._stopping = True
+            procs = list(self._procs.values())
+        for _ in procs:
+            self.jobs.put_job(None)
+        if wait:
+            for proc in procs:
+                proc.join()
+        else:
+            for proc in procs:
+                proc.terminate()
+        self._collector.join()
+        self._collector = None
+        with self._lock:
+            leftovers = list(self._futures.items())
+            self._futures.clear()
+        for request_id, fut in leftovers:
+            if not fut.done():
+                fut.set_exception(RuntimeError(f"Pool shut down before {request_id} finished"))
+
+    def __enter__(self) -> OrchestratorWorkerPool:
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
+
+    # ── Submission ─────────────────────────────────────────────────────
+
+    def submit(
+        self, user_input: str, *, request_id: str | None = None, run_id: str | None = None
+    ) -> Future[SupervisorResult]:
+        """Enqueue a run.  The returned Future resolves with its SupervisorResult."""
+        if self._collector is None or self._stopping:
+            raise RuntimeError("Worker pool is not running — call start()")
+        job = Job(request_id=request_id or uuid.uuid4().hex, user_input=user_input, run_id=run_id)
+        fut: Future[SupervisorResult] = Future()
+        with self._lock:
+            if job.request_id in self._futures:
+                raise ValueError(f"Duplicate request_id {job.request_id!r}")
+            self._futures[job.request_id] = fut
+            self._jobs_by_id[job.request_id] = job
+            # Enqueue under the lock: a fence put by the collector must never
+            # overtake a job that is already registered as pending
+            self.jobs.put_job(job)
+        return fut
+
+    async def run(
+        self, user_input: str, *, request_id: str | None = None, run_id: str | None = None
+    ) -> SupervisorResult:
+        return await asyncio.wrap_future(self.submit(user_input, request_id=request_id, run_id=run_id))
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._futures)
+
+    # ── Internals ──────────────────────────────────────────────────────
+
+    def _spawn(self) -> tuple[int, multiprocessing.process.BaseProcess]:
+        worker = self._next_worker
+        self._next_worker += 1
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(worker, self.factory, self.jobs, self.concurrency_per_worker),
+            name=f"orchestrator-worker-{worker}",
+            daemon=True,
+        )
+        proc.start()
+        return worker, proc
+
+    def _collect(self) -> None:
+        while True:
+            event = self.jobs.get_event(timeout=0.2)
+            if event is not None:
+                self._handle_event(event)
+                continue
+            self._check_fences()
+            if self._stopping:
+                with self._lock:
+                    procs = list(self._procs.values())
+                if not any(p.is_alive() for p in procs):
+                    # Drain whatever the exiting workers sent last
+                    while (event := self.jobs.get_event(timeout=0.05)) is not None:
+                        self._handle_event(event)
+                    return
+            else:
+                self._reap_dead_workers()
+
+    def _handle_event(self, event: JobEvent) -> None:
+        with self._lock:
+            if event.kind == "fence":
+                suspects = self._fences.pop(event.request_id, None)
+                if suspects:
+                    # Give claims sent just before the fence time to arrive
+                    self._fence_checks.append((time.monotonic() + self.claim_grace_s, suspects))
+                return
+            if event.kind == "claimed":
+                if event.request_id in self._futures:
+                    self._claimed[event.request_id] = event.worker
+                return
+            fut = self._futures.pop(event.request_id, None)
+            self._jobs_by_id.pop(event.request_id, None)
+            self._claimed.pop(event.request_id, None)
+        if fut is None or fut.done():
+            return
+        if event.kind == "done":
+            assert event.result_json is not None
+            fut.set_result(SupervisorResult.model_validate_json(event.result_json))
+        else:
+            fut.set_exception(RuntimeError(event.error))
+
+    def _reap_dead_workers(self) -> None:
+        with self._lock:
+            dead = [w for w, p in self._procs.items() if not p.is_alive()]
+        for worker in dead:
+            replacement = self._spawn()   # outside the lock: spawning takes a while
+            with self._lock:
+                del self._procs[worker]
+                if self._stopping:
+                    replacement[1].terminate()
+                else:
+                    self._procs[replacement[0]] = replacement[1]
+                orphaned = [rid for rid, w in self._claimed.items() if w == worker]
+                for rid in orphaned:
+                    del self._claimed[rid]
+                failed = self._requeue_locked(orphaned)
+                # Jobs the dead worker may have dequeued without claiming
+                unclaimed = {rid for rid in self._futures if rid not in self._claimed}
+                if unclaimed:
+                    fence = Job(request_id=f"fence-{uuid.uuid4().hex}", user_input="", fence=True)
+                    self._fences[fence.request_id] = unclaimed
+                    self.jobs.put_job(fence)
+            for fut in failed:
+                fut.set_exception(RuntimeError(f"Worker {worker} died; attempts exhausted"))
+
+    def _check_fences(self) -> None:
+        """Re-queue jobs dequeued before a fence that were never claimed."""
+        now = time.monotonic()
+        with self._lock:
+            due = [suspects for deadline, suspects in self._fence_checks if deadline <= now]
+            self._fence_checks = [c for c in self._fence_checks if c[0] > now]
+            lost = [rid for suspects in due for rid in suspects
+                    if rid in self._futures and rid not in self._claimed]
+            failed = self._requeue_locked(lost)
+        for fut in failed:
+            fut.set_exception(RuntimeError("Job lost by a dead worker; attempts exhausted"))
+
+    def _requeue_locked(self, request_ids: list[str]) -> list[Future[SupervisorResult]]:
+        """Retry jobs whose worker died (caller holds _lock).  Returns futures to fail."""
+        failed: list[Future[SupervisorResult]] = []
+        for rid in request_ids:
+            job = self._jobs_by_id[rid]
+            if job.attempt < self.max_attempts:
+                job.attempt += 1
+                self.jobs.put_job(job)
+            else:
+                self._jobs_by_id.pop(rid)
+                failed.append(self._futures.pop(rid))
+        return failed